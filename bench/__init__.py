@@ -0,0 +1,7 @@
+# bench/__init__.py
+"""
+Công cụ đo hiệu năng (không dùng trong app):
+  python -m bench.gen_data   -> sinh dữ liệu giả lập + nạp vào DB
+  python -m bench.bench_dal  -> đo các hàm đọc của db/attendance_dal.py, xuất JSON
+  python -m bench.bench_preview -> cấp phát / GC của đường preview camera (cũ vs bộ đệm dùng lại)
+"""
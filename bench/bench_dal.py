@@ -0,0 +1,167 @@
+# bench/bench_dal.py
+"""
+Benchmark các hàm đọc của db/attendance_dal.py ở nhiều quy mô dữ liệu.
+
+Mỗi scale (số log mục tiêu 1e3..1e7): sinh + nạp dữ liệu (bench/gen_data.py),
+gọi từng hàm R lần, ghi min/median (ms) ra JSON. Có --baseline thì so với lần đo
+trước và liệt kê các hàm chậm hơn quá --threshold (exit code 1 => dùng được trong CI).
+
+Cache của DAL và closed-day cache bị tắt để đo đúng chi phí query.
+
+Ví dụ (không cần MySQL):
+  python -m bench.bench_dal --backend sqlite --scales 1e3,1e4,1e5 --out bench_output.json
+  python -m bench.bench_dal --backend sqlite --baseline bench_output.json --out new.json
+MySQL: --backend mysql (dùng DB trong .env — DỮ LIỆU SẼ BỊ XOÁ, chỉ dùng DB test).
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+APP_BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(APP_BASE, "bench", ".data")
+
+
+def _scale_shape(target_logs: int) -> Tuple[int, int]:
+    """target số log -> (employees, months)."""
+    from .gen_data import estimate_logs
+    months = 1 if target_logs <= 10_000 else 6 if target_logs <= 1_000_000 else 24
+    employees = max(10, round(target_logs / max(estimate_logs(1, months), 1)))
+    return employees, months
+
+
+def _cases(today: date) -> List[Tuple[str, Callable[[], Any]]]:
+    from db import attendance_dal as dal
+    y, m = today.year, today.month
+    d = today - timedelta(days=1)
+    return [
+        ("list_employees", lambda: dal.list_employees(active_only=False)),
+        ("search_employees", lambda: dal.search_employees("nguyen")),
+        ("list_logs_by_date_with_flag", lambda: dal.list_logs_by_date_with_flag(d)),
+        ("today_summary", lambda: dal.today_summary(d.isoformat())),
+        ("monthly_summary", lambda: dal.monthly_summary(y, m)),
+        ("count_logs_in_month", lambda: dal.count_logs_in_month(y, m)),
+        ("present_counts_by_day", lambda: dal.present_counts_by_day(y, m)),
+        ("count_day", lambda: dal.count_day(d)),
+        ("get_daily_stack_plus_30d", lambda: dal.get_daily_stack_plus(today - timedelta(days=30), today)),
+        ("get_range_checkio_7d", lambda: dal.get_range_checkio(today - timedelta(days=7), today)),
+        ("get_day_checkio", lambda: dal.get_day_checkio(d)),
+        ("get_day_roster", lambda: dal.get_day_roster(d)),
+        ("get_day_rosters_inout", lambda: dal.get_day_rosters_inout(d)),
+        ("get_day_rosters_plus", lambda: dal.get_day_rosters_plus(d)),
+        ("get_monthly_employee_summary", lambda: dal.get_monthly_employee_summary(1, y, m)),
+        ("search_logs_by_employee", lambda: dal.search_logs_by_employee("20000001")),
+        ("search_logs_by_employee_name", lambda: dal.search_logs_by_employee("minh")),
+    ]
+
+
+def _time(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    fn()   # warm-up (prepare / page cache)
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return {"min_ms": round(min(samples), 3), "median_ms": round(statistics.median(samples), 3)}
+
+
+def run_scale(target: int, backend: str, repeat: int, seed: int) -> Dict[str, Any]:
+    from .gen_data import load
+    employees, months = _scale_shape(target)
+    if backend == "sqlite":
+        path = os.path.join(DATA_DIR, f"scale_{target}.sqlite")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        os.environ["SQLITE_PATH"] = path
+
+    print(f"[BENCH] scale {target:,}: {employees:,} employees x {months} months ...")
+    info = load(employees, months, seed=seed, reset=(backend == "mysql"), progress=False)
+    print(f"[BENCH]   loaded {info['logs']:,} logs in {info['seconds']}s")
+
+    results = []
+    for name, fn in _cases(date.today()):
+        try:
+            r = _time(fn, repeat)
+        except Exception as e:
+            r = {"error": repr(e)}
+        results.append({"scale": target, "logs": info["logs"], "fn": name, **r})
+        if "error" in r:
+            print(f"  {name:32s} ERROR {r['error']}")
+        else:
+            print(f"  {name:32s} {r['median_ms']:10.2f} ms")
+    return {"scale": target, "load": info, "results": results}
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, threshold: float) -> List[Dict[str, Any]]:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    old = {(r["scale"], r["fn"]): r for s in base.get("scales", []) for r in s["results"] if "median_ms" in r}
+    out = []
+    for r in results:
+        b = old.get((r["scale"], r["fn"]))
+        if not b or "median_ms" not in r or b["median_ms"] <= 0:
+            continue
+        ratio = r["median_ms"] / b["median_ms"]
+        if ratio > 1.0 + threshold:
+            out.append({"scale": r["scale"], "fn": r["fn"], "baseline_ms": b["median_ms"],
+                        "median_ms": r["median_ms"], "ratio": round(ratio, 2)})
+    return out
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark db/attendance_dal.py")
+    ap.add_argument("--backend", choices=("sqlite", "mysql"), default="sqlite")
+    ap.add_argument("--scales", default="1e3,1e4,1e5", help="số log mục tiêu, ngăn cách bằng dấu phẩy (1e3..1e7)")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", default=os.path.join(APP_BASE, "bench_output.json"))
+    ap.add_argument("--baseline", default=None, help="JSON của lần đo trước để so sánh")
+    ap.add_argument("--threshold", type=float, default=0.25, help="chậm hơn baseline quá tỉ lệ này => regression")
+    args = ap.parse_args(argv)
+
+    # phải set trước khi import db.*
+    os.environ["DB_BACKEND"] = args.backend
+    os.environ["DAL_CACHE"] = "0"
+    os.environ["DAY_CACHE"] = "0"
+    os.makedirs(DATA_DIR, exist_ok=True)
+    if APP_BASE not in sys.path:
+        sys.path.insert(0, APP_BASE)
+
+    scales = [int(float(s)) for s in args.scales.split(",") if s.strip()]
+    report: Dict[str, Any] = {
+        "meta": {
+            "backend": args.backend,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "scales": [run_scale(s, args.backend, args.repeat, args.seed) for s in scales],
+    }
+
+    regressions: List[Dict[str, Any]] = []
+    if args.baseline:
+        flat = [r for s in report["scales"] for r in s["results"]]
+        regressions = compare(flat, args.baseline, args.threshold)
+        report["baseline"] = args.baseline
+    report["regressions"] = regressions
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[BENCH] wrote {args.out}")
+
+    for r in regressions:
+        print(f"[REGRESSION] {r['fn']} @ {r['scale']:,}: {r['baseline_ms']} -> {r['median_ms']} ms (x{r['ratio']})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+# bench/gen_data.py
+"""
+Sinh dữ liệu chấm công giả lập cho benchmark.
+
+- N nhân viên: hire_date rải trong khoảng, ~12% nghỉ việc (end_date, active=0)
+- M tháng log, chỉ ngày làm việc (T2–T6):
+    * ~92% đi làm; giờ vào dồn cục quanh 07:20–07:50 (hàng người qua cổng)
+    * ~12% đi muộn (08:00–09:30)
+    * quét lại trong vài giây (turnstile), giờ ra quanh 17:00
+    * ~3% có lượt quét ngoài ca (sáng sớm / tối)
+- Nạp bằng multi-row INSERT theo chunk qua db_conn (MySQL hoặc DB_BACKEND=sqlite)
+
+Ví dụ:
+  DB_BACKEND=sqlite SQLITE_PATH=bench/.data/demo.sqlite \\
+      python -m bench.gen_data --employees 500 --months 6 --reset
+"""
+from __future__ import annotations
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta, time as dtime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+CHUNK = 5000
+WORKDAYS = (0, 1, 2, 3, 4)
+
+P_ATTEND = 0.92
+P_LATE = 0.12
+P_RESCAN = 0.25
+P_CHECKOUT = 0.85
+P_OUT_OF_SHIFT = 0.03
+P_RESIGN = 0.12
+
+_FIRST = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Võ", "Đặng", "Bùi", "Đỗ"]
+_MIDDLE = ["Văn", "Thị", "Đức", "Minh", "Ngọc", "Quang", "Thanh", "Hữu", "Gia", "Bảo"]
+_LAST = ["An", "Bình", "Châu", "Dũng", "Giang", "Hà", "Hải", "Hùng", "Khánh", "Lan",
+         "Linh", "Long", "Mai", "Nam", "Phúc", "Quân", "Sơn", "Tâm", "Trang", "Tuấn"]
+
+
+def _add_months(d: date, months: int) -> date:
+    y, m = divmod(d.month - 1 + months, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+def make_employees(n: int, start: date, end: date, rng: random.Random) -> List[Dict]:
+    span = max((end - start).days, 1)
+    out = []
+    for i in range(n):
+        # 70% có mặt từ đầu kỳ, còn lại vào rải rác
+        hire = start - timedelta(days=rng.randint(0, 365)) if rng.random() < 0.7 \
+            else start + timedelta(days=rng.randint(0, span))
+        end_date = None
+        if rng.random() < P_RESIGN and hire < end:
+            end_date = hire + timedelta(days=rng.randint(30, max(31, (end - hire).days)))
+            if end_date >= end:
+                end_date = None
+        out.append({
+            "student_id": 20000000 + i,
+            "full_name": f"{rng.choice(_FIRST)} {rng.choice(_MIDDLE)} {rng.choice(_LAST)}",
+            "email": None,
+            "phone": None,
+            "hire_date": hire,
+            "end_date": end_date,
+            "active": 0 if end_date else 1,
+        })
+    return out
+
+
+def _at(d: date, minutes: float) -> datetime:
+    return datetime.combine(d, dtime.min) + timedelta(seconds=int(minutes * 60))
+
+
+def iter_logs(employees: List[Dict], eids: List[int], start: date, end: date,
+              rng: random.Random) -> Iterator[Tuple[int, datetime]]:
+    """(employee_id, detected_at) theo thứ tự ngày."""
+    d = start
+    while d < end:
+        if d.weekday() in WORKDAYS:
+            for emp, eid in zip(employees, eids):
+                if emp["hire_date"] > d or (emp["end_date"] and emp["end_date"] < d):
+                    continue
+                if rng.random() < P_OUT_OF_SHIFT:
+                    early = rng.random() < 0.5
+                    yield eid, _at(d, rng.uniform(300, 415) if early else rng.uniform(1025, 1260))
+                if rng.random() > P_ATTEND:
+                    continue
+                if rng.random() < P_LATE:
+                    cin = rng.uniform(481, 570)
+                else:
+                    cin = min(max(rng.gauss(455, 9), 420), 479)   # 07:00–07:59, dồn quanh 07:35
+                yield eid, _at(d, cin)
+                if rng.random() < P_RESCAN:
+                    yield eid, _at(d, cin + rng.uniform(0.05, 0.5))
+                if rng.random() < P_CHECKOUT:
+                    yield eid, _at(d, min(rng.gauss(1000, 12), 1019))   # ra trước 17:00
+        d += timedelta(days=1)
+
+
+def estimate_logs(n_employees: int, months: int) -> int:
+    per_day = P_ATTEND * (1 + P_RESCAN + P_CHECKOUT) + P_OUT_OF_SHIFT
+    return int(n_employees * months * 21.7 * per_day * 0.9)
+
+
+# ===================== load =====================
+def reset_tables():
+    from db.db_conn import execute
+    for sql in ("SET FOREIGN_KEY_CHECKS=0", "TRUNCATE TABLE attendance_logs", "TRUNCATE TABLE faces",
+                "DELETE FROM employees", "ALTER TABLE employees AUTO_INCREMENT = 1",
+                "SET FOREIGN_KEY_CHECKS=1"):
+        execute(sql)
+
+
+def load(n_employees: int, months: int, seed: int = 42, end: Optional[date] = None,
+         reset: bool = False, progress: bool = True) -> Dict[str, int]:
+    """Sinh + nạp. Trả về {employees, logs, seconds}."""
+    from db.db_conn import get_conn
+    from db.bulk_import import bulk_import_employees
+    from db.attendance_dal import invalidate_cache
+
+    rng = random.Random(seed)
+    end = end or date.today()
+    start = _add_months(date(end.year, end.month, 1), -months)
+    t0 = time.perf_counter()
+
+    if reset:
+        reset_tables()
+
+    employees = make_employees(n_employees, start, end, rng)
+    for i, e in enumerate(employees):
+        e["line"] = i + 2
+    bulk_import_employees(employees, {"has_hire": True, "has_end": True, "has_act": True},
+                          upsert=True, chunk_size=CHUNK)
+
+    from db.db_conn import fetch_all
+    eid_of = {int(r["student_id"]): int(r["employee_id"])
+              for r in fetch_all("SELECT student_id, employee_id FROM employees")}
+    eids = [eid_of[e["student_id"]] for e in employees]
+
+    n_logs = 0
+    buf: List[Tuple[int, datetime]] = []
+
+    def _flush():
+        with get_conn() as cn:
+            cur = cn.cursor()
+            cur.execute(
+                "INSERT INTO attendance_logs(employee_id, detected_at) VALUES "
+                + ",".join(["(%s,%s)"] * len(buf)),
+                [v for row in buf for v in row],
+            )
+            cur.close()
+        buf.clear()
+
+    for row in iter_logs(employees, eids, start, end, rng):
+        buf.append(row)
+        if len(buf) >= CHUNK:
+            n_logs += len(buf)
+            _flush()
+            if progress and n_logs % (CHUNK * 20) == 0:
+                print(f"  ... {n_logs:,} logs")
+    if buf:
+        n_logs += len(buf)
+        _flush()
+
+    invalidate_cache()
+    return {"employees": n_employees, "logs": n_logs, "seconds": round(time.perf_counter() - t0, 2)}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Sinh dữ liệu chấm công giả lập")
+    ap.add_argument("--employees", type=int, default=200)
+    ap.add_argument("--months", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--reset", action="store_true", help="xoá sạch employees/logs/faces trước khi nạp")
+    args = ap.parse_args(argv)
+
+    print(f"[GEN] ~{estimate_logs(args.employees, args.months):,} logs dự kiến")
+    res = load(args.employees, args.months, seed=args.seed, reset=args.reset)
+    print(f"[GEN] {res['employees']:,} employees, {res['logs']:,} logs in {res['seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
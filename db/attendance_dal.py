@@ -1,10 +1,155 @@
 #db/attendance_dal.py
 from __future__ import annotations
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import date, timedelta
-from .db_conn import fetch_all, fetch_one, execute
+from .db_conn import fetch_all, fetch_one, execute, DB_BACKEND
+from .day_cache import get_store as _day_store, is_closed as _is_closed
 from datetime import date, datetime, time as dtime
 import calendar
+import copy
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+# =========================================================
+# ================= Read cache (TTL + LRU) ================
+# =========================================================
+# Các hàm đọc được memoize theo (args, kwargs). Mỗi hàm gắn với 1 hoặc nhiều
+# "tag" (employees / faces / logs); hàm ghi gọi _invalidate(tag) để xoá sạch
+# cache của các hàm phụ thuộc. TTL chỉ là lưới an toàn cho thay đổi từ ngoài app.
+# Tắt hẳn: DAL_CACHE=0 trong .env
+
+_CACHE_ENABLED = os.getenv("DAL_CACHE", "1") != "0"
+_cache_lock = threading.Lock()
+_cache_gen: Dict[str, int] = {}             # tag -> generation (tăng mỗi lần invalidate)
+_cache_funcs: List["_FuncCache"] = []
+_change_listeners: List[Any] = []          # fn(tags) gọi sau mỗi lần invalidate
+
+
+class _FuncCache:
+    def __init__(self, name: str, tags: tuple, ttl: float, maxsize: int):
+        self.name = name
+        self.tags = tags
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.data: "OrderedDict[Any, tuple]" = OrderedDict()   # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+
+
+def _cached(*tags: str, ttl: float = 30.0, maxsize: int = 128):
+    """
+    Memoize hàm đọc. Kết quả trả ra luôn là bản copy để caller sửa thoải mái
+    (UI hay làm dict(r) / r["x"] = ...) mà không làm bẩn cache.
+    """
+    def deco(fn):
+        fc = _FuncCache(fn.__name__, tags, ttl, maxsize)
+        _cache_funcs.append(fc)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _CACHE_ENABLED:
+                return fn(*args, **kwargs)
+            try:
+                key = (args, tuple(sorted(kwargs.items())))
+                hash(key)
+            except TypeError:
+                return fn(*args, **kwargs)
+
+            now = time.monotonic()
+            with _cache_lock:
+                hit = fc.data.get(key)
+                if hit is not None and hit[0] > now:
+                    fc.data.move_to_end(key)
+                    fc.hits += 1
+                    return copy.deepcopy(hit[1])
+                fc.misses += 1
+                gen = tuple(_cache_gen.get(t, 0) for t in tags)
+
+            value = fn(*args, **kwargs)
+
+            with _cache_lock:
+                # có ghi xen giữa lúc query -> kết quả có thể đã cũ, không lưu
+                if gen == tuple(_cache_gen.get(t, 0) for t in tags):
+                    fc.data[key] = (time.monotonic() + fc.ttl, value)
+                    fc.data.move_to_end(key)
+                    while len(fc.data) > fc.maxsize:
+                        fc.data.popitem(last=False)
+            return copy.deepcopy(value)
+
+        wrapper.cache_info = fc
+        return wrapper
+    return deco
+
+
+def _invalidate(*tags: str):
+    with _cache_lock:
+        for t in tags:
+            _cache_gen[t] = _cache_gen.get(t, 0) + 1
+        for fc in _cache_funcs:
+            if any(t in fc.tags for t in tags):
+                fc.data.clear()
+    # sửa employees (hire_date/end_date/active) làm thay đổi cả các ngày đã đóng
+    if "employees" in tags:
+        _clear_closed_days()
+    for fn in list(_change_listeners):
+        try:
+            fn(tags)
+        except Exception as e:
+            print(f"[DAL] change listener error: {e}")
+
+
+def subscribe_changes(fn):
+    """
+    Đăng ký fn(tags) nhận sự kiện "dữ liệu đã đổi" (tags ⊆ employees/faces/logs).
+    fn chạy trên thread vừa ghi (thường là DB worker) => phải nhẹ, không đụng Tk.
+    """
+    if fn not in _change_listeners:
+        _change_listeners.append(fn)
+
+
+def _clear_closed_days():
+    store = _day_store()
+    if store is not None:
+        store.clear()
+
+
+def invalidate_days(days):
+    """
+    Log ghi vào ngày đã đóng (vd. replay hàng đợi offline với detected_at cũ):
+    chỉ bỏ cache của đúng các ngày đó + bucket rollup tuần/tháng chứa chúng.
+    """
+    store = _day_store()
+    days = {_as_date(d) for d in days}
+    if store is None or not days:
+        return
+    store.discard(days)
+    store.discard({d - timedelta(days=d.weekday()) for d in days}, kinds=("rollup_week",))
+    store.discard({d.replace(day=1) for d in days}, kinds=("rollup_month",))
+
+
+def invalidate_cache(*tags: str):
+    """
+    Xoá cache đọc. Không truyền tag => xoá tất cả.
+    Dùng sau các câu lệnh ghi chạy thẳng qua db_conn.execute (ngoài DAL).
+    """
+    tags = tags or ("employees", "faces", "logs")
+    _invalidate(*tags)
+    # ghi log từ ngoài DAL có thể chạm tới ngày cũ (insert_attendance_log thì không)
+    if "logs" in tags and "employees" not in tags:
+        _clear_closed_days()
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """{ten_ham: {hits, misses, size}} — để debug / bench."""
+    with _cache_lock:
+        return {
+            fc.name: {"hits": fc.hits, "misses": fc.misses, "size": len(fc.data)}
+            for fc in _cache_funcs
+        }
 
 
 # =========================================================
@@ -18,16 +163,19 @@ def add_employee(
     hire_date: date | None = None,
 ) -> int:
     if hire_date is None:
-        return execute(
+        new_id = execute(
             "INSERT INTO employees(student_id, full_name, email, phone) VALUES (%s, %s, %s, %s)",
             (student_id, full_name, email, phone),
         )
+    else:
+        new_id = execute(
+            "INSERT INTO employees(student_id, full_name, email, phone, hire_date) VALUES (%s, %s, %s, %s, %s)",
+            (student_id, full_name, email, phone, hire_date),
+        )
+    _invalidate("employees")
+    return new_id
 
-    return execute(
-        "INSERT INTO employees(student_id, full_name, email, phone, hire_date) VALUES (%s, %s, %s, %s, %s)",
-        (student_id, full_name, email, phone, hire_date),
-    )
-
+@_cached("employees", ttl=60)
 def list_employees(active_only: bool = True)->List[Dict[str,Any]]:
     if active_only:
         sql = ("SELECT employee_id, student_id, full_name, email, phone, hire_date, end_date, active "
@@ -39,14 +187,22 @@ def list_employees(active_only: bool = True)->List[Dict[str,Any]]:
                "FROM employees ORDER BY employee_id ASC")
         return fetch_all(sql, ())
 
+@_cached("faces", ttl=60)
 def get_face(employee_id:int)->Optional[Dict[str,Any]]:
     row = fetch_one("SELECT * FROM faces WHERE employee_id=%s", (employee_id,))
     if not row:
         return None
     return {"image_path": row["image_path"]}
 
+@_cached("faces", ttl=60)
+def list_face_employee_ids()->set:
+    """Tập employee_id đã có ảnh khuôn mặt (1 query thay cho get_face từng dòng)."""
+    rows = fetch_all("SELECT employee_id FROM faces WHERE image_path IS NOT NULL AND image_path<>''", ())
+    return {int(r["employee_id"]) for r in rows}
+
 def delete_face_row(employee_id: int):
     execute("DELETE FROM faces WHERE employee_id=%s", (employee_id,))
+    _invalidate("faces")
 
 def upsert_face(employee_id:int, image_path:str)->int:
     last_id = execute(
@@ -54,6 +210,7 @@ def upsert_face(employee_id:int, image_path:str)->int:
         "ON DUPLICATE KEY UPDATE image_path=VALUES(image_path)",
         (employee_id, image_path)
     )
+    _invalidate("faces")
     if last_id:
         return last_id
     row = fetch_one("SELECT face_id FROM faces WHERE employee_id=%s", (employee_id,))
@@ -70,7 +227,9 @@ def deactivate_employee(employee_id: int, end_date=None):
     else:
         execute("UPDATE employees SET end_date=%s, active=0 WHERE employee_id=%s",
                 (end_date, employee_id))
+    _invalidate("employees")
 
+@_cached("employees", ttl=30)
 def search_employees(q:str, status:str="all"):
     like = f"%{q}%"
     sql = ("SELECT * FROM employees WHERE (full_name LIKE %s OR CAST(student_id AS CHAR) LIKE %s)")
@@ -84,6 +243,7 @@ def search_employees(q:str, status:str="all"):
 # =========================================================
 # =============== Logs: các hàm hiện có ===================
 # =========================================================
+@_cached("logs", "employees", ttl=15)
 def list_logs_by_date(d)->List[Dict[str,Any]]:
     """
     d: datetime.date hoặc 'YYYY-MM-DD'
@@ -104,6 +264,7 @@ def list_logs_by_date(d)->List[Dict[str,Any]]:
     )
 
 # === NEW: có cờ in_shift để UI lọc/tô màu =================
+@_cached("logs", "employees", ttl=15)
 def list_logs_by_date_with_flag(d) -> List[Dict[str, Any]]:
     """
     Trả về log trong 1 ngày và cờ in_shift:
@@ -119,6 +280,7 @@ def list_logs_by_date_with_flag(d) -> List[Dict[str, Any]]:
         (d,)
     )
 
+@_cached("logs", "employees", ttl=15)
 def today_summary(date_str:str)->List[Dict[str,Any]]:
     return fetch_all(
         "SELECT e.employee_id, e.full_name, "
@@ -129,6 +291,7 @@ def today_summary(date_str:str)->List[Dict[str,Any]]:
         (date_str,)
     )
 
+@_cached("logs", "employees", ttl=30)
 def logs_by_employee_month(employee_id:int, year:int, month:int):
     return fetch_all(
         "SELECT a.*, e.full_name FROM attendance_logs a "
@@ -138,6 +301,7 @@ def logs_by_employee_month(employee_id:int, year:int, month:int):
         (employee_id, year, month)
     )
 
+@_cached("logs", "employees", ttl=30)
 def monthly_summary(year:int, month:int):
     sql = """SELECT e.employee_id, e.full_name, DATE(a.detected_at) AS date,
         MIN(a.detected_at) AS first_seen, MAX(a.detected_at) AS last_seen,
@@ -152,14 +316,17 @@ def monthly_summary(year:int, month:int):
 # === New: Ghi log nhận diện với cooldown chống trùng ===
 def insert_attendance_log(employee_id: int) -> int:
     """Ghi 1 log thẳng, trả về last insert id."""
-    return execute(
+    last_id = execute(
         "INSERT INTO attendance_logs(employee_id) VALUES (%s)",
         (employee_id,)
     )
+    _invalidate("logs")
+    return last_id
 
 # =========================================================
 # ================== Quick stats (giữ nguyên) =============
 # =========================================================
+@_cached("employees", ttl=60)
 def count_employees(active_only: bool = True) -> int:
     if active_only:
         row = fetch_one("SELECT COUNT(*) AS c FROM employees WHERE active=1")
@@ -167,14 +334,17 @@ def count_employees(active_only: bool = True) -> int:
         row = fetch_one("SELECT COUNT(*) AS c FROM employees")
     return row["c"] if row else 0
 
+@_cached("faces", ttl=60)
 def count_faces():
     row = fetch_one("SELECT COUNT(*) AS c FROM faces")
     return row["c"] if row else 0
 
+@_cached("logs", ttl=15)
 def count_logs_on_date(d: str):
     row = fetch_one("SELECT COUNT(*) AS c FROM attendance_logs WHERE DATE(detected_at)=%s", (d,))
     return row["c"] if row else 0
 
+@_cached("logs", ttl=15)
 def count_logs_in_month(y: int, m: int):
     row = fetch_one(
         "SELECT COUNT(*) AS c FROM attendance_logs "
@@ -186,6 +356,7 @@ def count_logs_in_month(y: int, m: int):
 # =========================================================
 # === present_counts_by_day: chỉnh theo ca 07:00–17:00 ====
 # =========================================================
+@_cached("logs", "employees", ttl=30)
 def present_counts_by_day(y: int, m: int):
     """
     Đếm DISTINCT employee có log trong khung 07:00–17:00 từng ngày của tháng (local-time).
@@ -211,6 +382,7 @@ def present_counts_by_day(y: int, m: int):
 # ===== New: APIs dùng cho Attendance tabs (UI mới) =======
 # =========================================================
 
+@_cached("logs", "employees", ttl=30)
 def get_daily_stack(d1: date, d2: date) -> List[Dict[str, Any]]:
     """
     Trả về danh sách cho range [d1..d2]:
@@ -253,6 +425,7 @@ def get_daily_stack(d1: date, d2: date) -> List[Dict[str, Any]]:
     return fetch_all(sql, (d1, d2))
 
 
+@_cached("logs", "employees", ttl=15)
 def get_day_rosters(d: date) -> Dict[str, List[Dict[str, Any]]]:
     """
     Cho một ngày d, trả về:
@@ -290,10 +463,15 @@ def get_day_rosters(d: date) -> Dict[str, List[Dict[str, Any]]]:
 
     return {"present": present, "absent": absent}
 
+@_cached("logs", "employees", ttl=15)
 def count_day(d: date) -> Dict[str, int]:
     """
     Trả về dict: { total_active, present, absent } cho ngày d.
     """
+    return _closed_day_cached("count_day", d, dtime.fromisoformat(_SHIFT_END), lambda: _query_count_day(d))
+
+
+def _query_count_day(d: date) -> Dict[str, int]:
     # total_active
     row = fetch_one(
         "SELECT COUNT(*) AS c FROM employees "
@@ -324,6 +502,7 @@ _SHIFT_START   = "07:00:00"
 _SHIFT_END     = "17:00:00"
 _LATE_AFTER    = "08:00:00"
 
+@_cached("logs", "employees", ttl=15)
 def get_day_checkio(d: date) -> List[Dict[str, Any]]:
     """
     Trả về 1 dòng / nhân viên ACTIVE-TRONG-NGÀY:
@@ -372,6 +551,7 @@ def get_day_checkio(d: date) -> List[Dict[str, Any]]:
             r["duration_minutes"] = None
     return rows
 
+@_cached("logs", "employees", ttl=30)
 def get_range_checkio(d1: date, d2: date) -> List[Dict[str, Any]]:
     """
     Range [d1..d2]: trả về nhiều dòng (1 dòng/nhân viên/ngày)
@@ -421,6 +601,7 @@ def get_range_checkio(d1: date, d2: date) -> List[Dict[str, Any]]:
     return rows
 
 # === NEW: Daily stack with LATE count (checkin > 08:00) ======================
+@_cached("logs", "employees", ttl=30)
 def get_daily_stack_plus(d1: date, d2: date):
     """
     Range [d1..d2]:
@@ -429,10 +610,59 @@ def get_daily_stack_plus(d1: date, d2: date):
       - present: có >=1 log trong 07:00–17:00
       - late: số nhân viên có first_seen > 08:00
       - absent = total_active - present
+
+    Ngày đã đóng (trước hôm nay / hôm nay sau 17:00) lấy từ closed-day cache,
+    chỉ phần còn mở (hôm nay trong ca + tương lai) query MySQL.
     """
     if d2 < d1:
         d1, d2 = d2, d1
 
+    store = _day_store()
+    if store is None:
+        return _query_daily_stack_plus(d1, d2)
+
+    shift_end = dtime.fromisoformat(_SHIFT_END)
+    days = [d1 + timedelta(days=i) for i in range((d2 - d1).days + 1)]
+    closed = [d for d in days if _is_closed(d, shift_end)]
+    by_day = store.get_many("daily_stack_plus", closed)
+
+    # ngày đóng chưa có trong cache: query 1 lần cho cả khoảng rồi lưu lại
+    miss = [d for d in closed if d not in by_day]
+    if miss:
+        fresh = {_as_date(r["day"]): r for r in _query_daily_stack_plus(min(miss), max(miss))}
+        store.put_many("daily_stack_plus", {d: fresh[d] for d in miss if d in fresh})
+        by_day.update(fresh)
+
+    open_days = [d for d in days if d not in by_day]
+    if open_days:
+        for r in _query_daily_stack_plus(min(open_days), max(open_days)):
+            by_day[_as_date(r["day"])] = r
+
+    return [by_day[d] for d in days if d in by_day]
+
+
+def _closed_day_cached(kind: str, d: date, shift_end: Optional[dtime], loader):
+    """1 ngày: đã đóng thì đọc/ghi closed-day cache, còn mở thì gọi loader() trực tiếp."""
+    store = _day_store()
+    if store is None or not _is_closed(d, shift_end):
+        return loader()
+    hit = store.get_many(kind, [d])
+    if d in hit:
+        return hit[d]
+    val = loader()
+    store.put_many(kind, {d: val})
+    return val
+
+
+def _as_date(v) -> date:
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    return date.fromisoformat(str(v)[:10])
+
+
+def _query_daily_stack_plus(d1: date, d2: date):
     sql = (
         "WITH RECURSIVE days AS ( "
         "  SELECT CAST(%s AS DATE) AS d "
@@ -443,7 +673,8 @@ def get_daily_stack_plus(d1: date, d2: date):
         "  SELECT DATE(a.detected_at) AS d, a.employee_id, MIN(a.detected_at) AS first_seen "
         "  FROM attendance_logs a "
         "  JOIN employees e ON e.employee_id = a.employee_id "
-        "  WHERE TIME(a.detected_at) BETWEEN '07:00:00' AND '17:00:00' "
+        "  WHERE a.detected_at >= %s AND a.detected_at < CAST(%s AS DATE) + INTERVAL 1 DAY "
+        "    AND TIME(a.detected_at) BETWEEN '07:00:00' AND '17:00:00' "
         "  GROUP BY DATE(a.detected_at), a.employee_id "
         ") "
         "SELECT "
@@ -462,10 +693,11 @@ def get_daily_stack_plus(d1: date, d2: date):
         "GROUP BY days.d "
         "ORDER BY days.d"
     )
-    return fetch_all(sql, (d1, d2))
+    return fetch_all(sql, (d1, d2, d1, d2))
 
 
 # === NEW: By-Day roster with LATE list =======================================
+@_cached("logs", "employees", ttl=15)
 def get_day_rosters_plus(d: date):
     """
     Trả về:
@@ -473,72 +705,75 @@ def get_day_rosters_plus(d: date):
       - absent : {employee_id, student_id, full_name}
       - late   : {employee_id, student_id, full_name, checkin} với checkin > 08:00
     """
-    # Present (distinct by emp in 07:00–17:00)
-    present_sql = (
-        "SELECT DISTINCT e.employee_id, e.student_id, e.full_name "
-        "FROM employees e "
-        "JOIN attendance_logs a ON a.employee_id = e.employee_id "
-        "WHERE DATE(a.detected_at)=%s "
-        "  AND TIME(a.detected_at) BETWEEN '07:00:00' AND '17:00:00' "
-        "  AND e.hire_date <= %s "
-        "  AND (e.end_date IS NULL OR e.end_date >= %s) "
-        "ORDER BY e.employee_id"
-    )
-    present = fetch_all(present_sql, (d, d, d))
+    # 1 lần quét logs của ngày (trước đây 3 query chồng lên nhau)
+    rows = sorted(_scan_day_roster(d), key=lambda r: r["employee_id"])
+    late_after = dtime.fromisoformat(_LATE_AFTER)
 
-    # Absent (active-on-day but no log in shift)
-    absent_sql = (
-        "SELECT e.employee_id, e.student_id, e.full_name "
-        "FROM employees e "
-        "WHERE e.hire_date <= %s "
-        "  AND (e.end_date IS NULL OR e.end_date >= %s) "
-        "  AND NOT EXISTS ( "
-        "        SELECT 1 FROM attendance_logs a "
-        "        WHERE a.employee_id = e.employee_id "
-        "          AND DATE(a.detected_at)=%s "
-        "          AND TIME(a.detected_at) BETWEEN '07:00:00' AND '17:00:00' "
-        "  ) "
-        "ORDER BY e.employee_id"
-    )
-    absent = fetch_all(absent_sql, (d, d, d))
+    def _emp(r):
+        return {"employee_id": r["employee_id"], "student_id": r["student_id"], "full_name": r["full_name"]}
 
-    # Late arrivals (first_seen > 08:00)
-    late_sql = (
-        "SELECT e.employee_id, e.student_id, e.full_name, MIN(a.detected_at) AS checkin "
-        "FROM employees e "
-        "JOIN attendance_logs a ON a.employee_id = e.employee_id "
-        "WHERE DATE(a.detected_at)=%s "
-        "  AND TIME(a.detected_at) BETWEEN '07:00:00' AND '17:00:00' "
-        "  AND e.hire_date <= %s "
-        "  AND (e.end_date IS NULL OR e.end_date >= %s) "
-        "GROUP BY e.employee_id, e.student_id, e.full_name "
-        "HAVING TIME(checkin) > '08:00:00' "
-        "ORDER BY e.employee_id"
-    )
-    late = fetch_all(late_sql, (d, d, d))
+    present, absent, late = [], [], []
+    for r in rows:
+        first = r.get("first_in_shift")
+        if first is None:
+            absent.append(_emp(r))
+            continue
+        present.append(_emp(r))
+        if first.time() > late_after:
+            late.append({**_emp(r), "checkin": first})
 
     return {"present": present, "absent": absent, "late": late}
 
-def get_day_rosters_inout(day: date) -> Dict[str, List[dict]]:
+@_cached("logs", "employees", ttl=15)
+def get_day_roster(day: date) -> Dict[str, Any]:
     """
-    Roster theo ngày (có check_in/check_out):
+    Roster theo ngày + số đếm, 1 query duy nhất (thay cho get_day_rosters_inout + count_day):
     - Lấy toàn bộ nhân viên "thuộc biên chế" trong ngày đó (hire_date <= day <= end_date/NULL)
     - LEFT JOIN logs theo detected_date = day để lấy:
         check_in  = MIN(detected_at)
         check_out = MAX(detected_at) (để trống nếu chỉ có 1 log)
         log_count
     - Phân loại:
-        present: có log và check_in trong ca 07:00–17:00
-        late:    subset của present với check_in > 08:00
+        present: có log (check_in ngoài ca vẫn tính present để không "mất" người)
+        late:    subset của present với check_in trong ca và > 08:00
         absent:  không có log (log_count = 0)
+    - counts: {total_active, present, absent, late} — present/absent theo log TRONG ca
+      07:00–17:00, giống hệt count_day()
+
+    check_out lấy cả log ngoài ca, nên chỉ cache khi ngày đã qua hẳn (day < hôm nay).
     """
+    return _closed_day_cached("day_roster", day, None, lambda: _build_day_roster(_scan_day_roster(day)))
 
-    # Ca làm việc bạn đang dùng ở UI
-    SHIFT_START = dtime(7, 0, 0)
-    SHIFT_END   = dtime(17, 0, 0)
-    LATE_AFTER  = dtime(8, 0, 0)
 
-    sql = """
+@_cached("logs", "employees", ttl=15)
+def get_day_rosters_inout(day: date) -> Dict[str, List[dict]]:
+    """Giữ API cũ: chỉ present/absent/late của get_day_roster()."""
+    r = get_day_roster(day)
+    return {"present": r["present"], "absent": r["absent"], "late": r["late"]}
+
+
+def _to_dt(v) -> Optional[datetime]:
+    # db layer đôi lúc trả string, đôi lúc trả datetime
+    if v is None:
+        return None
+    if isinstance(v, datetime):
+        return v
+    if isinstance(v, str):
+        # MySQL thường: "YYYY-mm-dd HH:MM:SS"
+        try:
+            return datetime.strptime(v, "%Y-%m-%d %H:%M:%S")
+        except Exception:
+            try:
+                # fallback có microseconds
+                return datetime.fromisoformat(v)
+            except Exception:
+                return None
+    return None
+
+
+def _scan_day_roster(day: date) -> List[dict]:
+    """1 dòng / nhân viên thuộc biên chế ngày `day`, kèm check_in/check_out/log_count/first_in_shift."""
+    sql = f"""
     SELECT
         e.employee_id,
         e.student_id,
@@ -548,7 +783,9 @@ def get_day_rosters_inout(day: date) -> Dict[str, List[dict]]:
         e.end_date,
         MIN(l.detected_at) AS check_in,
         MAX(l.detected_at) AS check_out,
-        COUNT(l.log_id)    AS log_count
+        COUNT(l.log_id)    AS log_count,
+        MIN(CASE WHEN TIME(l.detected_at) BETWEEN '{_SHIFT_START}' AND '{_SHIFT_END}'
+                 THEN l.detected_at END) AS first_in_shift
     FROM employees e
     LEFT JOIN attendance_logs l
         ON l.employee_id = e.employee_id
@@ -562,26 +799,17 @@ def get_day_rosters_inout(day: date) -> Dict[str, List[dict]]:
     ORDER BY
         e.student_id ASC;
     """
-
     rows = fetch_all(sql, (day, day, day)) or []
+    for r in rows:
+        r["first_in_shift"] = _to_dt(r.get("first_in_shift"))
+    return rows
 
-    def _to_dt(v) -> Optional[datetime]:
-        # db layer đôi lúc trả string, đôi lúc trả datetime
-        if v is None:
-            return None
-        if isinstance(v, datetime):
-            return v
-        if isinstance(v, str):
-            # MySQL thường: "YYYY-mm-dd HH:MM:SS"
-            try:
-                return datetime.strptime(v, "%Y-%m-%d %H:%M:%S")
-            except Exception:
-                try:
-                    # fallback có microseconds
-                    return datetime.fromisoformat(v)
-                except Exception:
-                    return None
-        return None
+
+def _build_day_roster(rows: List[dict]) -> Dict[str, Any]:
+    # Ca làm việc bạn đang dùng ở UI
+    SHIFT_START = dtime.fromisoformat(_SHIFT_START)
+    SHIFT_END   = dtime.fromisoformat(_SHIFT_END)
+    LATE_AFTER  = dtime.fromisoformat(_LATE_AFTER)
 
     def _fmt(v: Optional[datetime]) -> str:
         return "" if not v else v.strftime("%Y-%m-%d %H:%M:%S")
@@ -589,11 +817,14 @@ def get_day_rosters_inout(day: date) -> Dict[str, List[dict]]:
     present: List[dict] = []
     late: List[dict] = []
     absent: List[dict] = []
+    present_in_shift = 0
 
     for r in rows:
         cin = _to_dt(r.get("check_in"))
         cout = _to_dt(r.get("check_out"))
         cnt = int(r.get("log_count") or 0)
+        if r.pop("first_in_shift", None) is not None:
+            present_in_shift += 1
 
         # Nếu chỉ có 1 log -> check_out để trống
         if cnt <= 1:
@@ -621,38 +852,120 @@ def get_day_rosters_inout(day: date) -> Dict[str, List[dict]]:
             # (nếu muốn strict ca 07-17 thì comment 2 dòng dưới và cho vào absent)
             present.append(r)
 
-    return {"present": present, "absent": absent, "late": late}
-
+    total = len(rows)
+    counts = {
+        "total_active": total,
+        "present": present_in_shift,
+        "absent": max(total - present_in_shift, 0),
+        "late": len(late),
+    }
+    return {"present": present, "absent": absent, "late": late, "counts": counts}
+
+# ---------- search logs theo nhân viên ----------
+# 2 bước thay cho JOIN + LIKE trên toàn bộ attendance_logs:
+#   1) q -> danh sách employee_id (bảng employees nhỏ; tên dùng FULLTEXT ngram)
+#   2) logs WHERE employee_id IN (...) + khoảng detected_at sargable,
+#      keyset pagination (detected_at, log_id) giảm dần
+LOG_SEARCH_PAGE = int(os.getenv("LOG_SEARCH_PAGE", "200"))
+_EMP_MATCH_MAX = 1000           # q quá chung chung => chỉ lấy tối đa ngần này nhân viên (truncated=True)
+_NGRAM_TOKEN_SIZE = 2           # = ngram_token_size mặc định của MySQL
+_ER_FT_MATCHING_KEY_NOT_FOUND = 1191
+_fulltext_ok = DB_BACKEND == "mysql"   # DB cũ chưa có ft_emp_name / SQLite => LIKE
+
+
+@_cached("employees", ttl=30)
+def resolve_employee_ids(q: str) -> Tuple[List[int], bool]:
+    """
+    q: student_id (chuỗi số) hoặc 1 phần họ tên (không phân biệt hoa thường / dấu
+    theo collation utf8mb4_unicode_ci).
+    Trả về (employee_id tăng dần, truncated): truncated=True khi khớp quá _EMP_MATCH_MAX
+    nhân viên => danh sách bị cắt, caller nên báo user thu hẹp từ khoá.
+    """
+    global _fulltext_ok
+    q = (q or "").strip()
+    if not q:
+        return [], False
+
+    conds, params = [], []
+    if q.isdigit():
+        conds.append("CAST(student_id AS CHAR) LIKE %s")
+        params.append(f"%{q}%")
+
+    phrase = q.replace('"', " ").strip()
+    if _fulltext_ok and len(phrase) >= _NGRAM_TOKEN_SIZE:
+        # phrase search trên ngram = "chứa chuỗi" giống LIKE '%q%' nhưng đi index
+        name_sql = "MATCH(full_name) AGAINST (%s IN BOOLEAN MODE)"
+        name_params = [f'"{phrase}"']
+    else:
+        name_sql = "full_name LIKE %s"
+        name_params = [f"%{q}%"]
+
+    def _run(name_cond, name_args):
+        sql = ("SELECT employee_id FROM employees WHERE "
+               + " OR ".join(conds + [name_cond])
+               + " ORDER BY employee_id LIMIT %s")
+        # lấy dư 1 dòng để biết có bị cắt hay không
+        return fetch_all(sql, tuple(params + name_args + [_EMP_MATCH_MAX + 1]))
+
+    try:
+        rows = _run(name_sql, name_params)
+    except Exception as e:
+        if getattr(e, "errno", None) != _ER_FT_MATCHING_KEY_NOT_FOUND:
+            raise
+        print("[DAL] employees.ft_emp_name chưa có (xem db/create_tables.sql) -> dùng LIKE")
+        _fulltext_ok = False
+        rows = _run("full_name LIKE %s", [f"%{q}%"])
+    truncated = len(rows) > _EMP_MATCH_MAX
+    return [int(r["employee_id"]) for r in rows[:_EMP_MATCH_MAX]], truncated
+
+
+@_cached("logs", "employees", ttl=15)
 def search_logs_by_employee(
     q: str,
     date_from=None,
-    date_to=None
+    date_to=None,
+    limit: int = LOG_SEARCH_PAGE,
+    after: Optional[tuple] = None,
 ):
     """
-    q: student_id hoặc full_name (LIKE)
+    q: student_id hoặc full_name (xem resolve_employee_ids)
+    date_from / date_to: date | 'YYYY-MM-DD', tính cả 2 đầu
+    Trả về {"rows": tối đa `limit` log mới nhất trước, "truncated": bool}.
+    truncated=True: q khớp quá _EMP_MATCH_MAX nhân viên, rows chỉ gồm log của
+    _EMP_MATCH_MAX nhân viên đầu tiên => UI nên báo "thu hẹp từ khoá".
+    Trang kế: after=(detected_at, log_id) của dòng cuối trang trước (keyset, không OFFSET).
     """
-    like = f"%{q}%"
+    eids, truncated = resolve_employee_ids(q)
+    if not eids:
+        return {"rows": [], "truncated": truncated}
 
     sql = (
         "SELECT a.log_id, a.employee_id, e.student_id, e.full_name, a.detected_at "
         "FROM attendance_logs a "
         "JOIN employees e ON e.employee_id = a.employee_id "
-        "WHERE (CAST(e.student_id AS CHAR) LIKE %s OR e.full_name LIKE %s)"
+        f"WHERE a.employee_id IN ({','.join(['%s'] * len(eids))})"
     )
-    params = [like, like]
+    params: List[Any] = list(eids)
 
+    # so sánh trực tiếp trên detected_at (không bọc DATE()) => dùng được index
     if date_from:
-        sql += " AND DATE(a.detected_at) >= %s"
-        params.append(date_from)
-
+        sql += " AND a.detected_at >= %s"
+        params.append(datetime.combine(_as_date(date_from), dtime.min))
     if date_to:
-        sql += " AND DATE(a.detected_at) <= %s"
-        params.append(date_to)
+        sql += " AND a.detected_at < %s"
+        params.append(datetime.combine(_as_date(date_to) + timedelta(days=1), dtime.min))
+
+    if after:
+        ts, last_id = after
+        sql += " AND (a.detected_at < %s OR (a.detected_at = %s AND a.log_id < %s))"
+        params.extend([ts, ts, last_id])
 
-    sql += " ORDER BY a.detected_at DESC"
+    sql += " ORDER BY a.detected_at DESC, a.log_id DESC LIMIT %s"
+    params.append(int(limit))
 
-    return fetch_all(sql, tuple(params))
+    return {"rows": fetch_all(sql, tuple(params)), "truncated": truncated}
 
+@_cached("logs", "employees", ttl=30)
 def get_monthly_employee_summary(employee_id: int, year: int, month: int) -> dict:
     first_day = date(year, month, 1)
     last_day = date(year, month, calendar.monthrange(year, month)[1])
@@ -707,6 +1020,7 @@ def get_monthly_employee_summary(employee_id: int, year: int, month: int) -> dic
     }
 
 
+@_cached("employees", ttl=60)
 def get_employee_dates(employee_id: int) -> dict:
     """
     Trả về { hire_date: date, end_date: date|None }
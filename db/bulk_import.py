@@ -0,0 +1,256 @@
+# db/bulk_import.py
+"""
+Bulk import nhân viên từ CSV.
+
+Thay cho cách cũ (mỗi dòng: fetch_one + UPDATE/INSERT + fetch_one + upsert_face,
+3–4 connection/dòng):
+  1) đọc CSV 1 lượt -> list record đã chuẩn hoá
+  2) 1 query lấy toàn bộ student_id đã có
+  3) multi-row INSERT ... ON DUPLICATE KEY UPDATE theo chunk
+  4) đọc lại employee_id theo chunk, gắn ảnh (faces) theo chunk
+Tất cả trong 1 connection / 1 transaction: lỗi giữa chừng => rollback, không
+để lại dữ liệu dở dang (ảnh face_resolver đã copy: caller dọn qua on_rollback).
+
+Hàm chạy được trên worker thread; tiến độ báo qua callback progress(phase, done, total).
+"""
+from __future__ import annotations
+import csv
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .db_conn import get_conn
+from .attendance_dal import invalidate_cache
+
+CHUNK_SIZE = 500
+
+ProgressFn = Callable[[str, int, int], None]
+# [(employee_id, student_id, line_no)] -> [(rel_path | None, error | None)] cùng thứ tự.
+# Gọi 1 lần mỗi chunk để caller xử lý ảnh song song (xem services/face_ingest.py).
+FaceResolver = Callable[[List[Tuple[int, int, int]]], List[Tuple[Optional[str], Optional[BaseException]]]]
+
+
+# ===================== CSV =====================
+def _norm(s) -> str:
+    return (s or "").strip().lower()
+
+
+def parse_date(s: str):
+    s = (s or "").strip()
+    if not s:
+        return None
+    # chịu nhiều format phổ biến
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.strptime(s, fmt).date()
+        except Exception:
+            pass
+    return None
+
+
+def parse_active(s: str):
+    s = (s or "").strip().lower()
+    if s == "":
+        return None
+    if s in ("1", "true", "yes", "active"):
+        return 1
+    if s in ("0", "false", "no", "inactive"):
+        return 0
+    return None
+
+
+def read_employee_csv(path: str) -> Tuple[List[Dict[str, Any]], int, Dict[str, bool]]:
+    """
+    Đọc CSV (UTF-8, có header) 1 lượt.
+    Trả về (records, skipped, cols) với cols = {has_email, has_phone, has_hire, has_end, has_act}.
+    Raise ValueError nếu thiếu cột bắt buộc.
+    """
+    records: List[Dict[str, Any]] = []
+    skipped = 0
+
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        headers = {_norm(h): h for h in (reader.fieldnames or [])}
+
+        need = {"student_id", "full_name"}
+        if not need.issubset(set(headers.keys())):
+            raise ValueError(f"Thiếu cột bắt buộc: {need - set(headers.keys())}")
+
+        cols = {
+            "has_email": "email" in headers,
+            "has_phone": "phone" in headers,
+            "has_hire": "hire_date" in headers,
+            "has_end": "end_date" in headers,
+            "has_act": "active" in headers,
+        }
+        extended = cols["has_hire"] or cols["has_end"] or cols["has_act"]
+
+        for i, row in enumerate(reader, start=2):
+            sid_raw = (row.get(headers["student_id"], "") or "").strip()
+            name    = (row.get(headers["full_name"], "") or "").strip()
+            email   = (row.get(headers["email"], "") or "").strip() if cols["has_email"] else None
+            phone   = (row.get(headers["phone"], "") or "").strip() if cols["has_phone"] else None
+
+            if not sid_raw or not name or not sid_raw.isdigit():
+                skipped += 1
+                continue
+
+            hire_date = parse_date(row.get(headers["hire_date"], "")) if cols["has_hire"] else None
+            end_date  = parse_date(row.get(headers["end_date"], ""))  if cols["has_end"]  else None
+            active_in = parse_active(row.get(headers["active"], ""))  if cols["has_act"]  else None
+
+            # IMPORTANT: resigned (có end_date hoặc active=0) => ép inactive
+            resigned = end_date is not None or (active_in is not None and int(active_in) == 0)
+            final_active = 0 if resigned else (1 if active_in is None else int(active_in))
+
+            # hire_date: CSV mở rộng mà trống/parse fail -> hôm nay; CSV cũ -> để NULL như trước
+            if extended and hire_date is None:
+                hire_date = date.today()
+
+            records.append({
+                "line": i,
+                "student_id": int(sid_raw),
+                "full_name": name,
+                "email": email or None,
+                "phone": phone or None,
+                "hire_date": hire_date,
+                "end_date": end_date,
+                "active": final_active,
+            })
+
+    return records, skipped, cols
+
+
+# ===================== DB =====================
+def _chunks(seq: list, n: int):
+    for i in range(0, len(seq), n):
+        yield seq[i:i + n]
+
+
+def bulk_import_employees(
+    records: List[Dict[str, Any]],
+    cols: Dict[str, bool],
+    upsert: bool = True,
+    face_resolver: Optional[FaceResolver] = None,
+    progress: Optional[ProgressFn] = None,
+    chunk_size: int = CHUNK_SIZE,
+    on_rollback: Optional[Callable[[], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Ghi records (từ read_employee_csv) vào employees (+ faces nếu có face_resolver).
+
+    upsert=True : student_id đã có -> cập nhật full_name/email/phone (+ các cột tuỳ chọn CSV có)
+    upsert=False: student_id đã có -> bỏ qua
+    on_rollback: gọi khi transaction bị rollback (vd. xoá ảnh face_resolver vừa copy vào data/faces)
+
+    Trả về {ok, inserted, updated, skipped, face_ok, errors}.
+    """
+    def _report(phase: str, done: int, total: int):
+        if progress:
+            try:
+                progress(phase, done, total)
+            except Exception:
+                pass
+
+    res: Dict[str, Any] = {"ok": 0, "inserted": 0, "updated": 0, "skipped": 0, "face_ok": 0, "errors": []}
+
+    # cột ON DUPLICATE KEY UPDATE theo đúng cột CSV có (giữ hành vi import cũ)
+    upd_cols = ["full_name", "email", "phone"]
+    if cols.get("has_hire"):
+        upd_cols.append("hire_date")
+    if cols.get("has_end"):
+        upd_cols.append("end_date")
+    if cols.get("has_act") or cols.get("has_end"):
+        upd_cols.append("active")
+    on_dup = ", ".join(f"{c}=VALUES({c})" for c in upd_cols)
+
+    ins_cols = ("student_id", "full_name", "email", "phone", "hire_date", "end_date", "active")
+    row_ph = "(" + ",".join(["%s"] * len(ins_cols)) + ")"
+
+    try:
+        with get_conn() as cn:
+            cur = cn.cursor()
+
+            # 1) student_id đã tồn tại: 1 query
+            _report("prefetch", 0, len(records))
+            cur.execute("SELECT student_id FROM employees")
+            existing = {int(r[0]) for r in cur.fetchall()}
+
+            # 2) lọc theo mode; trùng student_id trong chính file CSV: dòng sau thắng (upsert) / bị bỏ (skip)
+            todo: Dict[int, Dict[str, Any]] = {}
+            for r in records:
+                sid = r["student_id"]
+                if sid in existing or sid in todo:
+                    if not upsert:
+                        res["skipped"] += 1
+                        continue
+                    if sid not in todo:
+                        res["updated"] += 1
+                else:
+                    res["inserted"] += 1
+                todo[sid] = r
+                res["ok"] += 1
+
+            rows = list(todo.values())
+            total = len(rows)
+
+            # 3) ghi employees theo chunk
+            done = 0
+            for part in _chunks(rows, chunk_size):
+                sql = (
+                    f"INSERT INTO employees ({', '.join(ins_cols)}) VALUES "
+                    + ",".join([row_ph] * len(part))
+                )
+                if upsert:
+                    sql += f" ON DUPLICATE KEY UPDATE {on_dup}"
+                params: List[Any] = []
+                for r in part:
+                    params.extend(r[c] for c in ins_cols)
+                cur.execute(sql, params)
+                done += len(part)
+                _report("employees", done, total)
+
+            # 4) gắn ảnh: cần employee_id -> đọc lại theo chunk
+            if face_resolver is not None and rows:
+                face_rows: List[Tuple[int, str]] = []
+                done = 0
+                for part in _chunks(rows, chunk_size):
+                    ph = ",".join(["%s"] * len(part))
+                    cur.execute(
+                        f"SELECT student_id, employee_id FROM employees WHERE student_id IN ({ph})",
+                        [r["student_id"] for r in part],
+                    )
+                    eid_of = {int(s): int(e) for s, e in cur.fetchall()}
+                    batch = [(eid_of[r["student_id"]], r["student_id"], r["line"])
+                             for r in part if eid_of.get(r["student_id"])]
+                    for (eid, _sid, line), (rel, fe) in zip(batch, face_resolver(batch)):
+                        if fe is not None:
+                            res["errors"].append(f"Dòng {line}: {fe}")
+                        elif rel:
+                            face_rows.append((eid, rel))
+                    done += len(part)
+                    _report("faces", done, total)
+
+                for part in _chunks(face_rows, chunk_size):
+                    params = [v for pair in part for v in pair]
+                    cur.execute(
+                        "INSERT INTO faces (employee_id, image_path) VALUES "
+                        + ",".join(["(%s,%s)"] * len(part))
+                        + " ON DUPLICATE KEY UPDATE image_path=VALUES(image_path)",
+                        params,
+                    )
+                res["face_ok"] = len(face_rows)
+
+            cur.close()
+            _report("commit", total, total)
+    except BaseException:
+        if on_rollback is not None:
+            try:
+                on_rollback()
+            except Exception as e:
+                print(f"[BULK_IMPORT] on_rollback error: {e!r}")
+        raise
+    finally:
+        # kể cả rollback: cache đọc có thể đã bị đọc xen giữa
+        invalidate_cache()
+
+    return res
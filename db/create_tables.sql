@@ -29,7 +29,9 @@ CREATE TABLE IF NOT EXISTS employees (
    UNIQUE KEY student_id (student_id),             -- Đảm bảo student_id không trùng
    KEY idx_emp_active (active),                    -- Index cho truy vấn theo trạng thái
    KEY idx_emp_name (full_name),                   -- Index tìm kiếm theo tên
-   KEY idx_emp_dates (hire_date,end_date)          -- Index theo khoảng thời gian
+   KEY idx_emp_dates (hire_date,end_date),         -- Index theo khoảng thời gian
+   FULLTEXT KEY ft_emp_name (full_name) WITH PARSER ngram
+                                                   -- Tìm theo 1 phần họ tên (search logs)
  ) ENGINE=InnoDB 
    DEFAULT CHARSET=utf8mb4 
    COLLATE=utf8mb4_unicode_ci;
@@ -44,10 +46,14 @@ CREATE TABLE IF NOT EXISTS attendance_logs (
                                                     -- Thời điểm hệ thống ghi nhận điểm danh
    detected_date date GENERATED ALWAYS AS (CAST(detected_at AS date)) STORED, 
                                                     -- Ngày điểm danh (tự sinh từ detected_at)
+   client_uid char(32) DEFAULT NULL,                -- ID sinh ở máy trạm (db/log_queue.py), chống ghi trùng khi replay
    PRIMARY KEY (log_id),                            -- Khóa chính
+   UNIQUE KEY uq_logs_client_uid (client_uid),      -- NULL không tính trùng => log cũ / ghi tay vẫn OK
    KEY idx_logs_detected_date (detected_date),     -- Index thống kê theo ngày
    KEY idx_logs_emp_detected_date (employee_id,detected_date), 
                                                     -- Index thống kê theo nhân viên + ngày
+   KEY idx_logs_emp_detected_at (employee_id,detected_at,log_id),
+                                                    -- Search logs theo nhân viên (keyset theo thời gian)
    CONSTRAINT attendance_logs_ibfk_1 
      FOREIGN KEY (employee_id) 
      REFERENCES employees (employee_id) 
@@ -73,3 +79,11 @@ CREATE TABLE IF NOT EXISTS faces (
  ) ENGINE=InnoDB 
    DEFAULT CHARSET=utf8mb4 
    COLLATE=utf8mb4_unicode_ci;
+
+-- =========================================================
+-- Nâng cấp DB đã tạo từ bản cũ (chạy 1 lần)
+-- =========================================================
+-- ALTER TABLE employees ADD FULLTEXT KEY ft_emp_name (full_name) WITH PARSER ngram;
+-- ALTER TABLE attendance_logs ADD KEY idx_logs_emp_detected_at (employee_id,detected_at,log_id);
+-- ALTER TABLE attendance_logs ADD COLUMN client_uid char(32) DEFAULT NULL AFTER detected_date,
+--   ADD UNIQUE KEY uq_logs_client_uid (client_uid);
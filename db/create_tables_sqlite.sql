@@ -0,0 +1,36 @@
+-- =========================================================
+-- Schema cho backend SQLite (DB_BACKEND=sqlite)
+-- Tương đương db/create_tables.sql; db_conn tự chạy file này khi mở DB.
+-- Thời gian lưu dạng text 'YYYY-MM-DD HH:MM:SS' (giờ local, giống TIMESTAMP của MySQL)
+-- =========================================================
+
+CREATE TABLE IF NOT EXISTS employees (
+   employee_id INTEGER PRIMARY KEY AUTOINCREMENT,
+   student_id  INTEGER NOT NULL UNIQUE,
+   full_name   TEXT NOT NULL,
+   email       TEXT DEFAULT NULL,
+   phone       TEXT DEFAULT NULL,
+   hire_date   TEXT DEFAULT NULL,
+   end_date    TEXT DEFAULT NULL,
+   active      INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_emp_active ON employees(active);
+CREATE INDEX IF NOT EXISTS idx_emp_name   ON employees(full_name);
+CREATE INDEX IF NOT EXISTS idx_emp_dates  ON employees(hire_date, end_date);
+
+CREATE TABLE IF NOT EXISTS attendance_logs (
+   log_id        INTEGER PRIMARY KEY AUTOINCREMENT,
+   employee_id   INTEGER NOT NULL REFERENCES employees(employee_id) ON DELETE CASCADE,
+   detected_at   TEXT NOT NULL DEFAULT (datetime('now', 'localtime')),
+   detected_date TEXT GENERATED ALWAYS AS (date(detected_at)) STORED,
+   client_uid    TEXT DEFAULT NULL UNIQUE
+);
+CREATE INDEX IF NOT EXISTS idx_logs_detected_date     ON attendance_logs(detected_date);
+CREATE INDEX IF NOT EXISTS idx_logs_emp_detected_date ON attendance_logs(employee_id, detected_date);
+CREATE INDEX IF NOT EXISTS idx_logs_emp_detected_at   ON attendance_logs(employee_id, detected_at, log_id);
+
+CREATE TABLE IF NOT EXISTS faces (
+   face_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+   employee_id INTEGER NOT NULL UNIQUE REFERENCES employees(employee_id) ON DELETE CASCADE,
+   image_path  TEXT NOT NULL
+);
@@ -0,0 +1,103 @@
+# db/csv_export.py
+"""
+CSV export engine dùng chung (employees / logs / roster / monthly summary).
+
+- rows là iterable bất kỳ (generator từ db_conn.iter_rows, list trong RAM...)
+  -> ghi thẳng ra csv.writer, không gom list => RAM cố định
+- ghi vào file .part rồi os.replace: lỗi giữa chừng không để lại file CSV dở
+- progress(done, total) gọi mỗi PROGRESS_EVERY dòng (total=None nếu không biết trước)
+- chạy được trên worker thread (không đụng Tk)
+"""
+from __future__ import annotations
+import csv
+import os
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from .db_conn import iter_rows
+
+PROGRESS_EVERY = 500
+
+ProgressFn = Callable[[int, Optional[int]], None]
+
+
+def _cell(v: Any) -> Any:
+    if v is None:
+        return ""
+    if isinstance(v, datetime):
+        return str(v.replace(microsecond=0))
+    if isinstance(v, date):
+        return v.isoformat()
+    return v
+
+
+def export_csv(
+    path: str,
+    columns: Sequence[str],
+    rows: Iterable[Dict[str, Any]],
+    header: Optional[Sequence[str]] = None,
+    progress: Optional[ProgressFn] = None,
+    total: Optional[int] = None,
+) -> int:
+    """Ghi rows (dict) theo thứ tự columns. Trả về số dòng đã ghi."""
+    tmp = path + ".part"
+    n = 0
+    try:
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(list(header or columns))
+            for r in rows:
+                w.writerow([_cell(r.get(c, "")) for c in columns])
+                n += 1
+                if progress and n % PROGRESS_EVERY == 0:
+                    progress(n, total)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    if progress:
+        progress(n, total if total is not None else n)
+    return n
+
+
+def export_query(
+    path: str,
+    sql: str,
+    params: Optional[tuple] = None,
+    columns: Optional[Sequence[str]] = None,
+    header: Optional[Sequence[str]] = None,
+    progress: Optional[ProgressFn] = None,
+) -> int:
+    """Stream thẳng kết quả SQL ra CSV (cột mặc định = cột của dòng đầu tiên)."""
+    it = iter_rows(sql, params)
+    if columns is None:
+        first = next(it, None)
+        columns = list(first.keys()) if first else []
+        it = _chain_first(first, it)
+    return export_csv(path, columns, it, header=header, progress=progress)
+
+
+def _chain_first(first, rest):
+    if first is not None:
+        yield first
+    yield from rest
+
+
+# ===================== Presets =====================
+EMPLOYEE_COLUMNS: List[str] = [
+    "employee_id", "student_id", "full_name", "email", "phone", "hire_date", "end_date", "active",
+]
+
+
+def export_employees(path: str, status: str = "all", progress: Optional[ProgressFn] = None) -> int:
+    """status: all | active | inactive (giống filter của People tab)."""
+    sql = f"SELECT {', '.join(EMPLOYEE_COLUMNS)} FROM employees"
+    if status == "active":
+        sql += " WHERE COALESCE(active,1)=1"
+    elif status == "inactive":
+        sql += " WHERE COALESCE(active,1)=0"
+    sql += " ORDER BY employee_id ASC"
+    return export_query(path, sql, (), columns=EMPLOYEE_COLUMNS, progress=progress)
@@ -0,0 +1,188 @@
+# db/day_cache.py
+"""
+Cache cho các ngày đã "đóng" (closed day).
+
+Ngày d được coi là đóng khi:
+  - d < hôm nay, hoặc
+  - d == hôm nay và đã qua giờ kết thúc ca (chỉ với dữ liệu tính theo ca)
+
+Dữ liệu của ngày đóng không đổi trong vận hành bình thường, nên lưu 1 lần
+(RAM + SQLite trên đĩa) và không query MySQL lại nữa. Chỉ bị xoá khi có thay
+đổi lịch sử (sửa employees: hire_date/end_date/active, import CSV, truncate).
+
+File: data/cache/closed_days.sqlite  (đổi bằng DAY_CACHE_PATH, tắt: DAY_CACHE=0)
+"""
+from __future__ import annotations
+import os
+import json
+import sqlite3
+import threading
+from datetime import date, datetime, time as dtime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional
+
+APP_BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_DEFAULT_PATH = os.path.join(APP_BASE, "data", "cache", "closed_days.sqlite")
+
+
+# ---------- JSON (giữ được date/datetime/Decimal từ mysql.connector) ----------
+def _json_default(v):
+    if isinstance(v, datetime):
+        return {"__dt__": v.isoformat()}
+    if isinstance(v, date):
+        return {"__d__": v.isoformat()}
+    if isinstance(v, Decimal):
+        return int(v) if v == v.to_integral_value() else float(v)
+    raise TypeError(f"not JSON serializable: {type(v).__name__}")
+
+
+def _json_hook(o: dict):
+    if len(o) == 1:
+        if "__dt__" in o:
+            return datetime.fromisoformat(o["__dt__"])
+        if "__d__" in o:
+            return date.fromisoformat(o["__d__"])
+    return o
+
+
+class ClosedDayStore:
+    """(kind, day) -> payload. Thread-safe, dùng chung cho mọi DB worker."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("DAY_CACHE_PATH", _DEFAULT_PATH)
+        self._lock = threading.Lock()
+        self._mem: Dict[tuple, Any] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_ok = True
+
+    # ---------- disk ----------
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if self._db is not None or not self._disk_ok:
+            return self._db
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS day_cache ("
+                "  kind TEXT NOT NULL, day TEXT NOT NULL, payload TEXT NOT NULL, "
+                "  PRIMARY KEY (kind, day))"
+            )
+            db.commit()
+            self._db = db
+        except Exception as e:
+            print(f"[DAY_CACHE] disk disabled: {e}")
+            self._disk_ok = False
+        return self._db
+
+    # ---------- public ----------
+    def get_many(self, kind: str, days: Iterable[date]) -> Dict[date, Any]:
+        days = list(days)
+        out: Dict[date, Any] = {}
+        with self._lock:
+            missing = []
+            for d in days:
+                k = (kind, d)
+                if k in self._mem:
+                    out[d] = self._mem[k]
+                else:
+                    missing.append(d)
+
+            db = self._conn() if missing else None
+            if db is not None:
+                try:
+                    qs = ",".join("?" * len(missing))
+                    cur = db.execute(
+                        f"SELECT day, payload FROM day_cache WHERE kind=? AND day IN ({qs})",
+                        [kind] + [d.isoformat() for d in missing],
+                    )
+                    for day_s, payload in cur.fetchall():
+                        d = date.fromisoformat(day_s)
+                        val = json.loads(payload, object_hook=_json_hook)
+                        self._mem[(kind, d)] = val
+                        out[d] = val
+                except Exception as e:
+                    print(f"[DAY_CACHE] read error: {e}")
+        return out
+
+    def put_many(self, kind: str, items: Dict[date, Any]):
+        if not items:
+            return
+        with self._lock:
+            for d, val in items.items():
+                self._mem[(kind, d)] = val
+            db = self._conn()
+            if db is None:
+                return
+            try:
+                db.executemany(
+                    "INSERT OR REPLACE INTO day_cache(kind, day, payload) VALUES (?,?,?)",
+                    [(kind, d.isoformat(), json.dumps(v, default=_json_default)) for d, v in items.items()],
+                )
+                db.commit()
+            except Exception as e:
+                print(f"[DAY_CACHE] write error: {e}")
+
+    def discard(self, days: Iterable[date], kinds: Optional[Iterable[str]] = None):
+        """Xoá các ngày cụ thể (mọi kind, hoặc chỉ các kind trong kinds)."""
+        days = set(days)
+        if not days:
+            return
+        kinds = set(kinds) if kinds is not None else None
+        with self._lock:
+            for k in [k for k in self._mem if k[1] in days and (kinds is None or k[0] in kinds)]:
+                del self._mem[k]
+            db = self._conn()
+            if db is None:
+                return
+            try:
+                qs = ",".join("?" * len(days))
+                sql = f"DELETE FROM day_cache WHERE day IN ({qs})"
+                params = [d.isoformat() for d in days]
+                if kinds is not None:
+                    sql += f" AND kind IN ({','.join('?' * len(kinds))})"
+                    params += list(kinds)
+                db.execute(sql, params)
+                db.commit()
+            except Exception as e:
+                print(f"[DAY_CACHE] discard error: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            db = self._conn()
+            if db is None:
+                return
+            try:
+                db.execute("DELETE FROM day_cache")
+                db.commit()
+            except Exception as e:
+                print(f"[DAY_CACHE] clear error: {e}")
+
+
+def is_closed(d: date, shift_end: Optional[dtime] = None, now: Optional[datetime] = None) -> bool:
+    """
+    d < hôm nay => đóng.
+    d == hôm nay => chỉ đóng khi có shift_end và đã qua giờ đó.
+    """
+    now = now or datetime.now()
+    today = now.date()
+    if d < today:
+        return True
+    if d == today and shift_end is not None:
+        return now.time() > shift_end
+    return False
+
+
+_STORE: Optional[ClosedDayStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_store() -> Optional[ClosedDayStore]:
+    """None nếu DAY_CACHE=0."""
+    global _STORE
+    if os.getenv("DAY_CACHE", "1") == "0":
+        return None
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = ClosedDayStore()
+        return _STORE
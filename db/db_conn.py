@@ -1,10 +1,24 @@
 import os
+import threading
 from contextlib import contextmanager
 from dotenv import load_dotenv, find_dotenv
-import mysql.connector
 
 load_dotenv(find_dotenv())
 
+# ===== Backend =====
+# DB_BACKEND=mysql (mặc định) | sqlite (file cục bộ, xem db/sqlite_backend.py)
+# mysql.connector chỉ import khi dùng MySQL => máy không cài driver vẫn chạy được bản SQLite
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql").strip().lower()
+if DB_BACKEND not in ("mysql", "sqlite"):
+    print(f"[DB] unknown DB_BACKEND={DB_BACKEND!r} -> mysql")
+    DB_BACKEND = "mysql"
+
+if DB_BACKEND == "mysql":
+    import mysql.connector
+    import mysql.connector.pooling
+else:
+    from . import sqlite_backend
+
 def _config():
     return {
         "host": os.getenv("DB_HOST", "127.0.0.1"),
@@ -14,9 +28,44 @@ def _config():
         "database": os.getenv("DB_NAME", "attendance_db"),
     }
 
+# ===== Connection pool =====
+# Giữ sẵn DB_POOL_SIZE connection (mặc định 5, 0 = tắt) thay vì connect/close mỗi câu lệnh.
+# Pool hết chỗ / chưa tạo được (MySQL đang down) => connect thẳng như cũ, lần sau thử tạo lại.
+_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+_pool = None
+_pool_lock = threading.Lock()
+_pool_warned = False
+
+def _get_pool():
+    global _pool, _pool_warned
+    if _pool is not None or _POOL_SIZE <= 0:
+        return _pool
+    with _pool_lock:
+        if _pool is None:
+            try:
+                _pool = mysql.connector.pooling.MySQLConnectionPool(
+                    pool_name="attendance", pool_size=_POOL_SIZE, pool_reset_session=True, **_config()
+                )
+            except Exception as e:
+                if not _pool_warned:
+                    print(f"[DB_POOL] not available yet: {e}")
+                    _pool_warned = True
+    return _pool
+
+def _connect():
+    if DB_BACKEND == "sqlite":
+        return sqlite_backend.connect()
+    pool = _get_pool()
+    if pool is not None:
+        try:
+            return pool.get_connection()
+        except mysql.connector.errors.PoolError:
+            pass
+    return mysql.connector.connect(**_config())
+
 @contextmanager
 def get_conn():
-    cn = mysql.connector.connect(**_config())
+    cn = _connect()   # pooled: close() trả connection về pool
     try:
         yield cn
         cn.commit()
@@ -42,6 +91,28 @@ def fetch_one(sql, params=None):
         cur.close()
         return row
 
+def iter_rows(sql, params=None, chunk_size=1000):
+    """
+    Stream kết quả (unbuffered cursor, lấy theo chunk) - RAM không phụ thuộc số dòng.
+    Connection giữ mở tới khi generator chạy hết / bị close.
+    """
+    with get_conn() as cn:
+        cur = cn.cursor(dictionary=True, buffered=False)
+        try:
+            cur.execute(sql, params or ())
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            # dừng giữa chừng: phải đọc bỏ phần còn lại trước khi đóng cursor
+            try:
+                cn.consume_results()
+            except Exception:
+                pass
+            cur.close()
+
 def execute(sql, params=None):
     with get_conn() as cn:
         cur = cn.cursor()
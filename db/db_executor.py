@@ -0,0 +1,306 @@
+# db/db_executor.py
+"""
+DB executor: chạy các lời gọi DAL trên thread pool riêng để Tk main thread
+không bao giờ phải chờ MySQL.
+
+- Thread pool cố định + hàng đợi có giới hạn (bounded queue).
+- Coalescing: request giống hệt (cùng hàm + cùng tham số) đang chờ/đang chạy
+  thì chỉ gắn thêm callback, KHÔNG query lại.
+- Cancellation theo channel: submit mới trên cùng channel (vd: date picker của
+  1 tab) với tham số khác => request cũ bị huỷ (đang chờ: bỏ khỏi queue,
+  đang chạy: bỏ kết quả).
+- Kết quả trả về Tk thread qua after() (pump chỉ chạy khi còn việc).
+"""
+from __future__ import annotations
+import os
+import threading
+import itertools
+from collections import deque
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class DBQueueFull(RuntimeError):
+    """Hàng đợi DB đã đầy và không còn request nào có thể huỷ để nhường chỗ."""
+
+
+class _Waiter:
+    __slots__ = ("on_done", "on_error", "widget", "channel")
+
+    def __init__(self, on_done, on_error, widget, channel):
+        self.on_done = on_done
+        self.on_error = on_error
+        self.widget = widget
+        self.channel = channel
+
+
+class _Request:
+    __slots__ = ("seq", "fn", "args", "kwargs", "key", "waiters", "running")
+
+    def __init__(self, seq, fn, args, kwargs, key):
+        self.seq = seq
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.waiters: List[_Waiter] = []
+        self.running = False
+
+
+class DBExecutor:
+    """
+    Thread pool cho DAL.
+
+    submit(fn, *args, widget=..., on_done=..., on_error=..., channel=...)
+      - widget : Tk widget dùng để after() về main thread (bắt buộc)
+      - on_done(result) / on_error(exc) luôn chạy trên Tk thread
+      - channel: khoá "ai là request mới nhất" (vd: ".!frame.!attendancedaily:query")
+    """
+
+    PUMP_MS = 15
+
+    def __init__(self, workers: int = 2, max_pending: int = 64):
+        self._workers_n = max(1, int(workers))
+        self._max_pending = max(1, int(max_pending))
+
+        self._lock = threading.Lock()
+        self._cv = threading.Condition(self._lock)
+        self._pending: deque[_Request] = deque()
+        self._by_key: Dict[Hashable, _Request] = {}     # queued + running
+        self._channels: Dict[Hashable, _Request] = {}   # channel -> request mới nhất
+        self._done: deque[Tuple[_Request, bool, Any]] = deque()
+        self._running = 0   # request đang chạy trên worker (kể cả key=None, không nằm trong _by_key)
+        self._seq = itertools.count(1)
+
+        self._threads: List[threading.Thread] = []
+        self._stop_evt = threading.Event()
+
+        # pump state (chỉ đụng trên Tk thread)
+        self._pump_widget = None
+        self._pump_job = None
+
+        # stats
+        self.submitted = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self.executed = 0
+
+    # ---------- lifecycle ----------
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        for i in range(self._workers_n):
+            t = threading.Thread(target=self._worker, name=f"db-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def shutdown(self):
+        self._stop_evt.set()
+        with self._cv:
+            self._pending.clear()
+            self._cv.notify_all()
+
+    # ---------- public ----------
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        widget,
+        on_done: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[BaseException], None]] = None,
+        channel: Optional[Hashable] = None,
+        key: Optional[Hashable] = None,
+        **kwargs,
+    ) -> bool:
+        """Gọi từ Tk thread. Trả về False nếu request bị từ chối (queue đầy)."""
+        if key is None:
+            key = self._make_key(fn, args, kwargs)
+
+        waiter = _Waiter(on_done, on_error, widget, channel)
+        err: Optional[BaseException] = None
+
+        with self._cv:
+            self.submitted += 1
+
+            # 1) channel: request cũ khác key -> huỷ phần của channel này
+            if channel is not None:
+                prev = self._channels.get(channel)
+                if prev is not None and prev.key != key:
+                    self._detach_channel(prev, channel)
+
+            # 2) coalesce với request giống hệt
+            req = self._by_key.get(key) if key is not None else None
+            if req is not None:
+                self.coalesced += 1
+                # cùng channel đã chờ sẵn trên request này -> callback mới nhất thay callback cũ
+                if channel is not None:
+                    req.waiters = [w for w in req.waiters if w.channel != channel]
+                req.waiters.append(waiter)
+            else:
+                if len(self._pending) >= self._max_pending and not self._evict_one():
+                    err = DBQueueFull(f"DB queue full ({self._max_pending})")
+                else:
+                    req = _Request(next(self._seq), fn, args, kwargs, key)
+                    req.waiters.append(waiter)
+                    self._pending.append(req)
+                    if key is not None:
+                        self._by_key[key] = req
+                    self._cv.notify()
+
+            if req is not None and channel is not None:
+                self._channels[channel] = req
+
+        if err is not None:
+            if on_error:
+                try:
+                    on_error(err)
+                except Exception:
+                    pass
+            return False
+
+        self._ensure_workers()
+        self._ensure_pump(widget)
+        return True
+
+    def cancel(self, channel: Hashable):
+        """Huỷ request đang gắn với channel (vd: khi tab bị destroy)."""
+        with self._cv:
+            req = self._channels.get(channel)
+            if req is not None:
+                self._detach_channel(req, channel)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "cancelled": self.cancelled,
+                "executed": self.executed,
+                "pending": len(self._pending),
+                "inflight": len(self._by_key),
+                "running": self._running,
+            }
+
+    # ---------- internals (gọi khi đang giữ lock) ----------
+    @staticmethod
+    def _make_key(fn, args, kwargs) -> Optional[Hashable]:
+        try:
+            key = (fn, args, tuple(sorted(kwargs.items())))
+            hash(key)
+            return key
+        except TypeError:
+            return None  # tham số không hash được -> không coalesce
+
+    def _detach_channel(self, req: _Request, channel: Hashable):
+        req.waiters = [w for w in req.waiters if w.channel != channel]
+        if self._channels.get(channel) is req:
+            del self._channels[channel]
+        if not req.waiters and not req.running:
+            try:
+                self._pending.remove(req)
+            except ValueError:
+                pass
+            if req.key is not None and self._by_key.get(req.key) is req:
+                del self._by_key[req.key]
+        self.cancelled += 1
+
+    def _evict_one(self) -> bool:
+        """Queue đầy: bỏ request cũ nhất mà mọi waiter đều thuộc channel (UI sẽ tự hỏi lại)."""
+        for req in self._pending:
+            if req.waiters and all(w.channel is not None for w in req.waiters):
+                for w in list(req.waiters):
+                    self._detach_channel(req, w.channel)
+                return True
+        return False
+
+    # ---------- worker ----------
+    def _worker(self):
+        while not self._stop_evt.is_set():
+            with self._cv:
+                while not self._pending and not self._stop_evt.is_set():
+                    self._cv.wait(0.5)
+                if self._stop_evt.is_set():
+                    return
+                req = self._pending.popleft()
+                req.running = True
+                self._running += 1
+
+            try:
+                result, ok = req.fn(*req.args, **req.kwargs), True
+            except BaseException as e:
+                result, ok = e, False
+
+            with self._cv:
+                self.executed += 1
+                self._running -= 1
+                if req.key is not None and self._by_key.get(req.key) is req:
+                    del self._by_key[req.key]
+                self._done.append((req, ok, result))
+
+    # ---------- Tk pump ----------
+    def _ensure_pump(self, widget):
+        if self._pump_job is not None:
+            return
+        try:
+            root = widget._root()
+            self._pump_widget = root
+            self._pump_job = root.after(self.PUMP_MS, self._pump)
+        except Exception:
+            self._pump_job = None
+
+    def _pump(self):
+        self._pump_job = None
+        with self._lock:
+            batch = list(self._done)
+            self._done.clear()
+
+        for req, ok, value in batch:
+            with self._lock:
+                waiters = list(req.waiters)
+                # waiter có channel đã bị request khác thay thế -> bỏ
+                live = []
+                for w in waiters:
+                    if w.channel is None:
+                        live.append(w)
+                    elif self._channels.get(w.channel) is req:
+                        del self._channels[w.channel]
+                        live.append(w)
+
+            for w in live:
+                try:
+                    if w.widget is not None and not w.widget.winfo_exists():
+                        continue
+                except Exception:
+                    continue
+                cb = w.on_done if ok else w.on_error
+                if cb is None:
+                    if not ok:
+                        print(f"[DB_EXECUTOR] {getattr(req.fn, '__name__', req.fn)}: {value!r}")
+                    continue
+                try:
+                    cb(value)
+                except Exception as e:
+                    print(f"[DB_EXECUTOR] callback error: {e!r}")
+
+        with self._lock:
+            busy = bool(self._pending or self._by_key or self._done or self._running)
+        if busy and self._pump_widget is not None:
+            try:
+                self._pump_job = self._pump_widget.after(self.PUMP_MS, self._pump)
+            except Exception:
+                self._pump_job = None
+
+
+# ---------- process-wide instance ----------
+_EXECUTOR: Optional[DBExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_executor() -> DBExecutor:
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = DBExecutor(
+                workers=int(os.getenv("DB_WORKERS", "2")),
+                max_pending=int(os.getenv("DB_MAX_PENDING", "64")),
+            )
+        return _EXECUTOR
@@ -0,0 +1,347 @@
+# db/log_queue.py
+"""
+Write-ahead queue cho attendance_logs (chịu được MySQL down / chậm).
+
+Luồng nhận diện chỉ gọi enqueue(): ghi 1 dòng vào SQLite cục bộ (WAL, vài chục µs),
+không đụng mạng. LogFlusher (daemon thread) gom các dòng đang chờ và ghi sang
+MySQL bằng 1 câu INSERT nhiều dòng; lỗi => giữ nguyên trong hàng đợi, thử lại
+với backoff. App tắt giữa chừng: lần chạy sau flusher ghi nốt phần còn lại.
+
+Chống trùng khi replay: mỗi log có client_uid (UUID sinh lúc enqueue), cột
+attendance_logs.client_uid là UNIQUE + INSERT IGNORE => gửi lại bao nhiêu lần
+cũng chỉ có 1 dòng. DB cũ chưa có cột này: vẫn ghi nhưng không chống trùng.
+IGNORE cũng bỏ qua log của nhân viên đã bị xoá (FK) thay vì kẹt cả hàng đợi.
+
+Gom lô theo cửa sổ thời gian: log đầu tiên đánh thức flusher, flusher chờ thêm
+LOG_FLUSH_WINDOW_MS (mặc định 50ms) để các lượt quẹt liền nhau (hàng người
+qua cổng) đi chung 1 INSERT / 1 connection lấy từ pool (db_conn).
+
+Dead-letter: lỗi do dữ liệu (không phải mất kết nối) => lô được ghi lại từng dòng
+để dòng hỏng không chặn các dòng khác; dòng lỗi quá LOG_MAX_ATTEMPTS lần được
+chuyển sang bảng `dead` (cùng file SQLite, kèm lỗi) để hàng đợi tiếp tục chảy.
+Lỗi kết nối / MySQL down thì không tính, cứ retry với backoff như cũ.
+
+File: data/queue/attendance_wal.sqlite (đổi bằng LOG_QUEUE_PATH)
+"""
+from __future__ import annotations
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, time as dtime
+from typing import Any, Dict, List, Optional
+
+from .db_conn import get_conn
+from .attendance_dal import _invalidate, _SHIFT_END, invalidate_days
+from .day_cache import is_closed
+
+APP_BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_DEFAULT_PATH = os.path.join(APP_BASE, "data", "queue", "attendance_wal.sqlite")
+
+_ER_BAD_FIELD_ERROR = 1054      # DB chưa có cột client_uid
+FLUSH_WINDOW_SEC = int(os.getenv("LOG_FLUSH_WINDOW_MS", "50")) / 1000.0
+MAX_ATTEMPTS = int(os.getenv("LOG_MAX_ATTEMPTS", "5"))
+
+# lỗi tạm thời: server down / mất kết nối / lock => retry mãi, không dead-letter
+_TRANSIENT_ERRNOS = {1040, 1053, 1205, 1213}   # too many conn, shutdown, lock wait, deadlock
+
+
+def _is_transient(e: BaseException) -> bool:
+    errno = getattr(e, "errno", None)
+    if isinstance(errno, int) and (2000 <= errno < 3000 or errno in _TRANSIENT_ERRNOS):
+        return True   # 2xxx: lỗi phía client (CR_CONNECTION_ERROR, CR_SERVER_GONE_ERROR, ...)
+    if isinstance(e, (ConnectionError, TimeoutError)):
+        return True
+    return type(e).__name__ in ("InterfaceError", "OperationalError", "PoolError")
+
+
+class LogQueue:
+    """Hàng đợi bền (SQLite). Thread-safe."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("LOG_QUEUE_PATH", _DEFAULT_PATH)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        # WAL + synchronous=NORMAL: commit không fsync mỗi lần, vẫn an toàn khi app crash
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pending ("
+            "  seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "  client_uid TEXT NOT NULL UNIQUE, "
+            "  employee_id INTEGER NOT NULL, "
+            "  detected_at TEXT NOT NULL, "
+            "  attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS dead ("
+            "  seq INTEGER PRIMARY KEY, "
+            "  client_uid TEXT NOT NULL, "
+            "  employee_id INTEGER NOT NULL, "
+            "  detected_at TEXT NOT NULL, "
+            "  attempts INTEGER NOT NULL, "
+            "  error TEXT, "
+            "  failed_at TEXT NOT NULL)"
+        )
+        self.has_data = threading.Event()
+        if self.pending_count():
+            self.has_data.set()
+
+    def enqueue(self, employee_id: int, detected_at: Optional[datetime] = None) -> str:
+        """Ghi 1 log vào hàng đợi (đồng bộ, không chạm MySQL). Trả về client_uid."""
+        uid = uuid.uuid4().hex
+        ts = (detected_at or datetime.now()).replace(microsecond=0)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO pending(client_uid, employee_id, detected_at) VALUES (?,?,?)",
+                (uid, int(employee_id), ts.isoformat(sep=" ")),
+            )
+            self.has_data.set()
+        return uid
+
+    def peek(self, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._clear_if_empty()
+            cur = self._db.execute(
+                "SELECT seq, client_uid, employee_id, detected_at, attempts FROM pending ORDER BY seq LIMIT ?",
+                (int(limit),),
+            )
+            return [
+                {"seq": s, "client_uid": u, "employee_id": e, "detected_at": datetime.fromisoformat(t),
+                 "attempts": a}
+                for s, u, e, t, a in cur.fetchall()
+            ]
+
+    def ack(self, seqs: List[int]):
+        if not seqs:
+            return
+        with self._lock:
+            self._db.execute(
+                f"DELETE FROM pending WHERE seq IN ({','.join('?' * len(seqs))})", seqs
+            )
+            self._clear_if_empty()
+
+    def _clear_if_empty(self):
+        # gọi khi đang giữ _lock: enqueue set cờ cũng trong lock => không mất tín hiệu
+        if not self._db.execute("SELECT 1 FROM pending LIMIT 1").fetchone():
+            self.has_data.clear()
+
+    def mark_failed(self, seqs: List[int]):
+        if not seqs:
+            return
+        with self._lock:
+            self._db.execute(
+                f"UPDATE pending SET attempts = attempts + 1 WHERE seq IN ({','.join('?' * len(seqs))})",
+                seqs,
+            )
+
+    def dead_letter(self, seqs: List[int], error: str):
+        """Chuyển các dòng pending -> dead (kèm lỗi, tính cả lần thử vừa lỗi), 1 transaction."""
+        if not seqs:
+            return
+        ph = ",".join("?" * len(seqs))
+        now = datetime.now().replace(microsecond=0).isoformat(sep=" ")
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO dead(seq, client_uid, employee_id, detected_at, attempts, error, failed_at) "
+                    f"SELECT seq, client_uid, employee_id, detected_at, attempts + 1, ?, ? FROM pending WHERE seq IN ({ph})",
+                    [error, now] + list(seqs),
+                )
+                self._db.execute(f"DELETE FROM pending WHERE seq IN ({ph})", seqs)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._clear_if_empty()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return int(self._db.execute("SELECT COUNT(*) FROM pending").fetchone()[0])
+
+    def dead_count(self) -> int:
+        with self._lock:
+            return int(self._db.execute("SELECT COUNT(*) FROM dead").fetchone()[0])
+
+
+class LogFlusher(threading.Thread):
+    """Đẩy LogQueue -> MySQL theo lô, retry với exponential backoff."""
+
+    def __init__(self, q: LogQueue, batch_size: int = 200, window_sec: float = FLUSH_WINDOW_SEC,
+                 backoff_min: float = 0.5, backoff_max: float = 30.0, max_attempts: int = MAX_ATTEMPTS):
+        super().__init__(daemon=True, name="log-flusher")
+        self.q = q
+        self.batch_size = batch_size
+        self.window_sec = window_sec
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.max_attempts = max(1, int(max_attempts))
+        self._stop_evt = threading.Event()
+        self._with_uid = True
+
+        # ---- metrics (đọc qua stats()) ----
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._sum_flush_ms = 0.0
+        self.max_batch = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Độ sâu hàng đợi + độ trễ flush (ms) để hiển thị / debug."""
+        return {
+            "queue_depth": self.q.pending_count(),
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failures": self.failures,
+            "dead_letter": self.q.dead_count(),
+            "last_error": self.last_error,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self._sum_flush_ms / self.batches, 2) if self.batches else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "avg_batch": round(self.flushed / self.batches, 2) if self.batches else 0.0,
+            "max_batch": self.max_batch,
+        }
+
+    def stop(self):
+        self._stop_evt.set()
+        self.q.has_data.set()   # đánh thức vòng lặp
+
+    def run(self):
+        delay = 0.0
+        while not self._stop_evt.is_set():
+            if delay:
+                if self._stop_evt.wait(delay):
+                    break
+            else:
+                self.q.has_data.wait()
+                if self._stop_evt.is_set():
+                    break
+                # cửa sổ gom lô: chờ thêm các log tới liền sau
+                if self.window_sec > 0 and self._stop_evt.wait(self.window_sec):
+                    break
+
+            batch = self.q.peek(self.batch_size)
+            if not batch:
+                delay = 0.0
+                continue
+
+            t0 = time.perf_counter()
+            try:
+                self._write(batch)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = repr(e)
+                if _is_transient(e):
+                    self.q.mark_failed([r["seq"] for r in batch])
+                    delay = min(self.backoff_max, max(self.backoff_min, delay * 2))
+                    print(f"[LOG_QUEUE] flush failed ({len(batch)} pending, retry in {delay:.1f}s): {e!r}")
+                    continue
+                # lỗi do dữ liệu: ghi từng dòng => dòng hỏng không chặn cả lô
+                batch = self._write_each(batch)
+                if not batch:
+                    delay = min(self.backoff_max, max(self.backoff_min, delay * 2))
+                    continue
+
+            self._on_flushed(batch, (time.perf_counter() - t0) * 1000.0)
+            delay = 0.0
+
+    def _write_each(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Ghi lần lượt từng dòng; dòng lỗi: +attempts, quá max_attempts => dead. Trả về các dòng đã ghi."""
+        ok: List[Dict[str, Any]] = []
+        for i, r in enumerate(batch):
+            try:
+                self._write([r])
+            except Exception as e:
+                self.last_error = repr(e)
+                if _is_transient(e):
+                    # mất kết nối giữa chừng: phần còn lại để lượt sau
+                    self.q.mark_failed([x["seq"] for x in batch[i:]])
+                    break
+                if r["attempts"] + 1 >= self.max_attempts:
+                    self.q.dead_letter([r["seq"]], repr(e))
+                    print(f"[LOG_QUEUE] dead-letter seq={r['seq']} eid={r['employee_id']} "
+                          f"at={r['detected_at']} after {r['attempts'] + 1} attempts: {e!r}")
+                else:
+                    self.q.mark_failed([r["seq"]])
+                continue
+            ok.append(r)
+        return ok
+
+    def _on_flushed(self, batch: List[Dict[str, Any]], ms: float):
+        self.q.ack([r["seq"] for r in batch])
+        self.flushed += len(batch)
+        self.batches += 1
+        self.last_flush_ms = ms
+        self.max_flush_ms = max(self.max_flush_ms, ms)
+        self._sum_flush_ms += ms
+        self.max_batch = max(self.max_batch, len(batch))
+        # check-in hôm nay không đụng ngày đã đóng => giữ closed-day cache / rollup;
+        # chỉ log cũ (replay offline) mới bỏ cache của đúng ngày đó
+        _invalidate("logs")
+        shift_end = dtime.fromisoformat(_SHIFT_END)
+        invalidate_days({r["detected_at"].date() for r in batch if is_closed(r["detected_at"].date(), shift_end)})
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        if self._with_uid:
+            try:
+                self._insert(batch, with_uid=True)
+                return
+            except Exception as e:
+                if getattr(e, "errno", None) != _ER_BAD_FIELD_ERROR:
+                    raise
+                print("[LOG_QUEUE] attendance_logs.client_uid chưa có (xem db/create_tables.sql) "
+                      "-> ghi không chống trùng")
+                self._with_uid = False
+        self._insert(batch, with_uid=False)
+
+    @staticmethod
+    def _insert(batch: List[Dict[str, Any]], with_uid: bool):
+        if with_uid:
+            sql = ("INSERT IGNORE INTO attendance_logs(employee_id, detected_at, client_uid) VALUES "
+                   + ",".join(["(%s,%s,%s)"] * len(batch)))
+            params = [v for r in batch for v in (r["employee_id"], r["detected_at"], r["client_uid"])]
+        else:
+            sql = ("INSERT IGNORE INTO attendance_logs(employee_id, detected_at) VALUES "
+                   + ",".join(["(%s,%s)"] * len(batch)))
+            params = [v for r in batch for v in (r["employee_id"], r["detected_at"])]
+        with get_conn() as cn:
+            cur = cn.cursor()
+            cur.execute(sql, params)
+            cur.close()
+
+
+_QUEUE: Optional[LogQueue] = None
+_FLUSHER: Optional[LogFlusher] = None
+_QUEUE_LOCK = threading.Lock()
+
+
+def get_log_queue() -> LogQueue:
+    """Hàng đợi dùng chung + tự start flusher (lần gọi đầu tiên)."""
+    global _QUEUE, _FLUSHER
+    with _QUEUE_LOCK:
+        if _QUEUE is None:
+            _QUEUE = LogQueue()
+        if _FLUSHER is None or not _FLUSHER.is_alive():
+            _FLUSHER = LogFlusher(_QUEUE)
+            _FLUSHER.start()
+        return _QUEUE
+
+
+def enqueue_attendance_log(employee_id: int, detected_at: Optional[datetime] = None) -> str:
+    return get_log_queue().enqueue(employee_id, detected_at)
+
+
+def get_flusher() -> Optional[LogFlusher]:
+    return _FLUSHER
+
+
+def log_queue_stats() -> Dict[str, Any]:
+    """Metrics của writer (rỗng nếu chưa khởi động)."""
+    f = _FLUSHER
+    return f.stats() if f is not None else {}
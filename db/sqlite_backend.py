@@ -0,0 +1,240 @@
+# db/sqlite_backend.py
+"""
+Backend SQLite cho db_conn (DB_BACKEND=sqlite): chạy kiosk offline / bench DAL
+không cần MySQL server.
+
+- connection giả lập API mysql.connector mà repo đang dùng:
+  cn.cursor(dictionary=..., buffered=...), execute/fetchone/fetchall/fetchmany,
+  lastrowid, commit/rollback/close, consume_results
+- SQL viết cho MySQL được dịch sang SQLite (translate_sql) cho đúng các cấu trúc
+  mà DAL / bulk_import / log_queue / overview dùng:
+    %s, INSERT IGNORE, ON DUPLICATE KEY UPDATE ... VALUES(c), CAST(.. AS DATE|CHAR),
+    x + INTERVAL n DAY, CURDATE(), TRUNCATE, SET FOREIGN_KEY_CHECKS,
+    ALTER TABLE .. AUTO_INCREMENT
+  YEAR/MONTH/LPAD/CONCAT/DATABASE là hàm Python đăng ký vào SQLite;
+  DATE()/TIME() và WITH RECURSIVE thì SQLite có sẵn.
+  LIKE được thay bằng bản không phân biệt hoa thường + dấu (giống utf8mb4_unicode_ci)
+- kết quả: chuỗi 'YYYY-MM-DD' / 'YYYY-MM-DD HH:MM:SS' đổi về date/datetime
+  như mysql.connector trả về
+- 1 connection / thread (sqlite3 không chia sẻ giữa thread), WAL + busy_timeout
+- schema tự tạo từ db/create_tables_sqlite.sql
+
+File: data/attendance.sqlite (đổi bằng SQLITE_PATH)
+"""
+from __future__ import annotations
+import os
+import re
+import sqlite3
+import threading
+import functools
+import unicodedata
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence
+
+APP_BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_DEFAULT_PATH = os.path.join(APP_BASE, "data", "attendance.sqlite")
+_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "create_tables_sqlite.sql")
+
+
+# ===================== SQL dialect shim =====================
+_RULES = [
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\bINSERT\s+IGNORE\b", re.I), "INSERT OR IGNORE"),
+    (re.compile(r"\bCAST\(\s*([^()]+?)\s+AS\s+DATE\s*\)", re.I), r"date(\1)"),
+    (re.compile(r"\bCAST\(\s*([^()]+?)\s+AS\s+CHAR\s*\)", re.I), r"CAST(\1 AS TEXT)"),
+    (re.compile(r"(date\([^()]*\)|\b[\w.]+)\s*\+\s*INTERVAL\s+(\d+)\s+DAY\b", re.I), r"date(\1, '+\2 day')"),
+    (re.compile(r"\bCURDATE\(\)", re.I), "date('now', 'localtime')"),
+    (re.compile(r"^\s*SET\s+FOREIGN_KEY_CHECKS\s*=\s*0\s*;?\s*$", re.I), "PRAGMA foreign_keys=OFF"),
+    (re.compile(r"^\s*SET\s+FOREIGN_KEY_CHECKS\s*=\s*1\s*;?\s*$", re.I), "PRAGMA foreign_keys=ON"),
+    (re.compile(r"^\s*TRUNCATE\s+TABLE\s+(\w+)", re.I), r"DELETE FROM \1"),
+    (re.compile(r"^\s*ALTER\s+TABLE\s+(\w+)\s+AUTO_INCREMENT\s*=\s*\d+\s*;?\s*$", re.I),
+     r"DELETE FROM sqlite_sequence WHERE name='\1'"),
+]
+_ON_DUP = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b(.*)$", re.I | re.S)
+_VALUES_REF = re.compile(r"\bVALUES\((\w+)\)", re.I)
+
+
+@functools.lru_cache(maxsize=512)
+def translate_sql(sql: str) -> str:
+    """MySQL -> SQLite cho tập cú pháp repo dùng (không phải parser tổng quát)."""
+    m = _ON_DUP.search(sql)
+    if m:
+        sets = _VALUES_REF.sub(r"excluded.\1", m.group(1))
+        sql = sql[:m.start()] + "ON CONFLICT DO UPDATE SET" + sets
+    for rx, rep in _RULES:
+        sql = rx.sub(rep, sql)
+    return sql
+
+
+# ===================== types =====================
+_DT_RX = re.compile(r"^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(\.\d+)?$")
+_D_RX = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def _out(v: Any) -> Any:
+    if isinstance(v, str) and 10 <= len(v) <= 26 and v[4:5] == "-":
+        if _D_RX.match(v):
+            return date.fromisoformat(v)
+        if _DT_RX.match(v):
+            return datetime.fromisoformat(v)
+    return v
+
+
+def _in(v: Any) -> Any:
+    if isinstance(v, datetime):
+        return v.isoformat(sep=" ", timespec="seconds")
+    if isinstance(v, date):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return float(v)
+    return v
+
+
+def _fn_year(v):
+    return int(str(v)[:4]) if v else None
+
+
+def _fn_month(v):
+    return int(str(v)[5:7]) if v else None
+
+
+def _fn_lpad(s, n, pad):
+    s = "" if s is None else str(s)
+    n = int(n)
+    return (str(pad) * n + s)[-n:] if len(s) < n else s[:n]
+
+
+def _fn_concat(*parts):
+    if any(p is None for p in parts):
+        return None
+    return "".join(str(p) for p in parts)
+
+
+def _fold(s: str) -> str:
+    s = unicodedata.normalize("NFD", s.replace("đ", "d").replace("Đ", "D"))
+    return "".join(ch for ch in s if not unicodedata.combining(ch)).lower()
+
+
+@functools.lru_cache(maxsize=256)
+def _like_rx(pattern: str, escape: Optional[str]):
+    out, i = [], 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if escape and ch == escape and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+            continue
+        out.append(".*" if ch == "%" else "." if ch == "_" else re.escape(ch))
+        i += 1
+    return re.compile("".join(out), re.S)
+
+
+def _fn_like(pattern, value, escape=None):
+    # SQLite gọi like(pattern, value[, escape])
+    if pattern is None or value is None:
+        return None
+    return _like_rx(_fold(str(pattern)), escape).fullmatch(_fold(str(value))) is not None
+
+
+# ===================== connection / cursor =====================
+class SQLiteCursor:
+    def __init__(self, raw: sqlite3.Cursor, dictionary: bool):
+        self._cur = raw
+        self._dict = dictionary
+        self._cols: Optional[List[str]] = None
+
+    def execute(self, sql: str, params: Optional[Sequence[Any]] = None):
+        args = tuple(_in(p) for p in (params or ()))
+        self._cur.execute(translate_sql(sql), args)
+        desc = self._cur.description
+        self._cols = [d[0] for d in desc] if desc else None
+
+    def _row(self, row):
+        if row is None:
+            return None
+        vals = [_out(v) for v in row]
+        return dict(zip(self._cols, vals)) if self._dict else tuple(vals)
+
+    def fetchone(self):
+        return self._row(self._cur.fetchone())
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cur.fetchall()]
+
+    def fetchmany(self, size: int = 1000):
+        return [self._row(r) for r in self._cur.fetchmany(size)]
+
+    @property
+    def lastrowid(self):
+        return self._cur.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    def close(self):
+        self._cur.close()
+
+
+class SQLiteConnection:
+    """Bọc sqlite3.Connection theo kiểu mysql.connector. close() không đóng thật (giữ cho thread)."""
+
+    def __init__(self, raw: sqlite3.Connection, name: str):
+        self._raw = raw
+        self.database = name
+
+    def cursor(self, dictionary: bool = False, buffered: Optional[bool] = None) -> SQLiteCursor:
+        return SQLiteCursor(self._raw.cursor(), dictionary)
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def consume_results(self):
+        pass
+
+    def close(self):
+        pass
+
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def _open(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    raw = sqlite3.connect(path, timeout=10.0, check_same_thread=False)
+    raw.execute("PRAGMA journal_mode=WAL")
+    raw.execute("PRAGMA synchronous=NORMAL")
+    raw.execute("PRAGMA foreign_keys=ON")
+    name = os.path.splitext(os.path.basename(path))[0]
+    raw.create_function("YEAR", 1, _fn_year, deterministic=True)
+    raw.create_function("MONTH", 1, _fn_month, deterministic=True)
+    raw.create_function("LPAD", 3, _fn_lpad, deterministic=True)
+    raw.create_function("CONCAT", -1, _fn_concat, deterministic=True)
+    raw.create_function("DATABASE", 0, lambda: name)
+    raw.create_function("like", 2, _fn_like, deterministic=True)
+    raw.create_function("like", 3, _fn_like, deterministic=True)
+
+    with _schema_lock:
+        if path not in _schema_ready:
+            with open(_SCHEMA_PATH, "r", encoding="utf-8") as f:
+                raw.executescript(f.read())
+            _schema_ready.add(path)
+    return raw
+
+
+def connect(path: Optional[str] = None) -> SQLiteConnection:
+    """Connection của thread hiện tại (mở + bootstrap schema ở lần đầu)."""
+    path = path or os.getenv("SQLITE_PATH", _DEFAULT_PATH)
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    cn = conns.get(path)
+    if cn is None:
+        cn = conns[path] = SQLiteConnection(_open(path), os.path.splitext(os.path.basename(path))[0])
+    return cn
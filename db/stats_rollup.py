@@ -0,0 +1,197 @@
+# db/stats_rollup.py
+"""
+Thống kê Present / Late / Absent nhiều độ phân giải (ngày / tuần / tháng).
+
+- daily: get_daily_stack_plus (ngày đã đóng nằm trong closed-day cache)
+- weekly / monthly: cộng dồn từ daily theo "người-ngày"; bucket đã đóng hẳn
+  (ngày cuối bucket đã đóng) được lưu vào closed-day cache (kind rollup_week /
+  rollup_month) => xem cả năm học / nhiều năm không phải đọc lại từng ngày
+- get_stack_series(): chọn độ phân giải theo khoảng ngày + số điểm tối đa
+  (theo bề rộng canvas), vẫn dư thì giảm mẫu kiểu LTTB (giữ hình dạng đường
+  tỉ lệ có mặt), nên chart không bao giờ phải vẽ hàng nghìn điểm
+"""
+from __future__ import annotations
+import calendar
+from datetime import date, timedelta, time as dtime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .attendance_dal import get_daily_stack_plus, _SHIFT_END, _as_date
+from .day_cache import get_store as _day_store, is_closed as _is_closed
+
+RESOLUTIONS = ("day", "week", "month")
+DEFAULT_MAX_POINTS = 120
+
+_SUM_FIELDS = ("total_active", "present", "late", "absent")
+
+
+# ===================== buckets =====================
+def bucket_start(d: date, resolution: str) -> date:
+    if resolution == "week":
+        return d - timedelta(days=d.weekday())      # thứ 2
+    if resolution == "month":
+        return d.replace(day=1)
+    return d
+
+
+def bucket_end(start: date, resolution: str) -> date:
+    if resolution == "week":
+        return start + timedelta(days=6)
+    if resolution == "month":
+        return start.replace(day=calendar.monthrange(start.year, start.month)[1])
+    return start
+
+
+def bucket_label(start: date, resolution: str) -> str:
+    if resolution == "week":
+        iso = start.isocalendar()
+        return f"{iso[0]}-W{iso[1]:02d}"
+    if resolution == "month":
+        return f"{start.year}-{start.month:02d}"
+    return start.isoformat()
+
+
+def _bucket_starts(d1: date, d2: date, resolution: str) -> List[date]:
+    out = []
+    s = bucket_start(d1, resolution)
+    while s <= d2:
+        out.append(s)
+        s = bucket_end(s, resolution) + timedelta(days=1)
+    return out
+
+
+def choose_resolution(d1: date, d2: date, max_points: int = DEFAULT_MAX_POINTS) -> str:
+    """Độ phân giải mịn nhất mà số bucket <= max_points."""
+    for res in RESOLUTIONS:
+        if len(_bucket_starts(d1, d2, res)) <= max_points:
+            return res
+    return "month"
+
+
+# ===================== rollup =====================
+def _empty(start: date, resolution: str) -> Dict[str, Any]:
+    return {"start": start, "end": bucket_end(start, resolution), "label": bucket_label(start, resolution),
+            "days": 0, "total_active": 0, "present": 0, "late": 0, "absent": 0}
+
+
+def _add_day(b: Dict[str, Any], r: Dict[str, Any]):
+    if int(r.get("total_active") or 0) <= 0:
+        return   # ngày chưa có ai trong biên chế (giống Overview: bỏ qua)
+    b["days"] += 1
+    for f in _SUM_FIELDS:
+        b[f] += int(r.get(f) or 0)
+
+
+def _runs(starts: List[date], resolution: str) -> List[Tuple[date, date]]:
+    """Gộp các bucket liền nhau thành đoạn [lo..hi]."""
+    out: List[Tuple[date, date]] = []
+    for s in starts:
+        e = bucket_end(s, resolution)
+        if out and out[-1][1] + timedelta(days=1) == s:
+            out[-1] = (out[-1][0], e)
+        else:
+            out.append((s, e))
+    return out
+
+
+def get_stack_rollup(d1: date, d2: date, resolution: str = "day") -> List[Dict[str, Any]]:
+    """
+    Bucket [start..end] giao với [d1..d2] (ngày tương lai bị cắt).
+    Mỗi bucket: start, end, label, days, total_active, present, late, absent
+    (present/late/absent/total_active là tổng người-ngày).
+    Bucket week/month ở 2 đầu khoảng bị cắt theo d1/d2.
+    """
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"resolution không hợp lệ: {resolution}")
+    if d2 < d1:
+        d1, d2 = d2, d1
+    d2 = min(d2, date.today())
+    if d2 < d1:
+        return []
+
+    starts = _bucket_starts(d1, d2, resolution)
+    if resolution == "day":
+        out = {s: _empty(s, "day") for s in starts}
+        for r in get_daily_stack_plus(d1, d2):
+            d = _as_date(r["day"])
+            if d in out:
+                _add_day(out[d], r)
+        return [out[s] for s in starts]
+
+    store = _day_store()
+    kind = f"rollup_{resolution}"
+    shift_end = dtime.fromisoformat(_SHIFT_END)
+
+    # chỉ bucket nằm trọn trong [d1..d2] mới dùng / ghi cache (bucket bị cắt thì tính lại)
+    whole = [s for s in starts if s >= d1 and bucket_end(s, resolution) <= d2]
+    cached = store.get_many(kind, whole) if store is not None else {}
+
+    fresh = {s: _empty(s, resolution) for s in starts if s not in cached}
+    if fresh:
+        # đọc daily theo từng đoạn bucket thiếu liên tiếp (không đọc lại đoạn đã cache)
+        for lo, hi in _runs([s for s in starts if s in fresh], resolution):
+            for r in get_daily_stack_plus(max(d1, lo), min(d2, hi)):
+                d = _as_date(r["day"])
+                s = bucket_start(d, resolution)
+                if s in fresh and d1 <= d <= d2:
+                    _add_day(fresh[s], r)
+        if store is not None:
+            done = {s: b for s, b in fresh.items()
+                    if s in whole and _is_closed(bucket_end(s, resolution), shift_end)}
+            store.put_many(kind, done)
+
+    return [cached.get(s) or fresh[s] for s in starts]
+
+
+# ===================== downsampling =====================
+def lttb(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    Largest-Triangle-Three-Buckets: chọn `threshold` chỉ số giữ hình dạng đường (x tăng dần).
+    Luôn giữ điểm đầu + cuối.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    out = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # trung bình bucket kế tiếp
+        nxt_lo = int((i + 1) * every) + 1
+        nxt_hi = min(int((i + 2) * every) + 1, n)
+        cnt = max(nxt_hi - nxt_lo, 1)
+        avg_x = sum(xs[nxt_lo:nxt_hi]) / cnt
+        avg_y = sum(ys[nxt_lo:nxt_hi]) / cnt
+
+        # điểm trong bucket hiện tại tạo tam giác lớn nhất với (a, avg)
+        lo = int(i * every) + 1
+        hi = int((i + 1) * every) + 1
+        ax, ay = xs[a], ys[a]
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area, best = area, j
+        out.append(best)
+        a = best
+    out.append(n - 1)
+    return out
+
+
+def get_stack_series(d1: date, d2: date, max_points: int = DEFAULT_MAX_POINTS,
+                     resolution: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Series cho chart: {resolution, buckets, downsampled}.
+    Bỏ bucket không có ngày nào có biên chế; quá max_points thì LTTB theo tỉ lệ present.
+    """
+    max_points = max(3, int(max_points))
+    res = resolution or choose_resolution(d1, d2, max_points)
+    buckets = [b for b in get_stack_rollup(d1, d2, res) if b["total_active"] > 0]
+
+    downsampled = False
+    if len(buckets) > max_points:
+        xs = [float(i) for i in range(len(buckets))]
+        ys = [b["present"] / b["total_active"] for b in buckets]
+        buckets = [buckets[i] for i in lttb(xs, ys, max_points)]
+        downsampled = True
+    return {"resolution": res, "buckets": buckets, "downsampled": downsampled}
@@ -0,0 +1,385 @@
+# hardware/atmega_sim.py
+"""
+ATmega16 ảo: bản sao FSM của firmware (Code for ATmega16 Microchip/.../main.c)
+nói đúng protocol hardware/protocol.py qua cổng serial ảo => chạy UARTDaemon không cần board.
+
+Firmware:
+    IDLE --(sensor)--> gửi NG, CK -> CHECKING
+    CHECKING --(T<id>)--> RESULT_OK      --(F)--> RESULT_FAIL
+    CHECKING --(quá check_timeout, 15 s)--> RESULT_FAIL
+    RESULT_* --(sau result_hold, 5 s)--> gửi RD -> IDLE
+    RUOK (mọi state) -> CF;  T/F ngoài CHECKING bị bỏ qua (đếm = resend của PC)
+
+Cổng:
+- POSIX: pseudo-terminal, UARTDaemon(port=sim.port_name)
+- Windows: truyền port= một đầu của cặp COM ảo (com0com), UARTDaemon mở đầu còn lại
+
+Nhiễu cấu hình được: tx_delay (trễ mỗi message), ck_delay (NG -> CK),
+drop_rate / dup_rate (mất / lặp message, cả 2 chiều), seed.
+
+Stress test (không cần board):
+  python -m hardware.atmega_sim --scans 200 --result-hold 0.05 --drop 0.02 --dup 0.05
+  python -m hardware.atmega_sim --scans 50 --result-hold 0.05 --ck-delay-ms 40 [--strict]
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+import heapq
+import random
+import select
+import argparse
+import threading
+import statistics
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .protocol import (
+    AVR_PERSON_DETECTED,
+    AVR_CHECK_READY,
+    AVR_CONFIRM_OK,
+    AVR_READY,
+    PC_CHECK_SENSOR,
+    PC_FACE_FAIL,
+    LineFramer,
+)
+
+IDLE, CHECKING, RESULT_OK, RESULT_FAIL = "IDLE", "CHECKING", "RESULT_OK", "RESULT_FAIL"
+
+
+class _PtyLink:
+    """Đầu master của pty; đầu slave (port_name) để UARTDaemon / pyserial mở."""
+
+    def __init__(self):
+        import pty, tty
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self.port_name = os.ttyname(self._slave)
+
+    def read(self, timeout: float) -> bytes:
+        r, _, _ = select.select([self._master], [], [], max(0.0, timeout))
+        if not r:
+            return b""
+        try:
+            return os.read(self._master, 1024)
+        except OSError:
+            return b""
+
+    def write(self, data: bytes):
+        os.write(self._master, data)
+
+    def close(self):
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class _SerialLink:
+    """1 đầu của cặp COM ảo (Windows / com0com)."""
+
+    def __init__(self, port: str, baudrate: int):
+        import serial
+        self._ser = serial.Serial(port=port, baudrate=baudrate, timeout=0)
+        self.port_name = port
+
+    def read(self, timeout: float) -> bytes:
+        self._ser.timeout = max(0.0, timeout)
+        data = self._ser.read(1)
+        if data and self._ser.in_waiting:
+            data += self._ser.read(self._ser.in_waiting)
+        return data
+
+    def write(self, data: bytes):
+        self._ser.write(data)
+
+    def close(self):
+        try:
+            self._ser.close()
+        except Exception:
+            pass
+
+
+class AtmegaSim(threading.Thread):
+    def __init__(
+        self,
+        port: Optional[str] = None,
+        baudrate: int = 9600,
+        check_timeout: float = 15.0,
+        result_hold: float = 5.0,
+        ck_delay: float = 0.0,
+        tx_delay: float = 0.0,
+        drop_rate: float = 0.0,
+        dup_rate: float = 0.0,
+        seed: Optional[int] = None,
+        on_result: Optional[Callable[[str], None]] = None,   # on_result(cmd) khi nhận T/F hợp lệ
+    ):
+        super().__init__(daemon=True, name="AtmegaSim")
+        self.check_timeout = float(check_timeout)
+        self.result_hold = float(result_hold)
+        self.ck_delay = float(ck_delay)
+        self.tx_delay = float(tx_delay)
+        self.drop_rate = float(drop_rate)
+        self.dup_rate = float(dup_rate)
+        self.on_result = on_result
+        self._rng = random.Random(seed)
+
+        self._link = _SerialLink(port, baudrate) if port else _PtyLink()
+        self.port_name = self._link.port_name
+
+        # ❗ KHÔNG dùng tên _stop (đè lên internal của Thread)
+        self._stop_evt = threading.Event()
+        self._lock = threading.Lock()
+        self._sensor_flag = False
+        self._framer = LineFramer()
+        self._tx_q: List[Tuple[float, int, str]] = []   # heap (due, seq, msg)
+        self._tx_seq = 0
+
+        self.state = IDLE
+        self._state_ts = 0.0
+        self._ng_ts = 0.0
+
+        self._stats: Dict[str, int] = {
+            "triggers": 0, "ok": 0, "fail": 0, "timeouts": 0, "ready": 0,
+            "ignored_results": 0, "ruok": 0,
+            "tx_dropped": 0, "tx_duplicated": 0, "rx_dropped": 0, "rx_duplicated": 0,
+        }
+        self._result_ms: List[float] = []    # NG gửi đi -> nhận T/F
+        self._cycle_ms: List[float] = []     # NG -> RD
+
+    # ---------- public ----------
+    def trigger(self) -> bool:
+        """Giả lập ngắt INT0 của cảm biến (chỉ ăn khi IDLE, giống firmware)."""
+        with self._lock:
+            if self.state != IDLE or self._sensor_flag:
+                return False
+            self._sensor_flag = True
+            return True
+
+    def stop(self):
+        self._stop_evt.set()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            out: Dict[str, float] = dict(self._stats)
+            res, cyc = list(self._result_ms), list(self._cycle_ms)
+        if res:
+            out["result_avg_ms"] = round(statistics.fmean(res), 2)
+            out["result_p95_ms"] = round(sorted(res)[int(0.95 * (len(res) - 1))], 2)
+            out["result_max_ms"] = round(max(res), 2)
+        if cyc:
+            out["cycle_avg_ms"] = round(statistics.fmean(cyc), 2)
+        return out
+
+    # ---------- TX / RX ----------
+    def _send(self, msg: str, delay: float = 0.0):
+        """Xếp message vào hàng gửi (tx_delay + delay), áp drop / dup."""
+        if self._rng.random() < self.drop_rate:
+            self._stats["tx_dropped"] += 1
+            return
+        copies = 1
+        if self._rng.random() < self.dup_rate:
+            self._stats["tx_duplicated"] += 1
+            copies = 2
+        due = time.perf_counter() + self.tx_delay + delay
+        for _ in range(copies):
+            self._tx_seq += 1
+            heapq.heappush(self._tx_q, (due, self._tx_seq, msg))
+
+    def _flush_tx(self, now: float):
+        while self._tx_q and self._tx_q[0][0] <= now:
+            _, _, msg = heapq.heappop(self._tx_q)
+            try:
+                self._link.write((msg + "\r\n").encode("ascii"))
+            except OSError as e:
+                print(f"[SIM] TX error: {e}")
+
+    def _on_rx(self, cmd: str, now: float):
+        if self._rng.random() < self.drop_rate:
+            self._stats["rx_dropped"] += 1
+            return
+        n = 1
+        if self._rng.random() < self.dup_rate:
+            self._stats["rx_duplicated"] += 1
+            n = 2
+        for _ in range(n):
+            self._handle_cmd(cmd, now)
+
+    def _handle_cmd(self, cmd: str, now: float):
+        if cmd == PC_CHECK_SENSOR:
+            self._stats["ruok"] += 1
+            self._send(AVR_CONFIRM_OK)
+            return
+        is_ok = cmd.startswith("T")
+        if not is_ok and cmd != PC_FACE_FAIL:
+            return
+        if self.state != CHECKING:
+            self._stats["ignored_results"] += 1
+            return
+        self.state = RESULT_OK if is_ok else RESULT_FAIL
+        self._state_ts = now
+        self._stats["ok" if is_ok else "fail"] += 1
+        self._result_ms.append((now - self._ng_ts) * 1000.0)
+        if self.on_result:
+            try:
+                self.on_result(cmd)
+            except Exception:
+                pass
+
+    # ---------- firmware main loop ----------
+    def _step(self, now: float):
+        with self._lock:
+            if self._sensor_flag:
+                self._sensor_flag = False
+                self.state = CHECKING
+                self._state_ts = self._ng_ts = now
+                self._framer.reset()
+                self._stats["triggers"] += 1
+                self._send(AVR_PERSON_DETECTED)
+                self._send(AVR_CHECK_READY, self.ck_delay)
+
+            if self.state == CHECKING and now - self._state_ts > self.check_timeout:
+                self.state = RESULT_FAIL
+                self._state_ts = now
+                self._stats["timeouts"] += 1
+
+            if self.state in (RESULT_OK, RESULT_FAIL) and now - self._state_ts > self.result_hold:
+                self._send(AVR_READY)
+                self.state = IDLE
+                self._stats["ready"] += 1
+                self._cycle_ms.append((now - self._ng_ts) * 1000.0)
+
+    def _next_wake(self, now: float) -> float:
+        t = now + 0.05
+        if self._tx_q:
+            t = min(t, self._tx_q[0][0])
+        if self.state == CHECKING:
+            t = min(t, self._state_ts + self.check_timeout)
+        elif self.state in (RESULT_OK, RESULT_FAIL):
+            t = min(t, self._state_ts + self.result_hold)
+        return t
+
+    def run(self):
+        try:
+            while not self._stop_evt.is_set():
+                now = time.perf_counter()
+                self._step(now)
+                self._flush_tx(now)
+
+                data = self._link.read(self._next_wake(now) - time.perf_counter())
+                if data:
+                    now = time.perf_counter()
+                    with self._lock:
+                        for cmd in self._framer.feed(data):
+                            self._on_rx(cmd, now)
+        finally:
+            self._link.close()
+
+
+# ===================== stress test =====================
+def run_stress(scans: int = 100, recog_ms: float = 50.0, fail_rate: float = 0.1, gap: float = 0.2,
+               timeout: float = 300.0, speculative: bool = True, **sim_kw) -> Dict[str, object]:
+    """
+    Sim + UARTDaemon thật: nhận diện giả (trả T/F sau recog_ms kể từ lúc daemon báo
+    on_person_detected — NG nếu speculative, CK nếu không), trigger lại sau RD + gap.
+    """
+    from .uart_daemon import UARTDaemon
+
+    rng = random.Random(sim_kw.get("seed"))
+    sim = AtmegaSim(**sim_kw)
+    done = threading.Event()
+    ready_count = [0]
+    holder: Dict[str, UARTDaemon] = {}
+
+    def _respond():
+        d = holder["d"]
+        if rng.random() < fail_rate:
+            d.send_fail(resend=True)
+        else:
+            d.send_success(20000000 + rng.randint(0, 999), resend=True)
+
+    def _arm():
+        # đang giữ lock của daemon => trả kết quả từ thread khác (như recog daemon thật)
+        threading.Timer(recog_ms / 1000.0, _respond).start()
+
+    def _on_ready():
+        ready_count[0] += 1
+        if ready_count[0] >= scans:
+            done.set()
+        else:
+            threading.Timer(gap, sim.trigger).start()
+
+    d = UARTDaemon(on_person_detected=_arm, on_ready=_on_ready,
+                   port=sim.port_name, reset_wait_sec=0.0, debug=False, speculative=speculative)
+    holder["d"] = d
+
+    sim.start()
+    if not d.start():
+        d.stop()
+        sim.stop()
+        raise RuntimeError(f"không mở được {sim.port_name}")
+
+    t0 = time.perf_counter()
+    sim.trigger()
+    # RD bị mất => daemon kẹt ở WAIT_RD, sim đã IDLE: trigger lại định kỳ để tiếp tục
+    while not done.wait(1.0):
+        if time.perf_counter() - t0 > timeout:
+            break
+        if sim.state == IDLE:
+            sim.trigger()
+    elapsed = time.perf_counter() - t0
+
+    d.stop()
+    sim.stop()
+    sim.join(timeout=1.0)
+
+    st = sim.stats()
+    return {
+        "scans": ready_count[0],
+        "elapsed_sec": round(elapsed, 2),
+        "scans_per_min": round(ready_count[0] / elapsed * 60.0, 1) if elapsed > 0 else 0.0,
+        "sim": st,
+        "daemon_latency": d.latency_stats(),
+        "handshake": d.handshake_stats(),
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="ATmega16 ảo + stress test UARTDaemon")
+    ap.add_argument("--port", default=None, help="COM ảo (Windows/com0com); mặc định pty")
+    ap.add_argument("--scans", type=int, default=100)
+    ap.add_argument("--recog-ms", type=float, default=50.0)
+    ap.add_argument("--fail-rate", type=float, default=0.1)
+    ap.add_argument("--gap", type=float, default=0.2, help="giây từ RD tới lần trigger kế (debounce NG của daemon 0.15 s)")
+    ap.add_argument("--result-hold", type=float, default=5.0, help="firmware giữ màn hình kết quả (s)")
+    ap.add_argument("--check-timeout", type=float, default=15.0)
+    ap.add_argument("--ck-delay-ms", type=float, default=0.0)
+    ap.add_argument("--tx-delay-ms", type=float, default=0.0)
+    ap.add_argument("--drop", type=float, default=0.0)
+    ap.add_argument("--dup", type=float, default=0.0)
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--timeout", type=float, default=300.0)
+    ap.add_argument("--strict", action="store_true", help="tắt speculative: chỉ nhận diện sau CK")
+    args = ap.parse_args(argv)
+
+    if args.port is None and sys.platform.startswith("win"):
+        ap.error("Windows không có pty: cần --port (1 đầu của cặp COM ảo)")
+
+    res = run_stress(
+        scans=args.scans, recog_ms=args.recog_ms, fail_rate=args.fail_rate, gap=args.gap,
+        timeout=args.timeout, speculative=not args.strict, port=args.port, result_hold=args.result_hold,
+        check_timeout=args.check_timeout, ck_delay=args.ck_delay_ms / 1000.0,
+        tx_delay=args.tx_delay_ms / 1000.0, drop_rate=args.drop, dup_rate=args.dup, seed=args.seed,
+    )
+    print(f"[SIM] {res['scans']} scans in {res['elapsed_sec']}s => {res['scans_per_min']} scans/min")
+    for k, v in res["sim"].items():
+        print(f"  {k:16s} {v}")
+    for k, v in res["daemon_latency"].items():
+        print(f"  rx->{k:12s} {v}")
+    for k, v in res["handshake"].items():
+        print(f"  {k:16s} {v}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
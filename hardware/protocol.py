@@ -15,7 +15,12 @@ PC -> ATmega
 RUOK        : Kiểm tra module
 F           : Nhận diện thất bại
 T<student>  : Nhận diện thành công (student_id)
+
+Framing: mỗi message là 1 dòng ASCII kết thúc bằng LF ("\r\n" hoặc "\n").
 """
+from typing import List
+
+MAX_LINE = 64   # dòng dài hơn => rác trên đường truyền, bỏ
 
 # ---------- ATmega -> PC ----------
 AVR_PERSON_DETECTED = "NG"
@@ -29,3 +34,43 @@ PC_FACE_FAIL        = "F"
 
 def pc_face_ok(student_id: str | int) -> str:
     return f"T{student_id}"
+
+
+class LineFramer:
+    """
+    Ghép byte stream thành message theo LF:
+    - 1 lần đọc có thể chứa nửa message, hoặc nhiều message
+    - bỏ CR / khoảng trắng 2 đầu, dòng rỗng
+    - phần chưa có LF giữ lại cho lần feed() sau (tối đa MAX_LINE byte)
+    """
+
+    def __init__(self, max_line: int = MAX_LINE):
+        self.max_line = max_line
+        self._buf = bytearray()
+        self.dropped = 0
+
+    def feed(self, data: bytes) -> List[str]:
+        out: List[str] = []
+        if not data:
+            return out
+        self._buf += data
+        while True:
+            i = self._buf.find(b"\n")
+            if i < 0:
+                break
+            raw = bytes(self._buf[:i])
+            del self._buf[:i + 1]
+            if len(raw) > self.max_line:
+                self.dropped += 1
+                continue
+            line = raw.decode("ascii", errors="ignore").strip()
+            if line:
+                out.append(line)
+        if len(self._buf) > self.max_line:
+            # không thấy LF quá lâu => rác, bỏ để buffer không phình
+            self._buf.clear()
+            self.dropped += 1
+        return out
+
+    def reset(self):
+        self._buf.clear()
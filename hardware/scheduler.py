@@ -0,0 +1,100 @@
+# hardware/scheduler.py
+"""
+Timer scheduler: 1 thread + heap các task hẹn giờ (thay cho tạo Thread / threading.Timer mỗi lần).
+
+- call_later(delay, fn, *args) -> task; cancel(task) (xóa lười: task bị bỏ qua khi tới hạn)
+- callback chạy tuần tự trên thread của scheduler => callback phải ngắn, không block lâu
+  (việc chậm như mở serial + chờ MCU reset: callback chỉ đánh thức thread khác làm)
+- đồng hồ: time.monotonic() (không bị ảnh hưởng khi đổi giờ hệ thống)
+"""
+from __future__ import annotations
+import heapq
+import itertools
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class TimerTask:
+    __slots__ = ("due", "fn", "args", "cancelled")
+
+    def __init__(self, due: float, fn: Callable[..., Any], args: Tuple[Any, ...]):
+        self.due = due
+        self.fn = fn
+        self.args = args
+        self.cancelled = False
+
+
+class TimerScheduler:
+    def __init__(self, name: str = "timer-scheduler"):
+        self.name = name
+        self._cv = threading.Condition()
+        self._heap: List[Tuple[float, int, TimerTask]] = []
+        self._seq = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._stats = {"scheduled": 0, "fired": 0, "cancelled": 0}
+
+    # ---------- lifecycle ----------
+    def start(self):
+        with self._cv:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        with self._cv:
+            self._running = False
+            self._heap.clear()
+            self._cv.notify()
+            th = self._thread
+            self._thread = None
+        if th and th is not threading.current_thread():
+            th.join(timeout=timeout)
+
+    # ---------- tasks ----------
+    def call_later(self, delay: float, fn: Callable[..., Any], *args: Any) -> TimerTask:
+        task = TimerTask(time.monotonic() + max(0.0, float(delay)), fn, args)
+        with self._cv:
+            heapq.heappush(self._heap, (task.due, next(self._seq), task))
+            self._stats["scheduled"] += 1
+            # chỉ đánh thức khi task mới thành task sớm nhất
+            if self._heap[0][2] is task:
+                self._cv.notify()
+        return task
+
+    def cancel(self, task: Optional[TimerTask]):
+        if task is None or task.cancelled:
+            return
+        with self._cv:
+            task.cancelled = True
+            self._stats["cancelled"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._cv:
+            return {**self._stats, "pending": sum(1 for _, _, t in self._heap if not t.cancelled)}
+
+    def _run(self):
+        while True:
+            with self._cv:
+                while True:
+                    if not self._running or self._thread is not threading.current_thread():
+                        return   # stop() (hoặc đã start() lại: thread mới thay)
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cv.wait()
+                        continue
+                    wait = self._heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        task = heapq.heappop(self._heap)[2]
+                        self._stats["fired"] += 1
+                        break
+                    self._cv.wait(wait)
+
+            try:
+                task.fn(*task.args)
+            except Exception as e:
+                print(f"[SCHEDULER] {self.name}: {e!r}")
@@ -4,7 +4,7 @@ import time
 import threading
 import serial
 from serial.tools import list_ports
-from typing import Callable, Optional
+from typing import Callable, Dict, Optional
 
 from .protocol import (
     AVR_PERSON_DETECTED,  # "NG"
@@ -14,7 +14,15 @@ from .protocol import (
     PC_CHECK_SENSOR,
     PC_FACE_FAIL,
     pc_face_ok,
+    LineFramer,
 )
+from .scheduler import TimerScheduler, TimerTask
+
+# read() block tối đa bao lâu khi không có byte (chỉ để kiểm tra stop / reconnect)
+RX_TIMEOUT_SEC = 0.2
+# reconnect khi mất COM: backoff lũy thừa 2 trong [MIN, MAX]
+RECONNECT_MIN_SEC = 0.5
+RECONNECT_MAX_SEC = 8.0
 
 class UARTDaemon:
     """
@@ -30,6 +38,19 @@ class UARTDaemon:
     Key:
     - UI/Recog chỉ nên bắt đầu scan khi CK đã tới.
     - Nếu UI gọi send_success/fail trước CK => lưu pending, đợi CK tới sẽ gửi.
+
+    speculative=True (mặc định): on_person_detected gọi ngay khi NG => PC nhận diện song song
+    trong lúc chờ CK; kết quả có trước CK nằm ở _pending_result, CK tới là gửi luôn.
+    speculative=False: on_person_detected chỉ gọi khi CK tới (handshake tuần tự).
+    handshake_stats(): sensor -> LCD (ước lượng: NG trên dây + NG..gửi kết quả + kết quả trên dây).
+
+    RX: read() blocking (trả về ngay khi có byte, timeout RX_TIMEOUT_SEC) + LineFramer,
+    không poll / sleep => message tới handler ngay sau khi LF tới.
+    latency_stats(): thời gian từ lúc đọc được byte tới lúc gọi callback, theo từng message.
+
+    Timer: 1 TimerScheduler / daemon cho gửi lại kết quả (WAIT_RD) và reconnect backoff
+    => không tạo thread mới mỗi lượt quét; tick gửi lại không giữ _lock khi ghi serial.
+    Tick reconnect chỉ đánh thức RX thread; connect() (chờ reset_wait_sec) chạy trên RX thread.
     """
 
     def __init__(
@@ -40,10 +61,16 @@ class UARTDaemon:
         baudrate: int = 9600,
         auto_reconnect: bool = True,
         debug: bool = True,
+        port: Optional[str] = None,          # None => tự dò CH340/CP210 (vd. pty của hardware/atmega_sim)
+        reset_wait_sec: float = 2.0,         # chờ MCU reset sau khi mở port
+        speculative: bool = True,            # nhận diện ngay từ NG, không đợi CK
     ):
         self.on_person_detected = on_person_detected
         self.on_ready = on_ready
         self.on_ck = on_ck
+        self.port = port
+        self.reset_wait_sec = float(reset_wait_sec)
+        self.speculative = bool(speculative)
         self.baudrate = baudrate
         self.auto_reconnect = auto_reconnect
         self.debug = debug
@@ -53,12 +80,24 @@ class UARTDaemon:
 
         self._rx_thread: Optional[threading.Thread] = None
         self._stop_evt = threading.Event()
+        self._framer = LineFramer()
+
+        # latency: msg -> [count, tổng ms, max ms, last ms]
+        self._lat: Dict[str, list] = {}
+        self._lat_lock = threading.Lock()
+
+        # handshake của phiên hiện tại (perf_counter) + tổng hợp
+        self._t_ng: Optional[float] = None
+        self._t_ck: Optional[float] = None
+        self._hs_sent = False
+        self._hs: Dict[str, list] = {}       # metric -> [count, tổng ms, max ms]
+        self._hs_pending_hits = 0            # kết quả có trước CK (speculative có lợi)
 
         # IDLE | WAIT_CK | RECOGNIZING | WAIT_RD
         self.state = "IDLE"
 
-        # debounce NG
-        self._last_ng_ts = 0.0
+        # debounce NG (time.monotonic)
+        self._last_ng_ts = -1.0
         self._ng_debounce_sec = 0.15
 
         # last sent result (for resend in WAIT_RD)
@@ -68,12 +107,20 @@ class UARTDaemon:
         self._pending_result: Optional[str] = None
 
         self._lock = threading.Lock()
+        self._tx_lock = threading.Lock()     # ghi serial (tick gửi lại chạy ngoài _lock)
 
-        # resend loop
-        self._resend_thread: Optional[threading.Thread] = None
-        self._resend_stop = threading.Event()
+        # timer: gửi lại + reconnect
+        self._sched = TimerScheduler(name="uart-scheduler")
+        self._resend_task: Optional[TimerTask] = None
+        self._resend_gen = 0
+        self._resend_deadline = 0.0
         self._resend_interval = 0.2
         self._resend_max_secs = 2.5
+        self._resend_count = 0
+        self._reconnect_task: Optional[TimerTask] = None
+        self._reconnect_due = threading.Event()   # scheduler báo tới hạn, RX thread mở port
+        self._reconnect_delay = RECONNECT_MIN_SEC
+        self._reconnect_attempts = 0
 
     def _log(self, *msg):
         # if self.debug:
@@ -91,7 +138,7 @@ class UARTDaemon:
         if self.ser and self.ser.is_open:
             return True
 
-        port = self._auto_detect_port()
+        port = self.port or self._auto_detect_port()
         if not port:
             self._log("No serial port found")
             return False
@@ -100,13 +147,14 @@ class UARTDaemon:
             self.ser = serial.Serial(
                 port=port,
                 baudrate=self.baudrate,
-                timeout=0.2,
+                timeout=RX_TIMEOUT_SEC,
                 parity=serial.PARITY_NONE,
                 stopbits=serial.STOPBITS_ONE,
                 bytesize=serial.EIGHTBITS,
             )
             self.port_name = port
-            time.sleep(2.0)  # allow MCU reset
+            if self.reset_wait_sec > 0:
+                self._stop_evt.wait(self.reset_wait_sec)  # allow MCU reset
             self._log(f"Connected to {port}")
             return True
         except Exception as e:
@@ -114,17 +162,27 @@ class UARTDaemon:
             self.ser = None
             return False
 
-    def start(self):
-        if not self.connect():
-            return False
+    def start(self) -> bool:
+        """True nếu mở được COM ngay; auto_reconnect thì vẫn chạy nền và thử lại theo backoff."""
         self._stop_evt.clear()
-        self._rx_thread = threading.Thread(target=self._rx_loop, daemon=True)
-        self._rx_thread.start()
-        return True
+        ok = self.connect()
+        if not ok and not self.auto_reconnect:
+            return False
+        self._sched.start()
+        if not ok:
+            self._schedule_reconnect()
+        if not (self._rx_thread and self._rx_thread.is_alive()):
+            self._rx_thread = threading.Thread(target=self._rx_loop, daemon=True)
+            self._rx_thread.start()
+        return ok
 
     def stop(self):
         self._stop_evt.set()
-        self._stop_resend_loop()
+        with self._lock:
+            self._stop_resend_loop()
+        self._sched.stop()
+        self._reconnect_task = None
+        self._reconnect_due.clear()
         if self.ser:
             try:
                 self.ser.close()
@@ -133,30 +191,44 @@ class UARTDaemon:
             self.ser = None
         self._log("Stopped")
 
+    def _read_chunk(self) -> bytes:
+        """Block tới khi có >=1 byte (hoặc timeout), rồi lấy luôn phần đã nằm trong buffer driver."""
+        ser = self.ser
+        data = ser.read(1)
+        if data:
+            n = ser.in_waiting
+            if n:
+                data += ser.read(n)
+        return data
+
     def _rx_loop(self):
         self._log("RX thread started")
 
+        last_ser = None
         while not self._stop_evt.is_set():
-            if self.auto_reconnect and (not self.ser or not self.ser.is_open):
-                self._log("Reconnecting...")
-                self.connect()
-                time.sleep(1.0)
-                continue
-
             try:
-                if self.ser and self.ser.in_waiting:
-                    raw = self.ser.readline()
-                    try:
-                        line = raw.decode("utf-8", errors="ignore").strip()
-                    except Exception:
-                        continue
-                    if not line:
-                        continue
+                ser = self.ser
+                if not ser or not ser.is_open:
+                    # scheduler lo backoff; mở port (kèm chờ MCU reset) chạy ở đây, RX đang rảnh
+                    if self._reconnect_due.wait(RX_TIMEOUT_SEC):
+                        self._reconnect_due.clear()
+                        self._try_reconnect()
+                    continue
+                if ser is not last_ser:
+                    self._framer.reset()    # port mới: bỏ mảnh dòng của port cũ
+                    last_ser = ser
+                data = self._read_chunk()
+                if not data:
+                    continue
+                t_rx = time.perf_counter()
+                for line in self._framer.feed(data):
                     self._log("RX:", line)
-                    self._handle_rx(line)
+                    self._handle_rx(line, t_rx)
 
-            except (serial.SerialException, OSError) as e:
-                # ✅ QUAN TRỌNG: rút cáp/COM lỗi -> reset ser để auto_reconnect chạy
+            except (serial.SerialException, OSError, TypeError, AttributeError) as e:
+                # ✅ QUAN TRỌNG: rút cáp/COM lỗi (hoặc stop() đóng port khi đang read) -> reset ser
+                if self._stop_evt.is_set():
+                    break
                 self._log("RX serial error:", e)
                 try:
                     if self.ser:
@@ -165,22 +237,113 @@ class UARTDaemon:
                     pass
                 self.ser = None
                 self.port_name = None
-                time.sleep(0.8)
+                self._schedule_reconnect()
                 continue
 
             except Exception as e:
                 # lỗi khác: vẫn giữ nhẹ nhàng nhưng cũng nên tránh loop quá nhanh
                 self._log("RX error:", e)
-                time.sleep(0.3)
-
-            time.sleep(0.01)
+                self._stop_evt.wait(0.3)
 
         self._log("RX thread exit")
 
-    def _handle_rx(self, msg: str):
+    # ---------------- reconnect (scheduler) ----------------
+    def _schedule_reconnect(self):
+        if not self.auto_reconnect or self._stop_evt.is_set():
+            return
+        with self._lock:
+            if self._reconnect_task is not None:
+                return
+            self._reconnect_task = self._sched.call_later(self._reconnect_delay, self._reconnect_tick)
+
+    def _reconnect_tick(self):
+        # chạy trên scheduler: chỉ đánh thức RX thread, không gọi connect() ở đây
+        # (connect chờ reset_wait_sec => sẽ làm trễ mọi task khác của scheduler)
+        with self._lock:
+            self._reconnect_task = None
+        self._reconnect_due.set()
+
+    def _try_reconnect(self):
+        """(RX thread) Thử mở lại port; lỗi thì lên lịch lần sau với backoff gấp đôi."""
+        if self._stop_evt.is_set():
+            return
+        self._reconnect_attempts += 1
+        self._log("Reconnecting...")
+        if self.connect():
+            self._reconnect_delay = RECONNECT_MIN_SEC
+            return
+        self._reconnect_delay = min(self._reconnect_delay * 2.0, RECONNECT_MAX_SEC)
+        self._schedule_reconnect()
+
+    def scheduler_stats(self) -> Dict[str, object]:
+        """Task của scheduler + số lần gửi lại / thử reconnect."""
+        return {
+            **self._sched.stats(),
+            "resends": self._resend_count,
+            "reconnect_attempts": self._reconnect_attempts,
+            "reconnect_delay_sec": self._reconnect_delay,
+        }
+
+    # ---------------- latency ----------------
+    def _mark_latency(self, msg: str, t_rx: Optional[float]):
+        if t_rx is None:
+            return
+        ms = (time.perf_counter() - t_rx) * 1000.0
+        with self._lat_lock:
+            st = self._lat.get(msg)
+            if st is None:
+                st = self._lat[msg] = [0, 0.0, 0.0, 0.0]
+            st[0] += 1
+            st[1] += ms
+            st[2] = max(st[2], ms)
+            st[3] = ms
+
+    def _wire_ms(self, text: str) -> float:
+        # 8N1: 10 bit / byte, + "\r\n"
+        return (len(text) + 2) * 10.0 / float(self.baudrate) * 1000.0
+
+    def _hs_add(self, metric: str, ms: float):
+        st = self._hs.get(metric)
+        if st is None:
+            st = self._hs[metric] = [0, 0.0, 0.0]
+        st[0] += 1
+        st[1] += ms
+        st[2] = max(st[2], ms)
+
+    def _mark_result_sent(self, payload: str, from_pending: bool):
+        """Gọi (giữ self._lock) khi kết quả của phiên được gửi LẦN ĐẦU."""
+        if self._hs_sent or self._t_ng is None:
+            return
+        self._hs_sent = True
+        now = time.perf_counter()
+        with self._lat_lock:
+            if from_pending:
+                self._hs_pending_hits += 1
+            self._hs_add("ng_to_result_ms", (now - self._t_ng) * 1000.0)
+            self._hs_add("sensor_to_lcd_ms", self._wire_ms(AVR_PERSON_DETECTED)
+                         + (now - self._t_ng) * 1000.0 + self._wire_ms(payload))
+
+    def handshake_stats(self) -> Dict[str, object]:
+        """{speculative, pending_hits, <metric>: {count, avg_ms, max_ms}} cho ng_to_ck / ng_to_result / sensor_to_lcd."""
+        with self._lat_lock:
+            out: Dict[str, object] = {"speculative": self.speculative, "pending_hits": self._hs_pending_hits}
+            for k, (c, tot, mx) in self._hs.items():
+                out[k] = {"count": c, "avg_ms": round(tot / c, 3) if c else 0.0, "max_ms": round(mx, 3)}
+            return out
+
+    def latency_stats(self) -> Dict[str, Dict[str, float]]:
+        """{msg: {count, avg_ms, max_ms, last_ms}} — byte tới -> callback/handler."""
+        with self._lat_lock:
+            return {
+                k: {"count": c, "avg_ms": round(tot / c, 3) if c else 0.0,
+                    "max_ms": round(mx, 3), "last_ms": round(last, 3)}
+                for k, (c, tot, mx, last) in self._lat.items()
+            }
+
+    def _handle_rx(self, msg: str, t_rx: Optional[float] = None):
         # --- NG: person detected ---
         if msg == AVR_PERSON_DETECTED:
-            now = time.time()
+            now = time.monotonic()
             if (now - self._last_ng_ts) < self._ng_debounce_sec:
                 self._log("NG debounced")
                 return
@@ -193,11 +356,17 @@ class UARTDaemon:
                     self._pending_result = None
                     self._last_result = None
                     self._stop_resend_loop()
+                    self._t_ng = t_rx if t_rx is not None else time.perf_counter()
+                    self._t_ck = None
+                    self._hs_sent = False
 
-                    try:
-                        self.on_person_detected()
-                    except Exception as e:
-                        self._log("on_person_detected error:", e)
+                    self._mark_latency(msg, t_rx)
+                    if self.speculative:
+                        # ✅ nhận diện chạy ngay, song song với chờ CK
+                        try:
+                            self.on_person_detected()
+                        except Exception as e:
+                            self._log("on_person_detected error:", e)
                 else:
                     self._log("Ignored NG (state =", self.state, ")")
             return
@@ -208,6 +377,17 @@ class UARTDaemon:
                 if self.state == "WAIT_CK":
                     self._log("ATmega CK -> RECOGNIZING")
                     self.state = "RECOGNIZING"
+                    self._mark_latency(msg, t_rx)
+                    self._t_ck = t_rx if t_rx is not None else time.perf_counter()
+                    if self._t_ng is not None:
+                        with self._lat_lock:
+                            self._hs_add("ng_to_ck_ms", (self._t_ck - self._t_ng) * 1000.0)
+
+                    if not self.speculative:
+                        try:
+                            self.on_person_detected()
+                        except Exception as e:
+                            self._log("on_person_detected error:", e)
 
                     # ✅ báo UI: "bắt đầu scan"
                     if self.on_ck:
@@ -222,6 +402,7 @@ class UARTDaemon:
                         self._pending_result = None
                         sent = self._send(payload)
                         if sent:
+                            self._mark_result_sent(payload, from_pending=True)
                             self._last_result = payload
                             self.state = "WAIT_RD"
                             self._start_resend_loop()
@@ -231,6 +412,7 @@ class UARTDaemon:
 
         # --- CF: confirm OK ---
         if msg == AVR_CONFIRM_OK:
+            self._mark_latency(msg, t_rx)
             self._log("ATmega confirmed OK (CF)")
             return
 
@@ -241,9 +423,9 @@ class UARTDaemon:
                 self.state = "IDLE"
                 self._last_result = None
                 self._pending_result = None
+                self._stop_resend_loop()
 
-            self._stop_resend_loop()
-
+            self._mark_latency(msg, t_rx)
             if self.on_ready:
                 try:
                     self.on_ready()
@@ -259,8 +441,9 @@ class UARTDaemon:
             return False
         try:
             payload = (text + "\r\n").encode("ascii", errors="ignore")
-            self.ser.write(payload)
-            self.ser.flush()
+            with self._tx_lock:
+                self.ser.write(payload)
+                self.ser.flush()
             self._log("TX:", repr(payload))
             return True
         except Exception as e:
@@ -268,31 +451,29 @@ class UARTDaemon:
             return False
 
     def _start_resend_loop(self):
-        self._resend_stop.set()
-        if self._resend_thread and self._resend_thread.is_alive():
-                try:
-                    self._resend_thread.join(timeout=0.3)
-                except Exception:
-                    pass
-        self._resend_stop.clear()
-
-        def worker():
-            t0 = time.time()
-            while not self._resend_stop.is_set():
-                with self._lock:
-                    if self.state != "WAIT_RD" or not self._last_result:
-                        break
-                    self._send(self._last_result)
-
-                if (time.time() - t0) >= self._resend_max_secs:
-                    break
-                time.sleep(self._resend_interval)
-
-        self._resend_thread = threading.Thread(target=worker, daemon=True)
-        self._resend_thread.start()
+        """(giữ self._lock) Gửi lại _last_result mỗi _resend_interval, tối đa _resend_max_secs."""
+        self._stop_resend_loop()
+        self._resend_deadline = time.monotonic() + self._resend_max_secs
+        self._resend_task = self._sched.call_later(self._resend_interval, self._resend_tick, self._resend_gen)
 
     def _stop_resend_loop(self):
-        self._resend_stop.set()
+        """(giữ self._lock) Hủy chuỗi gửi lại; tick cũ đang chạy dở sẽ thấy gen đổi và dừng."""
+        self._resend_gen += 1
+        self._sched.cancel(self._resend_task)
+        self._resend_task = None
+
+    def _resend_tick(self, gen: int):
+        with self._lock:
+            if gen != self._resend_gen:
+                return
+            payload = self._last_result if self.state == "WAIT_RD" else None
+            if not payload or time.monotonic() > self._resend_deadline:
+                self._resend_task = None
+                return
+            self._resend_task = self._sched.call_later(self._resend_interval, self._resend_tick, gen)
+            self._resend_count += 1
+        # ghi serial ngoài _lock => RX (NG/CK/RD) không phải chờ flush
+        self._send(payload)
 
     # ---------------- Public APIs ----------------
     def send_fail(self, resend: bool = False):
@@ -309,11 +490,12 @@ class UARTDaemon:
 
             ok = self._send(payload)
             if ok:
+                self._mark_result_sent(payload, from_pending=False)
                 self._last_result = payload
                 self.state = "WAIT_RD"
 
-        if resend or self.state == "WAIT_RD":
-            self._start_resend_loop()
+            if self.state == "WAIT_RD":
+                self._start_resend_loop()
 
     def send_success(self, student_id: str | int, resend: bool = False):
         payload = pc_face_ok(student_id)
@@ -329,11 +511,12 @@ class UARTDaemon:
 
             ok = self._send(payload)
             if ok:
+                self._mark_result_sent(payload, from_pending=False)
                 self._last_result = payload
                 self.state = "WAIT_RD"
 
-        if resend or self.state == "WAIT_RD":
-            self._start_resend_loop()
+            if self.state == "WAIT_RD":
+                self._start_resend_loop()
 
     def send_ruok(self):
         self._send(PC_CHECK_SENSOR)
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import csv
 import calendar
 from datetime import date
 import os
@@ -18,6 +17,8 @@ from db.attendance_dal import (
 )
 
 from tabs.Statistic.widget.monthly_donut import MonthlyDonutChart
+from db.csv_export import export_csv
+from tabs.base import AsyncDBMixin, ExportMixin
 
 
 # =========================================================
@@ -53,10 +54,49 @@ class MiniStat(tk.Frame):
         self.lbl_value.configure(text=str(v))
 
 
+def _load_month_rows(y: int, m: int) -> list[dict]:
+    """Chạy trên DB worker: summary tháng cho toàn bộ nhân viên ACTIVE."""
+    rows = []
+    # ✅ ONLY ACTIVE EMPLOYEES
+    for e in list_employees(active_only=True):
+        s = get_monthly_employee_summary(e["employee_id"], y, m)
+
+        # ✅ total days đúng theo hire_date/end_date (và không tính ngày tương lai nếu là tháng hiện tại)
+        total = MonthlySummaryTab._calc_effective_days(e, y, m)
+
+        # ✅ Absent phải <= total_days
+        absent = max(total - s["present"] - s["late"], 0)
+
+        row = dict(e)
+        row.update(s)
+        row["absent"] = absent
+        row["total_days"] = total
+        rows.append(row)
+    return rows
+
+
+def _load_face_image(employee_id: int, target: int = 180):
+    """Chạy trên DB worker: get_face + decode/crop ảnh (PIL), Tk chỉ tạo PhotoImage."""
+    face = get_face(employee_id)
+    if not face or not os.path.exists(face["image_path"]):
+        return None
+    im = Image.open(face["image_path"]).convert("RGB")
+
+    # Resize + crop vuông để fit khung preview
+    w, h = im.size
+    scale = target / min(w, h)
+    nw, nh = int(w * scale), int(h * scale)
+    im = im.resize((nw, nh), Image.LANCZOS)
+
+    left = (nw - target) // 2
+    top = (nh - target) // 2
+    return im.crop((left, top, left + target, top + target))
+
+
 # =========================================================
 # Monthly Summary Tab
 # =========================================================
-class MonthlySummaryTab(tb.Frame):
+class MonthlySummaryTab(tb.Frame, AsyncDBMixin, ExportMixin):
     def __init__(self, parent):
         super().__init__(parent)
 
@@ -308,22 +348,10 @@ class MonthlySummaryTab(tb.Frame):
         if not y:
             return
 
-        # ✅ ONLY ACTIVE EMPLOYEES
-        for e in list_employees(active_only=True):
-            s = get_monthly_employee_summary(e["employee_id"], y, m)
-
-            # ✅ total days đúng theo hire_date/end_date (và không tính ngày tương lai nếu là tháng hiện tại)
-            total = self._calc_effective_days(e, y, m)
-
-            # ✅ Absent phải <= total_days
-            absent = max(total - s["present"] - s["late"], 0)
-
-            row = dict(e)
-            row.update(s)
-            row["absent"] = absent
-            row["total_days"] = total
-            self._rows.append(row)
+        self._db_async("refresh", _load_month_rows, y, m, on_done=self._apply_rows)
 
+    def _apply_rows(self, rows: list[dict]):
+        self._rows = list(rows or [])
         self._fill_tree()
 
     def _fill_tree(self):
@@ -401,29 +429,19 @@ class MonthlySummaryTab(tb.Frame):
         for k in self._pv:
             self._pv[k].configure(text=str(emp.get(k, "")))
 
-        face = get_face(emp["employee_id"])
-        if face and os.path.exists(face["image_path"]):
-            try:
-                im = Image.open(face["image_path"]).convert("RGB")
-
-                # Resize + crop vuông để fit khung preview
-                target = 180
-                w, h = im.size
-                scale = target / min(w, h)
-                nw, nh = int(w * scale), int(h * scale)
-                im = im.resize((nw, nh), Image.LANCZOS)
-
-                left = (nw - target) // 2
-                top = (nh - target) // 2
-                im = im.crop((left, top, left + target, top + target))
-
-                img = ImageTk.PhotoImage(im)
-                self._photo_ref = img  # giữ reference
-                self.lbl_img.configure(image=img, text="")
-            except Exception:
-                self.lbl_img.configure(image="", text="Invalid image")
-        else:
-            self.lbl_img.configure(image="", text="No image")
+        def _done(im):
+            if im is None:
+                self.lbl_img.configure(image="", text="No image")
+                return
+            img = ImageTk.PhotoImage(im)
+            self._photo_ref = img  # giữ reference
+            self.lbl_img.configure(image=img, text="")
+
+        self._db_async(
+            "preview", _load_face_image, emp["employee_id"],
+            on_done=_done,
+            on_error=lambda e: self.lbl_img.configure(image="", text="Invalid image"),
+        )
 
     # =====================================================
     # Utils
@@ -462,18 +480,6 @@ class MonthlySummaryTab(tb.Frame):
         if not path:
             return
 
-        with open(path, "w", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
-            w.writerow(
-                ["employee_id","student_id","full_name","present","late","absent","total_days"]
-            )
-            for r in self._rows:
-                w.writerow([
-                    r["employee_id"],
-                    r.get("student_id",""),
-                    r.get("full_name",""),
-                    r["present"],
-                    r["late"],
-                    r["absent"],
-                    r["total_days"],
-                ])
+        cols = ["employee_id","student_id","full_name","present","late","absent","total_days"]
+        rows = list(self._rows)
+        self._run_export(path, lambda progress: export_csv(path, cols, rows, progress=progress, total=len(rows)))
@@ -10,12 +10,15 @@
 #     * Logs (Month): uses selected Year/Month; realtime if current month, else static
 # - Input guard: warns if Year/Month is in the future
 # - Chart auto-refresh every 1s when viewing current month (DB mode)
+# - Range: Month (theo ngày) / Academic year / Last 12 months / Last 3 years
+#     * dùng db/stats_rollup: tự chọn ngày / tuần / tháng theo bề rộng canvas, LTTB nếu vẫn dư điểm
 # ─────────────────────────────────────────────────────────────────────────────
 import os
 import math
 import calendar
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 
+import numpy as np
 import tkinter as tk
 import ttkbootstrap as tb
 from ttkbootstrap.constants import *
@@ -25,8 +28,10 @@ from tkinter import messagebox
 from db.db_conn import fetch_one, execute as db_execute
 from db.attendance_dal import (
     count_employees, count_faces, count_logs_on_date, count_logs_in_month,
-    get_daily_stack_plus,
+    get_daily_stack_plus, invalidate_cache,
 )
+from db.stats_rollup import get_stack_series
+from tabs.base import AsyncDBMixin
 
 # Reuse the StatCard UI (same as Home tab) for KPI counters
 try:
@@ -44,14 +49,70 @@ APP_BASE    = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SHIFT_START = "06:00"
 SHIFT_END   = "18:00"
 
+RANGE_MODES = ("Month", "Academic year", "Last 12 months", "Last 3 years")
+ACADEMIC_YEAR_START_MONTH = 9     # năm học: 01/09 -> 31/08
+PX_PER_POINT = 8                  # số điểm tối đa của chart = bề rộng vùng vẽ / PX_PER_POINT
+
 
 # ─────────────────────────── Helpers
 def _clamp(v, lo, hi):
     return lo if v < lo else hi if v > hi else v
 
 
+def _load_kpis(y, m):
+    """Chạy trên DB worker: gom 4 KPI vào 1 request."""
+    out = {}
+    for name, fn in (
+        ("emp",   lambda: count_employees(active_only=True)),
+        ("faces", count_faces),
+        ("today", lambda: count_logs_on_date(date.today())),
+        ("month", lambda: count_logs_in_month(y, m) if y else None),
+    ):
+        try:
+            out[name] = fn()
+        except Exception:
+            out[name] = None
+    return out
+
+
+def _load_month_stack(y, m):
+    first_day = date(y, m, 1)
+    last_day  = date(y, m, calendar.monthrange(y, m)[1])
+    return get_daily_stack_plus(first_day, last_day)
+
+
+def _add_months(y, m, k):
+    y2, m2 = divmod(m - 1 + k, 12)
+    return y + y2, m2 + 1
+
+
+def _range_of(mode, y, m):
+    """(d1, d2, caption) của range đang chọn, neo theo Year/Month."""
+    last = date(y, m, calendar.monthrange(y, m)[1])
+    if mode == "Academic year":
+        y0 = y if m >= ACADEMIC_YEAR_START_MONTH else y - 1
+        return (date(y0, ACADEMIC_YEAR_START_MONTH, 1),
+                date(y0 + 1, ACADEMIC_YEAR_START_MONTH, 1) - timedelta(days=1),
+                f"academic year {y0}–{y0 + 1}")
+    if mode == "Last 3 years":
+        y1, m1 = _add_months(y, m, -35)
+        return date(y1, m1, 1), last, f"{y1}-{m1:02d} → {y}-{m:02d}"
+    y1, m1 = _add_months(y, m, -11)
+    return date(y1, m1, 1), last, f"{y1}-{m1:02d} → {y}-{m:02d}"
+
+
 # ─────────────────────────── Canvas Chart
 class AreaChartPanel(tk.Canvas):
+    """
+    100% stacked area, retained mode:
+    - lớp tĩnh (title, khung, grid, trục, nhãn, legend) chỉ vẽ lại khi đổi kích thước / trục X / title
+    - 3 polygon + 3 đường viền tạo 1 lần, đổi dữ liệu / animation chỉ gọi coords()
+    - crosshair + tooltip là item riêng, hover chỉ di chuyển / đổi text (không tạo item mới)
+    - series giữ dạng numpy array: %/stack/toạ độ tính vector hoá, hover dùng searchsorted
+      => range nhiều năm (1000+ điểm) vẫn mượt
+    """
+    TOOLTIP_LINES = 5
+
     def __init__(self, parent, colors):
         super().__init__(parent, bg=colors["bg_secondary"], highlightthickness=0)
         self.colors = colors
@@ -63,6 +124,7 @@ class AreaChartPanel(tk.Canvas):
         self.absent = []
         self.totals = []
         self.title = "Daily Attendance — 100% Stacked Area"
+        self.x_title = "Day"
 
         # layout
         self.margins = {"left": 90, "right": 60, "top": 110, "bottom": 90}
@@ -77,26 +139,56 @@ class AreaChartPanel(tk.Canvas):
         self.anim_step = 0.07  # progress per tick
         self.anim_ms = 16
 
-        # binds
-        self.bind("<Motion>", self._on_motion)
-        self.bind("<Leave>", self._on_leave)
-        self.bind("<Configure>", lambda e: self.redraw())
-
         # legend colors
         self.col_present = "#58A6FF"   # blue
         self.col_late    = "#D29922"   # yellow
         self.col_absent  = "#F85149"   # red
         self.border_line = self.colors["text_primary"]
 
+        # retained items
+        self._static_key = None   # (w, h, n, days, title, x_title) của lớp tĩnh hiện tại
+        self._geom = None         # (x, y, cw, ch, xs: np.ndarray)
+        self._pct = np.zeros((3, 0))   # hàng: % present / late / absent (chưa nhân hệ số animation)
+        self._create_items()
+
+        # binds
+        self.bind("<Motion>", self._on_motion)
+        self.bind("<Leave>", self._on_leave)
+        self.bind("<Configure>", lambda e: self.redraw())
+
+    def _create_items(self):
+        hidden = "hidden"
+        self._poly_pres = self.create_polygon(0, 0, 0, 0, 0, 0, fill=self.col_present, outline="",
+                                              stipple="gray25", state=hidden, tags=("data",))
+        self._poly_late = self.create_polygon(0, 0, 0, 0, 0, 0, fill=self.col_late, outline="",
+                                              stipple="gray25", state=hidden, tags=("data",))
+        self._poly_abs = self.create_polygon(0, 0, 0, 0, 0, 0, fill=self.col_absent, outline="",
+                                             stipple="gray25", state=hidden, tags=("data",))
+        self._line_pres = self.create_line(0, 0, 0, 0, fill=self.col_present, width=2, state=hidden, tags=("data",))
+        self._line_late = self.create_line(0, 0, 0, 0, fill=self.col_late, width=2, state=hidden, tags=("data",))
+        self._line_abs = self.create_line(0, 0, 0, 0, fill=self.col_absent, width=2, state=hidden, tags=("data",))
+
+        self._cross = self.create_line(0, 0, 0, 0, fill=self.colors["hover"], width=2, state=hidden, tags=("hover",))
+        self._tip_box = self.create_rectangle(0, 0, 0, 0, fill=self.colors["bg_primary"],
+                                              outline=self.colors["border"], width=2, state=hidden, tags=("hover",))
+        self._tip_text = [
+            self.create_text(0, 0, text="", anchor="nw", font=("Segoe UI", 10), state=hidden, tags=("hover",))
+            for _ in range(self.TOOLTIP_LINES)
+        ]
+
     # Public API
-    def set_series(self, days, present, late, absent, totals, title=None, *, animate: bool = True):
+    def set_series(self, days, present, late, absent, totals, title=None, *, animate: bool = True,
+                   x_title=None):
         """
         Set/Update data.
+        - days: số ngày (int, hiện dạng 01..31) hoặc nhãn bucket (str: "2025-W36", "2025-09", ...)
         - animate=True: run grow animation (useful on first render / month change)
         - animate=False: update instantly (useful for auto-refresh)
         """
         new_days = list(days or [])
         same_x = (new_days == getattr(self, "days", []))
+        same_data = same_x and (list(present or []), list(late or []), list(absent or []), list(totals or [])) \
+            == (self.present, self.late, self.absent, self.totals)
 
         self.days = new_days
         self.present = list(present or [])
@@ -105,6 +197,10 @@ class AreaChartPanel(tk.Canvas):
         self.totals = list(totals or [])
         if title:
             self.title = title
+        if x_title:
+            self.x_title = x_title
+
+        self._pct = self._compute_pct()
 
         # Nếu chỉ refresh dữ liệu trong cùng tháng (X axis không đổi) thì KHÔNG chạy animation lại.
         if animate and (not same_x):
@@ -112,12 +208,15 @@ class AreaChartPanel(tk.Canvas):
         else:
             self.anim_running = False
             self.anim_progress = 1.0
+            if same_data and self._static_key is not None and self._static_key[4:] == (self.title, self.x_title):
+                return   # auto-refresh không đổi gì => không đụng canvas
             self.redraw()
 
     # Animation
     def _start_anim(self):
         self.anim_progress = 0.0
         self.anim_running = True
+        self._layout_static()
         self._animate()
 
     def _animate(self):
@@ -127,34 +226,48 @@ class AreaChartPanel(tk.Canvas):
         if self.anim_progress >= 1.0:
             self.anim_progress = 1.0
             self.anim_running = False
-        self.redraw()
+        self._update_data()
         if self.anim_running:
             self.after(self.anim_ms, self._animate)
 
     # Hover
     def _on_motion(self, e):
         self._hover_x = e.x
-        self.redraw()
+        self._update_hover()
 
     def _on_leave(self, e):
         self._hover_x = None
         self._last_hover_idx = None
-        self.redraw()
+        self._update_hover()
 
     def _nearest_day_index(self, x, xs):
-        if not xs:
+        n = len(xs)
+        if n == 0:
             return None
-        # find nearest by abs diff
-        best_i = 0
-        best_d = 1e18
-        for i, xx in enumerate(xs):
-            d = abs(x - xx)
-            if d < best_d:
-                best_d = d
-                best_i = i
-        return best_i
-
-    def _draw_tooltip(self, idx, x, y, w, h, xs, y0):
+        # xs tăng dần => nhị phân: O(log n)
+        i = int(np.searchsorted(xs, x))
+        if i <= 0:
+            return 0
+        if i >= n:
+            return n - 1
+        return i if (xs[i] - x) < (x - xs[i - 1]) else i - 1
+
+    def _update_hover(self, force: bool = False):
+        g = self._geom
+        idx = None
+        if self._hover_x is not None and g is not None and self.days:
+            idx = self._nearest_day_index(self._hover_x, g[4])
+
+        if idx is None:
+            if self._last_hover_idx is not None or force:
+                self.itemconfigure("hover", state="hidden")
+            self._last_hover_idx = None
+            return
+        if idx == self._last_hover_idx and not force:
+            return
+        self._draw_tooltip(idx, *g)
+
+    def _draw_tooltip(self, idx, x, y, w, h, xs):
         if idx is None or idx < 0 or idx >= len(self.days):
             return
 
@@ -171,7 +284,7 @@ class AreaChartPanel(tk.Canvas):
 
         # Tooltip (concise)
         lines = [
-            (f"Day {self.days[idx]:02d}", self.colors["text_primary"]),
+            (self._fmt_tip(self.days[idx]), self.colors["text_primary"]),
             (f"Present: {pv}  ({p_pct:.1f}%)", self.col_present),
             (f"Late:    {lv}  ({l_pct:.1f}%)", self.col_late),
             (f"Absent:  {av}  ({a_pct:.1f}%)", self.col_absent),
@@ -185,33 +298,58 @@ class AreaChartPanel(tk.Canvas):
         box_h = pad * 2 + line_h * len(lines)
 
         # position near cursor line
-        tx = xs[idx] + 14
+        cx = float(xs[idx])
+        tx = cx + 14
         ty = y + 14
         if tx + box_w > x + w:
-            tx = xs[idx] - box_w - 14
+            tx = cx - box_w - 14
         if ty + box_h > y + h:
             ty = y + h - box_h - 6
         tx = _clamp(tx, x + 6, x + w - box_w - 6)
         ty = _clamp(ty, y + 6, y + h - box_h - 6)
 
-        # bg + border
-        self.create_rectangle(
-            tx, ty, tx + box_w, ty + box_h,
-            fill=self.colors["bg_primary"], outline=self.colors["border"], width=2
-        )
-
-        # text
+        self.coords(self._cross, cx, y, cx, y + h)
+        self.coords(self._tip_box, tx, ty, tx + box_w, ty + box_h)
         yy = ty + pad
-        for txt, col in lines:
-            self.create_text(tx + pad, yy, text=txt, fill=col, anchor="nw", font=("Segoe UI", 10))
+        for item, (txt, col) in zip(self._tip_text, lines):
+            self.coords(item, tx + pad, yy)
+            self.itemconfigure(item, text=txt, fill=col)
             yy += line_h
+        self.itemconfigure("hover", state="normal")
+        self.tag_raise("hover")
+
+    @staticmethod
+    def _fmt_x(v):
+        return f"{v:02d}" if isinstance(v, int) else str(v)
+
+    def _fmt_tip(self, v):
+        return f"Day {v:02d}" if isinstance(v, int) else f"{self.x_title} {v}"
 
     # Main redraw
     def redraw(self):
-        self.delete("all")
+        """Cập nhật toàn bộ: lớp tĩnh (nếu cần) + dữ liệu + hover."""
+        self._layout_static()
+        self._update_data()
+
+    def _compute_pct(self):
+        n = len(self.days)
+        if n == 0:
+            return np.zeros((3, 0))
+        vals = np.array([self.present[:n], self.late[:n], self.absent[:n]], dtype=float)
+        t = np.maximum(np.asarray(self.totals[:n], dtype=float), 1.0)
+        return np.maximum(vals, 0.0) / t * 100.0
+
+    def _layout_static(self):
         w = self.winfo_width()
         h = self.winfo_height()
+        n = len(self.days)
+        key = (w, h, n, tuple(self.days), self.title, self.x_title)
+        if key == self._static_key:
+            return
+        self._static_key = key
+        self.delete("static")
         if w < 10 or h < 10:
+            self._geom = None
             return
 
         m = self.margins
@@ -219,77 +357,53 @@ class AreaChartPanel(tk.Canvas):
         y = m["top"]
         cw = max(10, w - m["left"] - m["right"])
         ch = max(10, h - m["top"] - m["bottom"])
+        st = ("static",)
 
         # title
         self.create_text(
             x + cw / 2, 26,
             text=self.title, fill=self.colors["text_primary"],
-            font=("Segoe UI", 12, "bold")
+            font=("Segoe UI", 12, "bold"), tags=st
         )
         self.create_text(
             x + cw / 2, 48,
-            text="Hover to inspect day details", fill=self.colors["text_secondary"],
-            font=("Segoe UI", 9)
+            text=f"Hover to inspect {self.x_title.lower()} details", fill=self.colors["text_secondary"],
+            font=("Segoe UI", 9), tags=st
         )
 
         # plot bg
-        self.create_rectangle(x, y, x + cw, y + ch, fill=self.colors["bg_secondary"], outline=self.colors["border"], width=2)
+        self.create_rectangle(x, y, x + cw, y + ch, fill=self.colors["bg_secondary"], outline=self.colors["border"],
+                              width=2, tags=st)
 
         # if no data
-        n = len(self.days)
         if n <= 0:
-            self.create_text(x + cw/2, y + ch/2, text="No data", fill=self.colors["text_secondary"], font=("Segoe UI", 12))
+            self._geom = None
+            self.create_text(x + cw/2, y + ch/2, text="No data", fill=self.colors["text_secondary"],
+                             font=("Segoe UI", 12), tags=st)
+            self.tag_lower("static")
             return
 
         # compute x positions
         if n == 1:
-            xs = [x + cw / 2]
+            xs = np.array([x + cw / 2])
         else:
-            xs = [x + (i * cw / (n - 1)) for i in range(n)]
-
-        # compute stacked % arrays
-        p_pct = []
-        l_pct = []
-        a_pct = []
-        for i in range(n):
-            t = max(self.totals[i], 1)
-            p = max(self.present[i], 0)
-            L = max(self.late[i], 0)
-            a = max(self.absent[i], 0)
-            p_pct.append(p / t * 100.0)
-            l_pct.append(L / t * 100.0)
-            a_pct.append(a / t * 100.0)
-
-        # apply animation factor (grow up)
-        k = _clamp(self.anim_progress, 0.0, 1.0)
-        p_pct = [v * k for v in p_pct]
-        l_pct = [v * k for v in l_pct]
-        a_pct = [v * k for v in a_pct]
-
-        # y mapping (0..100)
-        def y_of(pct):
-            return y + ch - (pct / 100.0) * ch
-
-        # stacked boundaries (✅ Present ở đáy)
-        # present: 0 -> p
-        # late:    p -> p+L
-        # absent:  p+L -> p+L+a
-        y_pres_top = [y_of(p_pct[i]) for i in range(n)]
-        y_late_top = [y_of(p_pct[i] + l_pct[i]) for i in range(n)]
-        y_abs_top  = [y_of(p_pct[i] + l_pct[i] + a_pct[i]) for i in range(n)]  # should end at 100*k
+            xs = np.linspace(x, x + cw, n)
+        self._geom = (x, y, cw, ch, xs)
 
         # gridlines + Y labels (0..100)
         for pct in (0, 25, 50, 75, 100):
-            yy = y_of(pct)
-            self.create_line(x, yy, x + cw, yy, fill=self.colors["border"], width=1)
-            self.create_text(x - 14, yy, text=f"{pct}%", fill=self.colors["text_secondary"], anchor="e", font=("Segoe UI", 9))
+            yy = y + ch - (pct / 100.0) * ch
+            self.create_line(x, yy, x + cw, yy, fill=self.colors["border"], width=1, tags=st)
+            self.create_text(x - 14, yy, text=f"{pct}%", fill=self.colors["text_secondary"], anchor="e",
+                             font=("Segoe UI", 9), tags=st)
 
         # axes
-        self.create_line(x, y, x, y + ch, fill=self.colors["text_primary"], width=2)
-        self.create_line(x, y + ch, x + cw, y + ch, fill=self.colors["text_primary"], width=2)
+        self.create_line(x, y, x, y + ch, fill=self.colors["text_primary"], width=2, tags=st)
+        self.create_line(x, y + ch, x + cw, y + ch, fill=self.colors["text_primary"], width=2, tags=st)
 
         # Y axis label (vertical)
-        self.create_text(28, y + ch/2, text="Percent (%)", fill=self.colors["text_secondary"], angle=90, font=("Segoe UI", 10))
+        self.create_text(28, y + ch/2, text="Percent (%)", fill=self.colors["text_secondary"], angle=90,
+                         font=("Segoe UI", 10), tags=st)
 
         # X labels (day)
         step = 1
@@ -301,56 +415,73 @@ class AreaChartPanel(tk.Canvas):
             step = 1
 
         for i in range(0, n, step):
-            self.create_text(xs[i], y + ch + 18, text=f"{self.days[i]:02d}", fill=self.colors["text_secondary"], font=("Segoe UI", 9))
+            self.create_text(xs[i], y + ch + 18, text=self._fmt_x(self.days[i]), fill=self.colors["text_secondary"],
+                             font=("Segoe UI", 9), tags=st)
         # last label
         if (n - 1) % step != 0:
-            self.create_text(xs[-1], y + ch + 18, text=f"{self.days[-1]:02d}", fill=self.colors["text_secondary"], font=("Segoe UI", 9))
+            self.create_text(xs[-1], y + ch + 18, text=self._fmt_x(self.days[-1]), fill=self.colors["text_secondary"],
+                             font=("Segoe UI", 9), tags=st)
 
         # X axis label
-        self.create_text(x + cw / 2, y + ch + 44, text="Day", fill=self.colors["text_secondary"], font=("Segoe UI", 10))
-
-        # --- Filled stacked areas (polygons) ---
-        # Present area: baseline -> present top
-        poly_pres = [(xs[0], y + ch)] + list(zip(xs, y_pres_top)) + [(xs[-1], y + ch)]
-        self.create_polygon(poly_pres, fill=self.col_present, outline="", stipple="gray25")
-
-        # Late area: present top -> late top
-        poly_late = list(zip(xs, y_pres_top)) + list(zip(xs[::-1], y_late_top[::-1]))
-        self.create_polygon(poly_late, fill=self.col_late, outline="", stipple="gray25")
-
-        # Absent area: late top -> absent top
-        poly_abs = list(zip(xs, y_late_top)) + list(zip(xs[::-1], y_abs_top[::-1]))
-        self.create_polygon(poly_abs, fill=self.col_absent, outline="", stipple="gray25")
-
-        # Borders (đúng thứ tự đáy -> đỉnh)
-        self._stroke_path(xs, y_pres_top, self.col_present, 2)
-        self._stroke_path(xs, y_late_top, self.col_late, 2)
-        self._stroke_path(xs, y_abs_top,  self.col_absent, 2)
+        self.create_text(x + cw / 2, y + ch + 44, text=self.x_title, fill=self.colors["text_secondary"],
+                         font=("Segoe UI", 10), tags=st)
 
         # Legend (top-right inside margins area)
         lx = x + cw - 10
         ly = y - 70
         items = [("Present", self.col_present), ("Late", self.col_late), ("Absent", self.col_absent)]
         for label, col in items:
-            self.create_rectangle(lx - 96, ly, lx - 84, ly + 12, fill=col, outline="")
-            self.create_text(lx - 78, ly + 6, text=label, fill=self.colors["text_primary"], anchor="w", font=("Segoe UI", 9))
+            self.create_rectangle(lx - 96, ly, lx - 84, ly + 12, fill=col, outline="", tags=st)
+            self.create_text(lx - 78, ly + 6, text=label, fill=self.colors["text_primary"], anchor="w",
+                             font=("Segoe UI", 9), tags=st)
             ly += 18
 
-        # hover crosshair + tooltip
-        if self._hover_x is not None:
-            idx = self._nearest_day_index(self._hover_x, xs)
-            if idx is not None:
-                xx = xs[idx]
-                self.create_line(xx, y, xx, y + ch, fill=self.colors["hover"], width=2)
-                # tooltip near top of present boundary
-                #self._draw_tooltip(idx, x, y, cw, ch, xs, y_pres_top[idx])
-                self._draw_tooltip(idx, x, y, cw, ch, xs, y_abs_top[idx])
-
-    def _stroke_path(self, xs, ys, color, width=2):
-        if not xs or not ys or len(xs) != len(ys):
+        # lớp tĩnh nằm dưới cùng (dữ liệu / hover đè lên)
+        self.tag_lower("static")
+        self._last_hover_idx = None   # toạ độ đổi => vẽ lại tooltip
+
+    def _update_data(self):
+        g = self._geom
+        if g is None or not self.days:
+            self.itemconfigure("data", state="hidden")
+            self._update_hover(force=True)
+            return
+        x, y, cw, ch, xs = g
+        n = len(xs)
+        if self._pct.shape[1] != n:
             return
-        for i in range(len(xs) - 1):
-            self.create_line(xs[i], ys[i], xs[i+1], ys[i+1], fill=color, width=width, smooth=True)
+
+        # apply animation factor (grow up)
+        k = _clamp(self.anim_progress, 0.0, 1.0)
+        base = y + ch
+
+        # stacked boundaries (✅ Present ở đáy): cumsum theo hàng
+        # present: 0 -> p
+        # late:    p -> p+L
+        # absent:  p+L -> p+L+a  (should end at 100*k)
+        y_pres_top, y_late_top, y_abs_top = base - np.cumsum(self._pct, axis=0) * (ch / 100.0 * k)
+
+        def _pts(ys):
+            # [(x0,y0),(x1,y1)...] -> [x0,y0,x1,y1,...]
+            return np.column_stack((xs, ys)).ravel()
+
+        pres, late, top = _pts(y_pres_top), _pts(y_late_top), _pts(y_abs_top)
+
+        def _rev(flat):
+            return flat.reshape(-1, 2)[::-1].ravel()
+
+        # --- Filled stacked areas (polygons) ---
+        self.coords(self._poly_pres, np.concatenate(([xs[0], base], pres, [xs[-1], base])).tolist())
+        self.coords(self._poly_late, np.concatenate((pres, _rev(late))).tolist())
+        self.coords(self._poly_abs, np.concatenate((late, _rev(top))).tolist())
+
+        # Borders (đúng thứ tự đáy -> đỉnh); 1 điểm thì nhân đôi để line hợp lệ
+        for item, flat in ((self._line_pres, pres), (self._line_late, late), (self._line_abs, top)):
+            self.coords(item, (flat if n > 1 else np.tile(flat, 2)).tolist())
+
+        self.itemconfigure("data", state="normal")
+        self.tag_raise("data", "static")
+        self._update_hover(force=True)
 
     @staticmethod
     def _alpha(hex_color, a=1.0):
@@ -358,7 +489,7 @@ class AreaChartPanel(tk.Canvas):
 
 
 # ─────────────────────────── Statistic Tab (UI + data wiring)
-class StatisticOverview(tb.Frame):
+class StatisticOverview(tb.Frame, AsyncDBMixin):
     AUTO_REFRESH_MS = 1000       # KPI refresh tick
     CHART_REFRESH_MS = 1000      # Chart auto refresh tick (only for current month)
 
@@ -430,6 +561,11 @@ class StatisticOverview(tb.Frame):
         self.ent_month = tb.Entry(row2, width=4)
         self.ent_month.insert(0, str(date.today().month)); self.ent_month.pack(side=LEFT)
 
+        tb.Label(row2, text="Range:").pack(side=LEFT, padx=(12,6))
+        self.cbo_range = tb.Combobox(row2, values=RANGE_MODES, state="readonly", width=15)
+        self.cbo_range.set(RANGE_MODES[0]); self.cbo_range.pack(side=LEFT)
+        self.cbo_range.bind("<<ComboboxSelected>>", lambda e: self._refresh_from_db())
+
         tb.Button(row2, text="Refresh (DB)", bootstyle=PRIMARY, command=self._refresh_from_db)\
           .pack(side=LEFT, padx=10)
 
@@ -475,36 +611,34 @@ class StatisticOverview(tb.Frame):
         today = date.today()
         return (y, m) == (today.year, today.month)
 
+    def _range_mode(self):
+        mode = self.cbo_range.get()
+        return mode if mode in RANGE_MODES else RANGE_MODES[0]
+
+    def _max_points(self):
+        m = self.chart.margins
+        w = self.chart.winfo_width() - m["left"] - m["right"]
+        return _clamp(w // PX_PER_POINT, 30, 400)
+
     def refresh_kpis(self):
-        def _set(kpi_widget, value: int):
+        y, m = self._selected_year_month()
+        self._db_async("kpis", _load_kpis, y, m, on_done=self._apply_kpis)
+
+    def _apply_kpis(self, vals: dict):
+        def _set(kpi_widget, value):
+            if value is None:
+                return
             # StatCard có set_value(), còn Label thì configure(text=...)
             if hasattr(kpi_widget, "set_value"):
-                kpi_widget.set_value(value)
+                kpi_widget.set_value(int(value or 0))
             else:
-                kpi_widget.configure(text=str(value))
+                kpi_widget.configure(text=str(int(value or 0)))
 
         # Employees = ACTIVE
-        try:
-            _set(self.kpi_emp, int(count_employees(active_only=True) or 0))
-        except Exception:
-            pass
-
-        try:
-            _set(self.kpi_faces, int(count_faces() or 0))
-        except Exception:
-            pass
-
-        try:
-            today = date.today()
-            _set(self.kpi_today, int(count_logs_on_date(today) or 0))
-        except Exception:
-            pass
-
-        try:
-            y, m = self._selected_year_month()
-            _set(self.kpi_mont, int(count_logs_in_month(y, m) or 0))
-        except Exception:
-            pass
+        _set(self.kpi_emp,   vals.get("emp"))
+        _set(self.kpi_faces, vals.get("faces"))
+        _set(self.kpi_today, vals.get("today"))
+        _set(self.kpi_mont,  vals.get("month"))
 
 
 
@@ -532,17 +666,17 @@ class StatisticOverview(tb.Frame):
             y, m = self._selected_year_month()
             if not y:
                 return
-            if self._is_current_ym(y, m):
-                try:
-                    first_day = date(y, m, 1)
-                    last_day  = date(y, m, calendar.monthrange(y, m)[1])
-                    rows = get_daily_stack_plus(first_day, last_day)
-                except Exception as e:
-                    messagebox.showerror("DB", f"Lỗi lấy dữ liệu chart: {e}")
-                    return
-                self._rows_cache = rows or []
-                # auto refresh: update data only (NO re-animate)
-                self._render_from_rows()
+            if self._range_mode() == "Month" and self._is_current_ym(y, m):
+                def _done(rows):
+                    self._rows_cache = rows or []
+                    # auto refresh: update data only (NO re-animate)
+                    self._render_from_rows()
+
+                self._db_async(
+                    "chart", _load_month_stack, y, m,
+                    on_done=_done,
+                    on_error=lambda e: messagebox.showerror("DB", f"Lỗi lấy dữ liệu chart: {e}"),
+                )
         finally:
             self._schedule_auto_chart()
 
@@ -556,14 +690,23 @@ class StatisticOverview(tb.Frame):
             messagebox.showwarning("Future Month", "Không thể xem dữ liệu tương lai. Hãy chọn tháng hiện tại hoặc quá khứ.")
             return
 
-        try:
-            first_day = date(y, m, 1)
-            last_day  = date(y, m, calendar.monthrange(y, m)[1])
-            rows = get_daily_stack_plus(first_day, last_day)
-        except Exception as e:
-            messagebox.showerror("DB", f"Lỗi lấy dữ liệu chart: {e}")
+        mode = self._range_mode()
+        if mode != "Month":
+            d1, d2, caption = _range_of(mode, y, m)
+            self._db_async(
+                "chart", get_stack_series, d1, d2, self._max_points(),
+                on_done=lambda res: self._render_series(res, caption),
+                on_error=lambda e: messagebox.showerror("DB", f"Lỗi lấy dữ liệu chart: {e}"),
+            )
             return
 
+        self._db_async(
+            "chart", _load_month_stack, y, m,
+            on_done=lambda rows: self._render_month(y, m, rows),
+            on_error=lambda e: messagebox.showerror("DB", f"Lỗi lấy dữ liệu chart: {e}"),
+        )
+
+    def _render_month(self, y, m, rows):
         # Render (manual refresh can animate on month change)
         days, present, late, absent, totals = [], [], [], [], []
         today = date.today()
@@ -596,7 +739,7 @@ class StatisticOverview(tb.Frame):
 
         title = f"Present / Late / Absent per day ({y}-{m:02d})  [{SHIFT_START}–{SHIFT_END}]"
         # animate=True default; set_series() sẽ tự không animate lại nếu X không đổi
-        self.chart.set_series(days, present, late, absent, totals, title=title)
+        self.chart.set_series(days, present, late, absent, totals, title=title, x_title="Day")
 
     def _render_from_rows(self):
         days, present, late, absent, totals = [], [], [], [], []
@@ -629,7 +772,28 @@ class StatisticOverview(tb.Frame):
         y, m = self._selected_year_month()
         title = f"Present / Late / Absent per day ({y}-{m:02d})  [{SHIFT_START}–{SHIFT_END}]"
         # IMPORTANT: auto refresh => NO animation restart
-        self.chart.set_series(days, present, late, absent, totals, title=title, animate=False)
+        self.chart.set_series(days, present, late, absent, totals, title=title, animate=False, x_title="Day")
+
+    def _render_series(self, res, caption):
+        """Range dài: bucket ngày / tuần / tháng từ get_stack_series()."""
+        resolution = res.get("resolution", "day")
+        labels, present, late, absent, totals = [], [], [], [], []
+        for b in res.get("buckets") or []:
+            p = int(b.get("present") or 0)
+            L = int(b.get("late") or 0)
+            a = int(b.get("absent") or 0)
+            on_time = max(p - L, 0)
+
+            labels.append(b["start"].strftime("%m-%d") if resolution == "day" else b["label"])
+            present.append(on_time)
+            late.append(L)
+            absent.append(a)
+            totals.append(on_time + L + a)
+
+        per = resolution
+        note = ", downsampled" if res.get("downsampled") else ""
+        title = f"Present / Late / Absent per {per} ({caption}{note})  [{SHIFT_START}–{SHIFT_END}]"
+        self.chart.set_series(labels, present, late, absent, totals, title=title, x_title=per.capitalize())
 
     # Misc ops
     def _test_db(self):
@@ -652,6 +816,7 @@ class StatisticOverview(tb.Frame):
             db_execute("DELETE FROM employees")
             db_execute("ALTER TABLE employees AUTO_INCREMENT = 1")
             db_execute("SET FOREIGN_KEY_CHECKS=1")
+            invalidate_cache()
             messagebox.showinfo("Done", "Data cleared.")
             # refresh UI
             self.refresh_kpis()
@@ -661,9 +826,12 @@ class StatisticOverview(tb.Frame):
                 db_execute("SET FOREIGN_KEY_CHECKS=1")
             except Exception:
                 pass
+            invalidate_cache()
             messagebox.showerror("Error", str(e))
 
     def _on_destroy(self, event=None):
+        self._db_cancel("kpis")
+        self._db_cancel("chart")
         try:
             if self._auto_id:
                 self.after_cancel(self._auto_id)
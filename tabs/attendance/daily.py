@@ -1,13 +1,14 @@
 # tabs/attendance/daily.py
 from __future__ import annotations
-import csv
 from datetime import date, datetime, timedelta, time as dtime
 import ttkbootstrap as tb
 from ttkbootstrap.constants import *
 from tkinter import filedialog, messagebox
 from db.attendance_dal import get_daily_stack_plus  # có cột 'late'
+from db.csv_export import export_csv
+from tabs.base import AsyncDBMixin, ExportMixin
 
-class AttendanceDaily(tb.Frame):
+class AttendanceDaily(tb.Frame, AsyncDBMixin, ExportMixin):
     """
     Daily summary realtime: total_active | present | late | absent trong khoảng ngày.
     - Auto refresh mỗi 1s.
@@ -154,12 +155,16 @@ class AttendanceDaily(tb.Frame):
         if d2 < d1:
             d1, d2 = d2, d1
 
-        try:
-            rows = get_daily_stack_plus(d1, d2)
-            self._rows_cache = rows
-        except Exception as e:
-            self._debug_exc("DAILY:get_daily_stack_plus", e)
-            return
+        # chạy query trên DB executor, kết quả quay về Tk qua after()
+        self._db_async(
+            "query", get_daily_stack_plus, d1, d2,
+            on_done=self._apply_rows,
+            on_error=lambda e: self._debug_exc("DAILY:get_daily_stack_plus", e),
+        )
+
+    def _apply_rows(self, rows):
+        rows = rows or []
+        self._rows_cache = rows
 
         for i in self.tree.get_children():
             self.tree.delete(i)
@@ -189,21 +194,9 @@ class AttendanceDaily(tb.Frame):
             filetypes=[("CSV files","*.csv")]
         )
         if not path: return
-        try:
-            with open(path, "w", newline="", encoding="utf-8") as f:
-                w = csv.writer(f)
-                w.writerow(["day", "total_active", "present", "late", "absent"])
-                for r in self._rows_cache:
-                    w.writerow([
-                        r.get("day"),
-                        r.get("total_active", 0),
-                        r.get("present", 0),
-                        r.get("late", 0),
-                        r.get("absent", 0),
-                    ])
-            messagebox.showinfo("Export", f"Đã xuất: {path}")
-        except Exception as e:
-            messagebox.showerror("Export", str(e))
+        cols = ["day", "total_active", "present", "late", "absent"]
+        rows = list(self._rows_cache)  # snapshot: auto-refresh sẽ thay _rows_cache
+        self._run_export(path, lambda progress: export_csv(path, cols, rows, progress=progress, total=len(rows)))
 
     def _schedule_auto(self):
         if not self._auto_running or not self.winfo_exists():
@@ -249,6 +242,7 @@ class AttendanceDaily(tb.Frame):
     def _on_destroy(self, *_):
         # stop auto + cancel after
         self._auto_running = False
+        self._db_cancel("query")
         if self._auto_id:
             try:
                 self.after_cancel(self._auto_id)
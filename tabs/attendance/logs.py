@@ -332,41 +332,173 @@
 
 # tabs/attendance/logs.py
 from __future__ import annotations
-import csv
+import os
+import json
+import threading
+from collections import OrderedDict, deque
 from datetime import date, datetime, timedelta, time as dtime
 import ttkbootstrap as tb
 from ttkbootstrap.constants import *
 from tkinter import filedialog, messagebox
 from db.attendance_dal import list_logs_by_date_with_flag
+from db.csv_export import export_csv
+from tabs.base import AsyncDBMixin, ExportMixin
+
+# ===== Overlay cho logs ngoài giờ (không lưu MySQL) =====
+# Theo ngày: day -> deque (thứ tự thời gian) => lấy log của 1 ngày O(1),
+# purge chỉ pop phần đã hết hạn ở đầu deque cũ nhất.
+# Ghi kèm file JSONL (append) để mở lại app vẫn còn; tắt: NOTIN_PERSIST=0
+_NOTIN_TTL_SEC = int(os.getenv("NOTIN_TTL_SEC", "600"))  # 10 phút
+_NOTIN_MAX_PER_DAY = 2000
+_NOTIN_PATH = os.getenv(
+    "NOTIN_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                 "data", "cache", "not_in_shift.jsonl"),
+)
+
+
+class NotInShiftStore:
+    COMPACT_EVERY = 500   # số dòng append thêm trước khi ghi lại file (bỏ dòng hết hạn)
+
+    def __init__(self, ttl_sec: int = _NOTIN_TTL_SEC, path: str | None = None,
+                 max_per_day: int = _NOTIN_MAX_PER_DAY):
+        self.ttl = timedelta(seconds=ttl_sec)
+        self.path = path
+        self.max_per_day = max_per_day
+        self._lock = threading.Lock()
+        self._days: "OrderedDict[date, deque]" = OrderedDict()   # ngày cũ -> mới
+        self._appended = 0
+        self._load()
+
+    # ---------- public ----------
+    def push(self, employee_id: int, full_name: str, ts: datetime | None = None):
+        ts = (ts or datetime.now()).replace(microsecond=0)
+        row = {
+            "log_id": "RAM",
+            "employee_id": employee_id,
+            "full_name": full_name,
+            "detected_at": ts,
+            "in_shift": 0,
+        }
+        with self._lock:
+            self._add(row)
+            self._purge_locked()
+            self._append_file(row)
+
+    def for_day(self, d: date) -> list:
+        with self._lock:
+            self._purge_locked()
+            dq = self._days.get(d)
+            return list(dq) if dq else []
+
+    def purge(self):
+        with self._lock:
+            self._purge_locked()
+
+    # ---------- internals ----------
+    def _add(self, row: dict):
+        d = row["detected_at"].date()
+        dq = self._days.get(d)
+        if dq is None:
+            newest = next(reversed(self._days), None)
+            dq = self._days[d] = deque(maxlen=self.max_per_day)
+            if newest is not None and d < newest:
+                # đồng hồ máy bị chỉnh lùi: giữ thứ tự ngày
+                self._days = OrderedDict(sorted(self._days.items()))
+        ts = row["detected_at"]
+        if not dq or dq[-1]["detected_at"] <= ts:
+            dq.append(row)
+            return
+        # push(ts=...) lệch thứ tự: chèn đúng chỗ để purge (pop đầu deque) vẫn đúng
+        if len(dq) == dq.maxlen:
+            dq.popleft()
+        i = len(dq)
+        while i > 0 and dq[i - 1]["detected_at"] > ts:
+            i -= 1
+        dq.insert(i, row)
+
+    def _purge_locked(self):
+        cutoff = datetime.now() - self.ttl
+        while self._days:
+            d, dq = next(iter(self._days.items()))
+            while dq and dq[0]["detected_at"] < cutoff:
+                dq.popleft()
+            if dq:
+                break
+            del self._days[d]
+
+    def _load(self):
+        if not self.path or not os.path.isfile(self.path):
+            return
+        cutoff = datetime.now() - self.ttl
+        rows = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        r = json.loads(line)
+                        r["detected_at"] = datetime.fromisoformat(r["detected_at"])
+                    except Exception:
+                        continue
+                    if r["detected_at"] >= cutoff:
+                        rows.append(r)
+        except Exception as e:
+            print(f"[NOTIN] load error: {e}")
+            return
+        rows.sort(key=lambda r: r["detected_at"])
+        for r in rows:
+            self._add(r)
+        self._rewrite()
+
+    @staticmethod
+    def _dump(row: dict) -> str:
+        return json.dumps({**row, "detected_at": row["detected_at"].isoformat()}, ensure_ascii=False) + "\n"
+
+    def _append_file(self, row: dict):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(self._dump(row))
+            self._appended += 1
+            if self._appended >= self.COMPACT_EVERY:
+                self._rewrite()
+        except Exception as e:
+            print(f"[NOTIN] write error: {e}")
+
+    def _rewrite(self):
+        if not self.path:
+            return
+        tmp = self.path + ".part"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                for dq in self._days.values():
+                    f.writelines(self._dump(r) for r in dq)
+            os.replace(tmp, self.path)
+            self._appended = 0
+        except Exception as e:
+            print(f"[NOTIN] compact error: {e}")
+
+
+_NOTIN: NotInShiftStore | None = None
+_NOTIN_LOCK = threading.Lock()
+
+
+def _notin_store() -> NotInShiftStore:
+    """Tạo lúc dùng lần đầu (không đọc/ghi file JSONL khi chỉ import module)."""
+    global _NOTIN
+    with _NOTIN_LOCK:
+        if _NOTIN is None:
+            _NOTIN = NotInShiftStore(path=_NOTIN_PATH if os.getenv("NOTIN_PERSIST", "1") != "0" else None)
+        return _NOTIN
 
-# ===== RAM overlay cho logs ngoài giờ (không lưu DB) =====
-_NOTIN_TTL_SEC = 600  # 10 phút
-_NOTIN: list[dict] = []
 
 def push_not_in_shift(employee_id: int, full_name: str, ts: datetime|None=None):
-    ts = ts or datetime.now()
-    _NOTIN.append({
-        "log_id": "RAM",
-        "employee_id": employee_id,
-        "full_name": full_name,
-        "detected_at": ts,
-        "in_shift": 0
-    })
-    _purge_expired()
-
-def _purge_expired():
-    cutoff = datetime.now() - timedelta(seconds=_NOTIN_TTL_SEC)
-    keep = []
-    for r in _NOTIN:
-        t = r.get("detected_at")
-        if isinstance(t, str):
-            try: t = datetime.fromisoformat(t)
-            except Exception: t = None
-        if t and t >= cutoff:
-            keep.append(r)
-    _NOTIN[:] = keep
-
-class AttendanceLogs(tb.Frame):
+    _notin_store().push(employee_id, full_name, ts)
+
+class AttendanceLogs(tb.Frame, AsyncDBMixin, ExportMixin):
     """Hiển thị chi tiết log trong 1 ngày, có cờ in_shift (07:00–17:00)."""
     AUTO_REFRESH_MS = 1000
     SHIFT_START = dtime(7, 0, 0)
@@ -473,27 +605,20 @@ class AttendanceLogs(tb.Frame):
         self._clamp_future()
         d = self.dp_day.get_date()
         if isinstance(d, datetime): d = d.date()
-        try:
-            self._cache_db = list_logs_by_date_with_flag(d)
-        except Exception:
-            self._cache_db = []
-        _purge_expired()
+        self._db_async(
+            "query", list_logs_by_date_with_flag, d,
+            on_done=self._apply_rows,
+            on_error=lambda e: self._apply_rows([]),
+        )
+
+    def _apply_rows(self, rows):
+        self._cache_db = rows or []
         self._fill_tree()
 
     def _merge_rows(self):
         d = self.dp_day.get_date()
         if isinstance(d, datetime): d = d.date()
-        ram = []
-        for r in _NOTIN:
-            t = r.get("detected_at")
-            tt = None
-            if isinstance(t, datetime): tt = t
-            else:
-                try: tt = datetime.fromisoformat(str(t))
-                except Exception: tt = None
-            if tt and tt.date() == d:
-                ram.append(r)
-        return list(self._cache_db) + ram
+        return list(self._cache_db) + _notin_store().for_day(d)
 
     def _fill_tree(self):
         rows = self._merge_rows()
@@ -537,21 +662,17 @@ class AttendanceLogs(tb.Frame):
                                             defaultextension=".csv",
                                             filetypes=[("CSV files","*.csv")])
         if not path: return
-        try:
-            only_in = self._only_in_shift.get()
-            out = [r for r in rows if (not only_in or int(r.get("in_shift", 0)) == 1)]
-            with open(path, "w", newline="", encoding="utf-8") as f:
-                w = csv.writer(f)
-                w.writerow(["log_id","employee_id","full_name","detected_at","in_shift"])
-                for r in out:
-                    tshow = r.get("detected_at")
-                    if isinstance(tshow, datetime): tshow = tshow.replace(microsecond=0)
-                    w.writerow([r.get("log_id"), r.get("employee_id"),
-                                r.get("full_name"), tshow,
-                                1 if int(r.get("in_shift", 0))==1 else 0])
-            messagebox.showinfo("Export", f"Đã xuất: {path}")
-        except Exception as e:
-            messagebox.showerror("Export", str(e))
+        only_in = self._only_in_shift.get()
+        cols = ["log_id", "employee_id", "full_name", "detected_at", "in_shift"]
+
+        def _rows():
+            for r in rows:
+                flag = 1 if int(r.get("in_shift", 0)) == 1 else 0
+                if only_in and not flag:
+                    continue
+                yield {**r, "in_shift": flag}
+
+        self._run_export(path, lambda progress: export_csv(path, cols, _rows(), progress=progress))
 
     def _schedule_auto(self):
         if not self._auto_running or not self.winfo_exists():
@@ -574,6 +695,7 @@ class AttendanceLogs(tb.Frame):
 
     def _on_destroy(self, *_):
         self._auto_running = False
+        self._db_cancel("query")
         if self._auto_id:
             try:
                 self.after_cancel(self._auto_id)
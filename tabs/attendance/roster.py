@@ -1,15 +1,16 @@
 # tabs/attendance/roster.py
 from __future__ import annotations
-import csv
 from datetime import date, datetime, time as dtime
 import ttkbootstrap as tb
 from ttkbootstrap.constants import *
 from tkinter import filedialog, messagebox
 
-from db.attendance_dal import count_day, get_day_rosters_inout
+from db.attendance_dal import get_day_roster
+from db.csv_export import export_csv
+from tabs.base import AsyncDBMixin, ExportMixin
 
 
-class AttendanceRoster(tb.Frame):
+class AttendanceRoster(tb.Frame, AsyncDBMixin, ExportMixin):
     """
     By Day (Roster) realtime: Present / Absent / Late (>08:00)
     - Auto refresh mỗi 1s theo ngày đang chọn.
@@ -154,19 +155,19 @@ class AttendanceRoster(tb.Frame):
         if not self.winfo_exists():
             return
         self._clamp_future()
-        try:
-            d = self.dp_day.get_date()
-            if isinstance(d, datetime): d = d.date()
+        d = self.dp_day.get_date()
+        if isinstance(d, datetime): d = d.date()
 
-            packs = get_day_rosters_inout(d)
-            self._present = packs.get("present", [])
-            self._absent  = packs.get("absent",  [])
-            self._late    = packs.get("late",    [])
+        self._db_async(
+            "query", get_day_roster, d,
+            on_done=lambda res: self._apply_roster(d, res, res["counts"]),
+            on_error=lambda e: self._debug_exc("ROSTER:dal_query", e),
+        )
 
-            summary = count_day(d)
-        except Exception as e:
-            self._debug_exc("ROSTER:dal_query", e)
-            return
+    def _apply_roster(self, d: date, packs: dict, summary: dict):
+        self._present = packs.get("present", [])
+        self._absent  = packs.get("absent",  [])
+        self._late    = packs.get("late",    [])
 
         self._fill_tree(self.tree_present, self._present)
         self._fill_tree(self.tree_absent,  self._absent)
@@ -208,16 +209,9 @@ class AttendanceRoster(tb.Frame):
         )
         if not path:
             return
-        try:
-            with open(path, "w", newline="", encoding="utf-8") as f:
-                w = csv.writer(f)
-                cols = list(rows[0].keys())
-                w.writerow(cols)
-                for r in rows:
-                    w.writerow([r.get(c, "") for c in cols])
-            messagebox.showinfo("Export", f"Đã xuất: {path}")
-        except Exception as e:
-            messagebox.showerror("Export", str(e))
+        cols = list(rows[0].keys())
+        rows = list(rows)
+        self._run_export(path, lambda progress: export_csv(path, cols, rows, progress=progress, total=len(rows)))
 
     def _schedule_auto(self):
         if not self._auto_running or not self.winfo_exists():
@@ -240,6 +234,7 @@ class AttendanceRoster(tb.Frame):
 
     def _on_destroy(self, *_):
         self._auto_running = False
+        self._db_cancel("query")
         if self._auto_id:
             try:
                 self.after_cancel(self._auto_id)
@@ -1,4 +1,7 @@
+import threading
 import ttkbootstrap as tb
+from tkinter import messagebox
+from db.db_executor import get_executor
 
 class PlaceholderMixin:
     def _attach_placeholder(self, entry, text: str, color="#6F7D85"):
@@ -31,3 +34,77 @@ class PlaceholderMixin:
         entry.bind("<FocusIn>",  lambda e: _hide(), add="+")
         entry.bind("<FocusOut>", lambda e: _show(), add="+")
         entry.bind("<KeyPress>", lambda e: _hide() if getattr(entry, "_ph_is_on", False) else None, add="+")
+
+
+class AsyncDBMixin:
+    """
+    Gọi DAL qua DB executor (thread pool) thay vì chạy thẳng trong Tk callback.
+    channel được gắn theo widget path => mỗi tab có "kênh" riêng, request mới
+    trên cùng kênh sẽ thay thế request cũ (vd: đổi ngày liên tục).
+    """
+    def _db_async(self, channel: str, fn, *args, on_done=None, on_error=None, **kwargs) -> bool:
+        return get_executor().submit(
+            fn, *args,
+            widget=self,
+            channel=f"{self}:{channel}",
+            on_done=on_done,
+            on_error=on_error,
+            **kwargs,
+        )
+
+    def _db_cancel(self, channel: str):
+        get_executor().cancel(f"{self}:{channel}")
+
+
+class ExportMixin:
+    """
+    Chạy 1 export CSV (db.csv_export) trên thread riêng, Tk chỉ poll tiến độ.
+    job(progress) -> số dòng; progress(done, total) được gọi từ worker thread.
+    """
+    _EXPORT_POLL_MS = 120
+
+    def _run_export(self, path: str, job, title: str = "Export"):
+        if getattr(self, "_export_thread", None) and self._export_thread.is_alive():
+            messagebox.showinfo(title, "Đang export, vui lòng đợi...")
+            return
+
+        state = {"done": 0, "total": None, "count": None, "error": None}
+
+        def _progress(done, total=None):
+            state["done"], state["total"] = done, total
+
+        def _worker():
+            try:
+                state["count"] = job(_progress)
+            except Exception as e:
+                state["error"] = e
+
+        self._export_state = state
+        self._export_title = title
+        self._export_path = path
+        self._export_thread = threading.Thread(target=_worker, name="csv-export", daemon=True)
+        self._export_thread.start()
+        self.after(self._EXPORT_POLL_MS, self._poll_export)
+
+    def _export_status(self, text: str):
+        """Tab nào có status label thì override để hiện tiến độ."""
+        pass
+
+    def _poll_export(self):
+        try:
+            if not self.winfo_exists():
+                return
+        except Exception:
+            return
+        st = self._export_state
+        if self._export_thread.is_alive():
+            tot = st["total"]
+            self._export_status(f"Exporting… {st['done']}" + (f"/{tot}" if tot else ""))
+            self.after(self._EXPORT_POLL_MS, self._poll_export)
+            return
+
+        self._export_status("")
+        if st["error"] is not None:
+            messagebox.showerror(self._export_title, f"Lỗi ghi file:\n{st['error']}")
+        else:
+            messagebox.showinfo(self._export_title, f"Đã xuất {st['count']} dòng: {self._export_path}")
@@ -10,27 +10,33 @@ from PIL import Image, ImageTk
 import cv2
 import threading
 from datetime import datetime, time as dtime
-from queue import Queue
 
 
 # ---- DB layer ----
 from db.db_conn import execute as db_execute, fetch_one, fetch_all
+from db.bulk_import import read_employee_csv, bulk_import_employees
+from db.csv_export import export_employees
+from db.log_queue import enqueue_attendance_log, get_log_queue
 from db.attendance_dal import (
-    add_employee, list_employees, deactivate_employee, delete_face_row,
-    get_face, upsert_face, search_employees, insert_attendance_log
+    add_employee, deactivate_employee, delete_face_row,
+    get_face, upsert_face, invalidate_cache
 )
 
 # ---- Hardware Layer ----
 from hardware.uart_daemon import UARTDaemon
 
 # ---- UI pieces ----
-from ..base import PlaceholderMixin
+from ..base import PlaceholderMixin, AsyncDBMixin, ExportMixin
 from .ui.widgets import StatCard
 from .ui.dialogs import CreateEmployeeDialog, ChangeFaceDialog
 
 # ---- Services ----
 from .services.camera_daemon import CameraDaemon
+from .services.preview_renderer import PreviewRenderer
 from .services.recog_daemon import RecognitionDaemon
+from .services.stations import StationManager, parse_stations
+from .services.face_ingest import FaceIngestPool, ingest_face_file
+from .services.employee_directory import get_directory
 
 # ---- DND optional ----
 try:
@@ -40,18 +46,17 @@ except Exception:
     DND_ENABLED = False
 
 # --- Bóc tách Unicode ---
-import unicodedata
-
-def _ascii_no_diacritics(s: str) -> str:
-    if not s:
-        return s
-    s_norm = unicodedata.normalize("NFKD", s)
-    s_ascii = "".join(ch for ch in s_norm if not unicodedata.combining(ch))
-    s_ascii = s_ascii.replace("đ", "d").replace("Đ", "D")
-    return " ".join(s_ascii.split())
+from .services.text_utils import ascii_no_diacritics as _ascii_no_diacritics
 
 APP_BASE  = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 FACES_DIR = os.path.join(APP_BASE, "data", "faces")
+# Thu nhỏ ảnh khi import/kéo-thả (cạnh dài, px). 0 = giữ nguyên file gốc.
+FACE_INGEST_MAX_SIDE = int(os.getenv("FACE_INGEST_MAX_SIDE", "0") or 0)
+
+# Nhận diện ngay khi NG (song song với chờ CK); 0 = đợi CK rồi mới scan
+UART_SPECULATIVE = os.getenv("UART_SPECULATIVE", "1") != "0"
+# Nhiều làn: "COM3@0,COM4@1" (port@camera). Làn đầu = tab này, các làn sau chạy nền
+KIOSK_STATIONS = parse_stations()
 os.makedirs(FACES_DIR, exist_ok=True)
 
 try:
@@ -65,7 +70,40 @@ _SHIFT_END = dtime(17,0,0)
 
 _ROW_HEIGHT = 26
 
-class PeopleTab(tb.Frame, PlaceholderMixin):
+def _load_employee_rows(mode: str, q: str = "") -> dict:
+    """
+    Danh sách nhân viên theo filter/search + cờ face + số đếm cho StatCard.
+    Lấy từ EmployeeDirectory (RAM); chỉ query DB khi directory cần nạp lại
+    => gọi qua DB worker nếu directory chưa tươi (xem PeopleTab._query_employees).
+    """
+    return get_directory().query(mode, q)
+
+
+def _load_face_thumb(eid: int, W: int = 110, H: int = 110) -> dict:
+    """Chạy trên DB worker: get_face + decode/thumbnail; Tk chỉ tạo PhotoImage."""
+    row = get_face(eid)
+    if not row or not row.get("image_path"):
+        return {"state": "none"}
+
+    p = os.path.join(APP_BASE, row["image_path"])
+    if not os.path.exists(p):
+        return {"state": "missing", "path": row["image_path"]}
+
+    with Image.open(p) as im:
+        src_w, src_h = im.size
+        im = im.convert("RGB")
+        im.thumbnail((W, H), Image.LANCZOS)
+
+        bg = Image.new("RGB", (W, H), (20, 20, 20))
+        x = (W - im.size[0]) // 2
+        y = (H - im.size[1]) // 2
+        bg.paste(im, (x, y))
+
+    size_kb = os.path.getsize(p) / 1024.0
+    return {"state": "ok", "image": bg, "info": f"{src_w}×{src_h} px  •  {size_kb:.1f} KB"}
+
+
+class PeopleTab(tb.Frame, PlaceholderMixin, AsyncDBMixin, ExportMixin):
     def __init__(self, parent, camera_index: int = 0):
         super().__init__(parent)
         self._started_once = False
@@ -95,7 +133,6 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
 
         # camera/recog state
         self._last_frame_bgr = None
-        self._last_frame_rgb_rs = None
         self._cam_status_var = tb.StringVar(value="Camera: starting…")
         self._viz: Optional[Dict[str, Any]] = None
 
@@ -107,7 +144,8 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
         # canvas image cache (double-buffer)
         self._cam_img_item = None
         self._cam_tk: Optional[ImageTk.PhotoImage] = None
-        self._last_draw_ts = 0.0
+        # resize / BGR->RGB / overlay chạy ở PreviewRenderer (start cùng camera)
+        self._renderer: Optional[PreviewRenderer] = None
         # --- UI draw tick
         self._ui_target_fps = 15.0
         self._ui_draw_period_ms = max(10, int(1000.0 / float(self._ui_target_fps)))
@@ -125,10 +163,7 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
         self._viz_pending = None
 
         self._frame_seq = 0 #tăng mỗi khi nhận frame mới
-        self._draw_seq = 0 #seq gần nhất đã vẽ
-
-        #Tạo queue cho 1 frame duy nhất
-        self._frame_queue = Queue(maxsize=1)
+        self._draw_seq = 0 #seq (của renderer) gần nhất đã vẽ
 
         #camera Health Timer
         self._last_frame_ts = 0.0
@@ -149,8 +184,8 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
         # cleanup khi app đóng
         self.bind("<Destroy>", self._on_destroy, add="+")
 
-        #camera_index
-        self._camera_index = camera_index
+        #camera_index (KIOSK_STATIONS có cấu hình thì làn đầu lấy camera từ đó)
+        self._camera_index = KIOSK_STATIONS[0][1] if KIOSK_STATIONS else camera_index
 
     def _start_services_once(self, camera_index: int | None = None):
         if getattr(self, "_services_started", False):
@@ -161,6 +196,20 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
         if camera_index is None:
             camera_index = getattr(self, "_camera_index", 0)
 
+        # hàng đợi log + flusher: ghi nốt các log còn tồn từ lần chạy trước
+        try:
+            get_log_queue()
+        except Exception as e:
+            print(f"[LOG_QUEUE] init failed: {e!r}")
+
+        # render worker cho preview (Tk thread chỉ paste)
+        self._renderer = PreviewRenderer(
+            viz_supplier=lambda: (self._viz, getattr(self, "_viz_ts", 0.0)),
+            target_fps=self._ui_target_fps,
+        )
+        self._renderer.set_target_size(*getattr(self, "_canvas_wh", (0, 0)))
+        self._renderer.start()
+
         # start camera daemon
         self._cam_daemon = CameraDaemon(
             camera_index,
@@ -177,7 +226,8 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
             on_status=self._on_recog_status_guarded,
             on_hit=lambda eid, sid, name: self._on_recognized(eid, sid, name),
             on_visual=self._set_viz,
-            period_sec=1.0, threshold=0.40, conf_min=0.90, min_size_px=80
+            period_sec=1.0, threshold=0.40, conf_min=0.90, min_size_px=80,
+            station="lane0",
         )
         self._recog_daemon.start()
 
@@ -185,10 +235,22 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
         self._uart = UARTDaemon(
             on_person_detected=self._on_sensor_trigger,
             on_ready=self._on_hw_ready,
-            debug=True
+            debug=True,
+            port=KIOSK_STATIONS[0][0] if KIOSK_STATIONS else None,
+            speculative=UART_SPECULATIVE,
         )
         self._uart.start()
 
+        # các làn phụ (KIOSK_STATIONS): dùng chung engine + thư viện khuôn mặt
+        if len(KIOSK_STATIONS) > 1 and getattr(self, "_stations", None) is None:
+            self._stations = StationManager(
+                KIOSK_STATIONS[1:],
+                lib_supplier=self._build_face_library,
+                speculative=UART_SPECULATIVE,
+                on_event=lambda st, text: print(f"[{st.upper()}] {text}"),
+            )
+            self._stations.start()
+
         # ✅ Poll UART connection (đúng nghĩa “cắm ATmega / mở COM được”)
         if not hasattr(self, "_uart_poll_job") or self._uart_poll_job is None:
             self._uart_poll_job = self.after(800, self._poll_uart_connection)
@@ -568,8 +630,8 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
         # clear frame để tránh hiển thị frame cũ
         try:
             self._last_frame_bgr = None
-            while not self._frame_queue.empty():
-                self._frame_queue.get_nowait()
+            if self._renderer is not None:
+                self._renderer.clear()
         except Exception:
             pass
 
@@ -670,25 +732,19 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
             except Exception:
                 pass
 
-            # ===== LOG DB (background) =====
-            now_t = datetime.now().time()
-            in_shift = (_SHIFT_START <= now_t <= _SHIFT_END)
-
-            def _bg_log():
-                try:
-                    if in_shift:
-                        insert_attendance_log(eid)  # ✅ ghi DB để Logs tab fetch được
-                    else:
-                        if callable(push_not_in_shift):
-                            push_not_in_shift(eid, f"{sid} — {name}")
-                except Exception as e:
-                    print(f"[DB_LOG_ERROR] eid={eid} sid={sid} name={name} err={e!r}")
-                    try:
-                        self.after(0, lambda: self._update_recog_status(f"⚠ DB log failed: {e}", "warn"))
-                    except Exception:
-                        pass
-
-            threading.Thread(target=_bg_log, daemon=True).start()
+            # ===== LOG DB (write-ahead queue) =====
+            # ghi vào hàng đợi cục bộ (đồng bộ, không chờ MySQL); LogFlusher đẩy lên DB sau
+            now = datetime.now()
+            in_shift = (_SHIFT_START <= now.time() <= _SHIFT_END)
+            try:
+                if in_shift:
+                    enqueue_attendance_log(eid, now)  # ✅ Logs tab thấy sau khi flusher ghi xong
+                else:
+                    if callable(push_not_in_shift):
+                        push_not_in_shift(eid, f"{sid} — {name}")
+            except Exception as e:
+                print(f"[DB_LOG_ERROR] eid={eid} sid={sid} name={name} err={e!r}")
+                self._update_recog_status(f"⚠ DB log failed: {e}", "warn")
             # ===============================
 
             # gửi UART success
@@ -727,16 +783,10 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
         except Exception:
             pass
 
-        # UI vẫn dùng queue (maxsize=1) để vẽ khi tab đang mở
-        try:
-            if self._frame_queue.full():
-                try:
-                    self._frame_queue.get_nowait()
-                except Exception:
-                    pass
-            self._frame_queue.put_nowait(frame_bgr)
-        except Exception:
-            pass
+        # preview: chỉ render khi draw loop đang chạy (tab đang mở)
+        r = self._renderer
+        if r is not None and self._ui_draw_job is not None:
+            r.submit(frame_bgr)
 
     def _camera_health_watchdog(self):
         try:
@@ -808,6 +858,8 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
             h = max(1, int(event.height))
             if (w, h) != getattr(self, "_canvas_wh", (0, 0)):
                 self._canvas_wh = (w, h)
+                if getattr(self, "_renderer", None) is not None:
+                    self._renderer.set_target_size(w, h)
                 # nếu size đổi thì buộc tạo lại PhotoImage đúng size
                 self._cam_tk = None
                 self._cam_tk_size = None
@@ -835,140 +887,34 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
             pass
 
     def _draw_latest_frame(self):
+        """Tk thread: chỉ paste ảnh PreviewRenderer đã dựng sẵn (đúng size canvas, có overlay)."""
         if not self.winfo_exists():
             return
-
-        # snapshot rgb_resized + seq
-        rgb = None
-        seq = 0
-        try:
-            lock = getattr(self, "_frame_lock", None)
-            if lock is None:
-                rgb = getattr(self, "_last_frame_rgb_rs", None)
-                seq = getattr(self, "_frame_seq", 0)
-            else:
-                with lock:
-                    rgb = getattr(self, "_last_frame_rgb_rs", None)
-                    seq = getattr(self, "_frame_seq", 0)
-        except Exception:
-            return
-
-        if rgb is None:
-            return
-
-        # chỉ vẽ khi có frame mới
-        if seq == getattr(self, "_draw_seq", -1):
+        r = getattr(self, "_renderer", None)
+        if r is None:
             return
-
-        # throttle theo target fps (UI)
-        now = time.perf_counter()
-        last_ts = getattr(self, "_last_draw_ts", 0.0)
-        target = max(1, int(getattr(self, "_ui_target_fps", 15)))
-        if (now - last_ts) < (1.0 / float(target)):
+        out = r.take(getattr(self, "_draw_seq", -1))
+        if out is None:
             return
-
-        self._last_draw_ts = now
+        seq, pil = out
         self._draw_seq = seq
 
         try:
-            cw, ch = getattr(self, "_canvas_wh", (0, 0))
-            if cw <= 1 or ch <= 1:
-                return
-
-            # copy nhẹ (canvas-size) chỉ khi cần overlay
-            draw_rgb = rgb
-            viz = getattr(self, "_viz", None)
-            viz_ts = getattr(self, "_viz_ts", 0.0)
-
-            if viz is not None and (time.time() - viz_ts) <= 0.8:
-                # vẽ trên ảnh đã resize (ít pixel hơn nhiều)
-                draw_rgb = rgb.copy()
-
-                # scale bbox từ frame gốc 640x480 -> canvas (cw,ch)
-                # nếu camera daemon đổi size, lấy từ frame gốc hiện tại
-                src_w = 640
-                src_h = 480
+            size = pil.size
+            if getattr(self, "_cam_tk", None) is not None and getattr(self, "_cam_tk_size", None) == size:
                 try:
-                    # ưu tiên lấy từ frame gốc nếu có
-                    lock = getattr(self, "_frame_lock", None)
-                    if lock is None:
-                        fb = getattr(self, "_last_frame_bgr", None)
-                    else:
-                        with lock:
-                            fb = getattr(self, "_last_frame_bgr", None)
-                    if fb is not None:
-                        src_h, src_w = fb.shape[:2]
+                    self._cam_tk.paste(pil)
+                    return
                 except Exception:
                     pass
 
-                sx = cw / float(src_w)
-                sy = ch / float(src_h)
-
-                x = y = w = h = None
-                try:
-                    if "bbox" in viz:
-                        x, y, w, h = viz.get("bbox")
-                    elif "box" in viz:
-                        b = viz.get("box")
-                        if b and len(b) == 4:
-                            x1, y1, x2, y2 = b
-                            if x2 > x1 and y2 > y1:
-                                x, y, w, h = int(x1), int(y1), int(x2 - x1), int(y2 - y1)
-                            else:
-                                x, y, w, h = int(x1), int(y1), int(x2), int(y2)
-                except Exception:
-                    x = y = w = h = None
-
-                if x is not None and y is not None and w is not None and h is not None:
-                    try:
-                        # scale to canvas
-                        x = int(x * sx)
-                        y = int(y * sy)
-                        w = int(w * sx)
-                        h = int(h * sy)
-
-                        # màu viz đang BGR -> đổi sang RGB
-                        bgr = viz.get("color", (0, 255, 0))
-                        color = (int(bgr[2]), int(bgr[1]), int(bgr[0]))  # RGB
-
-                        # dùng cv2 trên RGB: cần chuyển sang BGR? (cv2 dùng BGR)
-                        # trick: vẽ bằng cv2 trên array RGB nhưng color là (R,G,B) -> sẽ bị hiểu như BGR.
-                        # => đổi lại thành BGR để cv2 vẽ đúng trên mảng RGB
-                        cv2_color = (color[2], color[1], color[0])
-
-                        cv2.rectangle(draw_rgb, (x, y), (x + w, y + h), cv2_color, 2)
-                        label = viz.get("label", "")
-                        if label:
-                            cv2.putText(draw_rgb, str(label), (x, max(0, y - 8)),
-                                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, cv2_color, 2)
-                    except Exception:
-                        pass
-
-            pil = Image.fromarray(draw_rgb)
-
-            need_new = (
-                getattr(self, "_cam_tk", None) is None or
-                getattr(self, "_cam_tk_size", None) != (cw, ch)
-            )
-
-            if need_new:
-                self._cam_tk = ImageTk.PhotoImage(pil)
-                self._cam_tk_size = (cw, ch)
-                if getattr(self, "_cam_img_item", None) is None:
-                    self._cam_img_item = self.cam_canvas.create_image(0, 0, image=self._cam_tk, anchor="nw")
-                else:
-                    self.cam_canvas.itemconfig(self._cam_img_item, image=self._cam_tk)
+            # lần đầu / canvas đổi size => tạo PhotoImage mới
+            self._cam_tk = ImageTk.PhotoImage(pil)
+            self._cam_tk_size = size
+            if getattr(self, "_cam_img_item", None) is None:
+                self._cam_img_item = self.cam_canvas.create_image(0, 0, image=self._cam_tk, anchor="nw")
             else:
-                try:
-                    self._cam_tk.paste(pil)
-                except Exception:
-                    self._cam_tk = ImageTk.PhotoImage(pil)
-                    self._cam_tk_size = (cw, ch)
-                    if getattr(self, "_cam_img_item", None) is None:
-                        self._cam_img_item = self.cam_canvas.create_image(0, 0, image=self._cam_tk, anchor="nw")
-                    else:
-                        self.cam_canvas.itemconfig(self._cam_img_item, image=self._cam_tk)
-
+                self.cam_canvas.itemconfig(self._cam_img_item, image=self._cam_tk)
         except Exception:
             return
 
@@ -1007,15 +953,18 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
         if val.startswith("all"):   return "all"
         return "active"
 
-    def _insert_row(self, r, index):
+    def _insert_row(self, r, index, face_ids: set | None = None):
         tags = ("even" if index % 2 == 0 else "odd",)
         if str(r.get("active", 1)) == "0":
             tags = tags + ("inactive",)
-        try:
-            fr = get_face(r["employee_id"])
-            face_flag = "✓" if (fr and fr.get("image_path")) else ""
-        except Exception:
-            face_flag = ""
+        if face_ids is not None:
+            face_flag = "✓" if int(r.get("employee_id") or 0) in face_ids else ""
+        else:
+            try:
+                fr = get_face(r["employee_id"])
+                face_flag = "✓" if (fr and fr.get("image_path")) else ""
+            except Exception:
+                face_flag = ""
         status_val = "1" if str(r.get("active", 1)) != "0" else "0"
 
         self.tree.insert(
@@ -1064,9 +1013,10 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
 
     def _update_status(self, total=None, shown=None, active_count=None):
         if total is None or active_count is None:
-            all_rows = list_employees(active_only=False)
-            total = len(all_rows)
-            active_count = len([r for r in all_rows if str(r.get("active", 1)) != "0"])
+            def _done(pack):
+                self._update_status(pack["total"], shown, pack["active"])
+            self._query_employees("status", "all", "", _done)
+            return
         if shown is None:
             kids = list(self.tree.get_children())
             shown = len(kids) - (1 if (self._empty_iid and self._empty_iid in kids) else 0)
@@ -1082,7 +1032,8 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
     def _on_search_key(self, _=None):
         if self._search_after_id:
             self.after_cancel(self._search_after_id)
-        self._search_after_id = self.after(300, self._search)
+        # search chạy trên directory trong RAM => debounce ngắn là đủ
+        self._search_after_id = self.after(120, self._search)
 
     def _snapshot_form(self):
         self._initial_form = {
@@ -1145,12 +1096,23 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
     # ---------- Data ops ----------
     def _refresh_employees(self, select_eid: int | None = None):
         mode = self._status_mode()
-        if mode == "active":
-            rows = list_employees(active_only=True)
-        elif mode == "inactive":
-            rows = [r for r in list_employees(active_only=False) if "active" in r and str(r["active"]) == "0"]
-        else:
-            rows = list_employees(active_only=False)
+        self._query_employees(
+            "employees", mode, "",
+            lambda pack: self._apply_employees(
+                pack, select_eid, "Chưa có nhân viên — dùng Create hoặc Import CSV", full=True),
+        )
+
+    def _query_employees(self, channel: str, mode: str, q: str, on_done):
+        """Directory còn tươi => lọc/tìm ngay trên Tk thread (sub-ms), ngược lại nạp lại qua DB worker."""
+        directory = get_directory()
+        if directory.fresh:
+            self._db_cancel(channel)  # bỏ kết quả async cũ (nếu có) để không đè lên
+            on_done(directory.query(mode, q))
+            return
+        self._db_async(channel, _load_employee_rows, mode, q, on_done=on_done)
+
+    def _apply_employees(self, pack: dict, select_eid: int | None, empty_text: str, full: bool):
+        rows, face_ids = pack["rows"], pack["face_ids"]
 
         for i in self.tree.get_children(): self.tree.delete(i)
         self._empty_iid = None
@@ -1158,12 +1120,17 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
         if not rows:
             self._empty_iid = self.tree.insert(
                 "", END,
-                values=("", "", "Chưa có nhân viên — dùng Create hoặc Import CSV", "", "", "", ""),
+                values=("", "", empty_text, "", "", "", ""),
                 tags=("inactive",)
             )
         else:
             for idx, r in enumerate(rows):
-                self._insert_row(r, idx)
+                self._insert_row(r, idx, face_ids)
+
+        self._update_buttons_state()
+        self._update_status(pack["total"], None, pack["active"])
+        if not full:
+            return
 
         if select_eid is not None and not self._empty_iid:
             for iid in self.tree.get_children(""):
@@ -1173,8 +1140,6 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
                     break
 
         self._show_face_small()
-        self._update_buttons_state()
-        self._update_status()
         if self.tree.focus() and not self._is_placeholder_iid(self.tree.focus()):
             self._load_selected()
         else:
@@ -1183,30 +1148,14 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
     def _search(self):
         q = self.ent_search.get().strip()
         if getattr(self.ent_search, "_ph_is_on", False): q = ""
-        mode = self._status_mode()
-
-        if q:
-            try:
-                rows = search_employees(q, status=mode)  # type: ignore
-            except TypeError:
-                rows = search_employees(q)
-                if mode != "all":
-                    want_active = (mode == "active")
-                    rows = [r for r in rows if "active" in r and (str(r["active"]) != "0") == want_active]
-        else:
+        if not q:
             self._refresh_employees(); return
 
-        for i in self.tree.get_children(): self.tree.delete(i)
-        self._empty_iid = None
-
-        if not rows:
-            self._empty_iid = self.tree.insert("", END,
-                values=("", "", "Không tìm thấy kết quả", "", "", "", ""), tags=("inactive",))
-        else:
-            for idx, r in enumerate(rows): self._insert_row(r, idx)
-
-        self._update_buttons_state()
-        self._update_status()
+        # cùng channel với refresh: gõ tiếp / đổi filter sẽ huỷ kết quả cũ
+        self._query_employees(
+            "employees", self._status_mode(), q,
+            lambda pack: self._apply_employees(pack, None, "Không tìm thấy kết quả", full=False),
+        )
 
     # def _load_selected(self):
     #     it = self.tree.focus()
@@ -1267,55 +1216,66 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
         # ===== status + hire_date =====
         try:
             if eid is not None:
-                row = fetch_one(
+                # status/hire_date lấy qua DB worker, form vẫn snapshot ngay bên dưới
+                self.var_status.set("")
+                self._db_async(
+                    "selected", fetch_one,
                     "SELECT active, hire_date FROM employees WHERE employee_id=%s",
-                    (eid,)
+                    (eid,),
+                    on_done=lambda row, e=str(eid): self._apply_selected_extra(e, row),
+                    on_error=lambda _e, e=str(eid): self._apply_selected_extra(e, None),
                 )
-
-                # status
-                if row:
-                    active_val = row.get("active", 1)
-                    digit = "1" if active_val is None else str(active_val)
-                    self.var_status.set("Active" if digit == "1" else "Inactive")
-                else:
-                    self.var_status.set("")
-
-                # hire_date (readonly entry)
-                if hasattr(self, "ent_hire_date"):
-                    hd = row.get("hire_date") if row else None
-                    hd_txt = ""
-                    try:
-                        if hd is not None:
-                            # pymysql thường trả datetime.date
-                            hd_txt = hd.isoformat() if hasattr(hd, "isoformat") else str(hd)
-                    except Exception:
-                        hd_txt = ""
-
-                    self.ent_hire_date.config(state=NORMAL)
-                    self.ent_hire_date.delete(0, END)
-                    self.ent_hire_date.insert(0, hd_txt)
-                    self.ent_hire_date.config(state="readonly")
-
             else:
+                self._db_cancel("selected")
                 self.var_status.set("")
-                if hasattr(self, "ent_hire_date"):
-                    self.ent_hire_date.config(state=NORMAL)
-                    self.ent_hire_date.delete(0, END)
-                    self.ent_hire_date.config(state="readonly")
-
+                self._set_hire_date_text("")
         except Exception:
             self.var_status.set("")
-            if hasattr(self, "ent_hire_date"):
-                try:
-                    self.ent_hire_date.config(state=NORMAL)
-                    self.ent_hire_date.delete(0, END)
-                    self.ent_hire_date.config(state="readonly")
-                except Exception:
-                    pass
+            self._set_hire_date_text("")
 
         self._snapshot_form()
         self._update_buttons_state()
 
+    def _set_hire_date_text(self, hd_txt: str):
+        if not hasattr(self, "ent_hire_date"):
+            return
+        try:
+            self.ent_hire_date.config(state=NORMAL)
+            self.ent_hire_date.delete(0, END)
+            self.ent_hire_date.insert(0, hd_txt)
+            self.ent_hire_date.config(state="readonly")
+        except Exception:
+            pass
+
+    def _apply_selected_extra(self, eid: str, row):
+        # user đã chọn dòng khác trong lúc chờ DB -> bỏ
+        if self.ent_empid.get().strip() != eid:
+            return
+
+        # status
+        if row:
+            active_val = row.get("active", 1)
+            digit = "1" if active_val is None else str(active_val)
+            status_txt = "Active" if digit == "1" else "Inactive"
+        else:
+            status_txt = ""
+        self.var_status.set(status_txt)
+
+        # hire_date (readonly entry)
+        hd = row.get("hire_date") if row else None
+        hd_txt = ""
+        try:
+            if hd is not None:
+                # pymysql thường trả datetime.date
+                hd_txt = hd.isoformat() if hasattr(hd, "isoformat") else str(hd)
+        except Exception:
+            hd_txt = ""
+        self._set_hire_date_text(hd_txt)
+
+        # chỉ cập nhật baseline của status, giữ nguyên phần user đang sửa
+        self._initial_form["status"] = status_txt
+        self._update_dirty_state()
+
 
     _EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
     _PHONE_RE = re.compile(r"^[+]?[\d\s\-()]{6,20}$")
@@ -1388,31 +1348,7 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
                 except Exception:
                     pass
 
-                # 5) LẤY FRAME MỚI NHẤT (drain queue để không bao giờ backlog)
-                latest = None
-                try:
-                    while True:
-                        latest = self._frame_queue.get_nowait()
-                except Exception:
-                    pass
-
-                if latest is not None:
-                    if not hasattr(self, "_frame_lock"):
-                        self._frame_lock = threading.Lock()
-
-                    cw, ch = getattr(self, "_canvas_wh", (0, 0))
-                    if cw > 1 and ch > 1:
-                        try:
-                            rs = cv2.resize(latest, (cw, ch), interpolation=cv2.INTER_AREA)
-                            rgb = cv2.cvtColor(rs, cv2.COLOR_BGR2RGB)
-                            with self._frame_lock:
-                                self._last_frame_bgr = latest
-                                self._last_frame_rgb_rs = rgb
-                                self._frame_seq += 1
-                        except Exception:
-                            pass
-
-                # 6) vẽ frame
+                # 5) vẽ frame (đã resize + overlay sẵn ở PreviewRenderer)
                 self._draw_latest_frame()
 
             finally:
@@ -1535,6 +1471,7 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
                 "UPDATE employees SET student_id=%s, full_name=%s, email=%s, phone=%s WHERE employee_id=%s",
                 (sid, name, email, phone, eid)
             )
+            invalidate_cache("employees")
 
             desired_txt = (self.var_status.get() or "").lower()
             cur_row = fetch_one("SELECT active FROM employees WHERE employee_id=%s", (eid,))
@@ -1556,6 +1493,7 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
                     deactivate_employee(eid)   # set active=0 + end_date
             elif desired_txt == "active" and cur_active == 0:
                 db_execute("UPDATE employees SET active=1, end_date=NULL WHERE employee_id=%s", (eid,))
+                invalidate_cache("employees")
 
             self._refresh_employees(select_eid=eid)
             try:
@@ -1619,6 +1557,7 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
 
     # ----- Face preview -----
     def _show_face_small(self):
+        self._db_cancel("face")
         it = self.tree.focus()
         if not it or self._is_placeholder_iid(it):
             self.lbl_face_small.configure(image="", text="(No face)" + (" (Kéo-thả)" if DND_ENABLED else ""))
@@ -1634,40 +1573,26 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
             self._preview_small_imgtk = None
             return
 
-        row = get_face(eid)
-        if not row or not row.get("image_path"):
-            self.lbl_face_small.configure(image="", text="(No face)")
+        def _err(e):
+            self.lbl_face_small.configure(image="", text=f"(Error)\n{e}")
             self.lbl_face_info.configure(text="")
             self._preview_small_imgtk = None
-            return
 
-        p = os.path.join(APP_BASE, row["image_path"])
-        if not os.path.exists(p):
-            self.lbl_face_small.configure(image="", text=f"(Missing)\n{row['image_path']}")
+        self._db_async("face", _load_face_thumb, eid, on_done=self._apply_face_small, on_error=_err)
+
+    def _apply_face_small(self, res: dict):
+        state = res.get("state")
+        if state != "ok":
+            txt = f"(Missing)\n{res.get('path', '')}" if state == "missing" else "(No face)"
+            self.lbl_face_small.configure(image="", text=txt)
             self.lbl_face_info.configure(text="")
             self._preview_small_imgtk = None
             return
 
-        W, H = 110, 110  # phải khớp face_box
         try:
-            with Image.open(p) as im:
-                src_w, src_h = im.size
-                im = im.convert("RGB")
-                im.thumbnail((W, H), Image.LANCZOS)
-
-                bg = Image.new("RGB", (W, H), (20, 20, 20))
-                x = (W - im.size[0]) // 2
-                y = (H - im.size[1]) // 2
-                bg.paste(im, (x, y))
-
-                imgtk = ImageTk.PhotoImage(bg)
-
-            size_kb = os.path.getsize(p) / 1024.0
-            self.lbl_face_info.configure(text=f"{src_w}×{src_h} px  •  {size_kb:.1f} KB")
-
-            self._preview_small_imgtk = imgtk
+            self._preview_small_imgtk = ImageTk.PhotoImage(res["image"])
             self.lbl_face_small.configure(image=self._preview_small_imgtk, text="")
-
+            self.lbl_face_info.configure(text=res.get("info", ""))
         except Exception as e:
             self.lbl_face_small.configure(image="", text=f"(Error)\n{e}")
             self.lbl_face_info.configure(text="")
@@ -1751,239 +1676,174 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
                 "Bỏ qua ảnh", parent=self
             ) == "Yes":
                 return
-            img_dir = None
-
-        import csv, hashlib, shutil, glob, os, re
-        from PIL import Image
-        from datetime import datetime, date
-
-        ok = skipped = face_ok = 0
-        warn_ambiguous = 0
-        warn_missing = 0
-        errors = []
-
-        def norm(s): 
-            return (s or "").strip().lower()
-
-        def parse_date(s: str):
-            s = (s or "").strip()
-            if not s:
-                return None
-            # chịu nhiều format phổ biến
-            for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d", "%Y-%m-%d %H:%M:%S"):
-                try:
-                    return datetime.strptime(s, fmt).date()
-                except Exception:
-                    pass
-            return None
 
-        def parse_active(s: str):
-            s = (s or "").strip().lower()
-            if s == "":
-                return None
-            if s in ("1", "true", "yes", "active"):
-                return 1
-            if s in ("0", "false", "no", "inactive"):
-                return 0
-            return None
+        # nặng (quét ảnh + hash + DB) -> worker thread; Tk chỉ poll tiến độ
+        if getattr(self, "_import_thread", None) and self._import_thread.is_alive():
+            messagebox.showinfo("Import CSV", "Đang import, vui lòng đợi...")
+            return
+
+        state = {"phase": "scan", "done": 0, "total": 0, "result": None, "error": None,
+                 "warn_missing": 0, "img_dir": img_dir}
+        self._import_state = state
+        self._import_dlg = self._open_import_progress()
 
-        def is_resigned(end_date_val, active_val):
-            """
-            Rule: Nếu có end_date (không rỗng) HOẶC active=0 => resigned.
-            => ép active=0 khi import.
-            """
-            if end_date_val is not None:
-                return True
-            if active_val is not None and int(active_val) == 0:
-                return True
-            return False
+        self._import_thread = threading.Thread(
+            target=self._import_csv_worker, args=(path, img_dir, upsert, state),
+            name="csv-import", daemon=True,
+        )
+        self._import_thread.start()
+        self._import_poll_job = self.after(100, self._poll_import)
+
+    @staticmethod
+    def _build_image_index(img_dir: str) -> dict[int, str]:
+        """sid -> best filepath (tên file = sid > bắt đầu bằng sid > có chứa số)."""
+        import glob
+        exts = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+        all_files = []
+        for ext in exts:
+            all_files += glob.glob(os.path.join(img_dir, f"**/*{ext}"), recursive=True)
+            all_files += glob.glob(os.path.join(img_dir, f"**/*{ext.upper()}"), recursive=True)
+
+        leading_num = re.compile(r"^(\d+)")
+        any_num = re.compile(r"(\d+)")
+
+        best_for_sid: dict[int, tuple[int, str]] = {}  # sid -> (rank, filepath)
+
+        for fp in all_files:
+            base = os.path.splitext(os.path.basename(fp))[0]
+            m_lead = leading_num.search(base)
+            m_any = any_num.search(base)
+
+            candidates: list[tuple[int, int]] = []
+            if m_lead:
+                sid_val = int(m_lead.group(1))
+                rank = 0 if base == str(sid_val) else 1
+                candidates.append((sid_val, rank))
+            elif m_any:
+                sid_val = int(m_any.group(1))
+                candidates.append((sid_val, 2))
+
+            for sid_val, rank in candidates:
+                prev = best_for_sid.get(sid_val)
+                if prev is None or rank < prev[0]:
+                    best_for_sid[sid_val] = (rank, fp)
+
+        return {sid_val: fp for sid_val, (_rank, fp) in best_for_sid.items()}
+
+    def _import_csv_worker(self, path: str, img_dir: str | None, upsert: bool, state: dict):
+        """Chạy trên thread riêng: KHÔNG đụng widget, chỉ ghi vào state."""
+        def _progress(phase, done, total):
+            state["phase"], state["done"], state["total"] = phase, done, total
 
         # --- Build image index: sid -> best filepath ---
         img_index: dict[int, str] = {}
         if img_dir:
             try:
-                exts = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
-                all_files = []
-                for ext in exts:
-                    all_files += glob.glob(os.path.join(img_dir, f"**/*{ext}"), recursive=True)
-                    all_files += glob.glob(os.path.join(img_dir, f"**/*{ext.upper()}"), recursive=True)
-
-                leading_num = re.compile(r"^(\d+)")
-                any_num = re.compile(r"(\d+)")
-
-                best_for_sid: dict[int, tuple[int, str]] = {}  # sid -> (rank, filepath)
-
-                for fp in all_files:
-                    base = os.path.splitext(os.path.basename(fp))[0]
-                    m_lead = leading_num.search(base)
-                    m_any = any_num.search(base)
-
-                    candidates: list[tuple[int, int]] = []
-                    if m_lead:
-                        sid_val = int(m_lead.group(1))
-                        rank = 0 if base == str(sid_val) else 1
-                        candidates.append((sid_val, rank))
-                    elif m_any:
-                        sid_val = int(m_any.group(1))
-                        candidates.append((sid_val, 2))
-
-                    for sid_val, rank in candidates:
-                        prev = best_for_sid.get(sid_val)
-                        if prev is None or rank < prev[0]:
-                            best_for_sid[sid_val] = (rank, fp)
-
-                for sid_val, (_rank, fp) in best_for_sid.items():
-                    img_index[sid_val] = fp
-
+                img_index = self._build_image_index(img_dir)
             except Exception as e:
-                messagebox.showwarning("Ảnh", f"Lỗi khi quét thư mục ảnh:\n{e}")
+                state["img_error"] = str(e)
                 img_dir = None
+                state["img_dir"] = None
+
+        pool = FaceIngestPool(FACES_DIR, APP_BASE, max_side=FACE_INGEST_MAX_SIDE)
+
+        def _attach_faces(batch):
+            # Gắn ảnh nếu có (chỉ gắn nếu có file ảnh khớp; không phụ thuộc active)
+            out = [(None, None)] * len(batch)
+            jobs, slots = [], []
+            for k, (eid, sid, _line) in enumerate(batch):
+                src = img_index.get(sid)
+                if not src or not os.path.isfile(src):
+                    state["warn_missing"] += 1
+                    continue
+                jobs.append((eid, src))
+                slots.append(k)
+            for k, (_eid, rel, err) in zip(slots, pool.ingest_many(jobs)):
+                out[k] = (rel, err)
+            return out
 
-        # --- Đọc CSV và import ---
         try:
-            with open(path, "r", encoding="utf-8-sig", newline="") as f:
-                reader = csv.DictReader(f)
-                headers = {norm(h): h for h in (reader.fieldnames or [])}
-
-                need = {"student_id", "full_name"}
-                if not need.issubset(set(headers.keys())):
-                    raise ValueError(f"Thiếu cột bắt buộc: {need - set(headers.keys())}")
-
-                # optional columns
-                has_email = "email" in headers
-                has_phone = "phone" in headers
-                has_hire  = "hire_date" in headers
-                has_end   = "end_date" in headers
-                has_act   = "active" in headers
-
-                for i, row in enumerate(reader, start=2):
-                    sid_raw = (row.get(headers["student_id"], "") or "").strip()
-                    name    = (row.get(headers["full_name"], "") or "").strip()
-                    email   = (row.get(headers["email"], "") or "").strip() if has_email else None
-                    phone   = (row.get(headers["phone"], "") or "").strip() if has_phone else None
-
-                    if not sid_raw or not name or not sid_raw.isdigit():
-                        skipped += 1
-                        continue
-
-                    sid = int(sid_raw)
-
-                    # parse optional fields
-                    hire_date = parse_date(row.get(headers["hire_date"], "")) if has_hire else None
-                    end_date  = parse_date(row.get(headers["end_date"], ""))  if has_end  else None
-                    active_in = parse_active(row.get(headers["active"], ""))  if has_act  else None
-
-                    # IMPORTANT: resigned => force inactive
-                    resigned = is_resigned(end_date, active_in)
-                    final_active = 0 if resigned else (1 if active_in is None else int(active_in))
-
-                    # hire_date: nếu có cột hire_date mà trống/parse fail -> fallback today
-                    if has_hire:
-                        if hire_date is None:
-                            hire_date = date.today()
-
-                    ex = fetch_one("SELECT employee_id FROM employees WHERE student_id=%s", (sid,))
-                    if ex:
-                        if upsert:
-                            # Update base fields
-                            set_parts = ["full_name=%s", "email=%s", "phone=%s"]
-                            params = [name or None, email or None, phone or None]
-
-                            # Update optional columns nếu CSV có
-                            if has_hire:
-                                set_parts.append("hire_date=%s")
-                                params.append(hire_date)
-                            if has_end:
-                                set_parts.append("end_date=%s")
-                                params.append(end_date)  # None OK
-                            if has_act or has_end:
-                                # nếu có end_date -> ép inactive, nên vẫn update active
-                                set_parts.append("active=%s")
-                                params.append(final_active)
-
-                            params.append(sid)
-                            db_execute(
-                                f"UPDATE employees SET {', '.join(set_parts)} WHERE student_id=%s",
-                                tuple(params)
-                            )
-                            eid = ex["employee_id"]
-                        else:
-                            skipped += 1
-                            continue
-                    else:
-                        # Insert
-                        # Ưu tiên gọi add_employee nếu signature bạn đã mở rộng,
-                        # nếu không thì fallback insert SQL cho chắc.
-                        try:
-                            if has_hire or has_end or has_act:
-                                add_employee(
-                                    sid, name,
-                                    email or None, phone or None,
-                                    (hire_date or date.today()),
-                                    end_date,
-                                    final_active
-                                )
-                            else:
-                                # file CSV cũ
-                                add_employee(sid, name, email or None, phone or None)
-                        except TypeError:
-                            # fallback SQL insert
-                            db_execute(
-                                "INSERT INTO employees (student_id, full_name, email, phone, hire_date, end_date, active) "
-                                "VALUES (%s,%s,%s,%s,%s,%s,%s)",
-                                (
-                                    sid, name,
-                                    email or None, phone or None,
-                                    (hire_date or date.today()),
-                                    end_date,
-                                    final_active
-                                )
-                            )
-
-                        ex2 = fetch_one("SELECT employee_id FROM employees WHERE student_id=%s", (sid,))
-                        eid = ex2["employee_id"] if ex2 else None
-
-                    # Gắn ảnh nếu có (chỉ gắn nếu có file ảnh khớp; không phụ thuộc active)
-                    if img_dir and eid:
-                        src = img_index.get(sid)
-                        if src and os.path.isfile(src):
-                            try:
-                                with Image.open(src) as im:
-                                    im.verify()
-                                with open(src, "rb") as fimg:
-                                    sha1 = hashlib.sha1(fimg.read()).hexdigest()
-                                ext = os.path.splitext(src)[1].lower() or ".jpg"
-                                os.makedirs(FACES_DIR, exist_ok=True)
-                                dst = os.path.join(FACES_DIR, f"{eid}_{sha1}{ext}")
-                                shutil.copy2(src, dst)
-                                rel = os.path.relpath(dst, APP_BASE).replace("\\", "/")
-                                upsert_face(eid, rel)
-                                face_ok += 1
-                            except Exception as fe:
-                                errors.append(f"Dòng {i}: {fe}")
-                        else:
-                            warn_missing += 1
-
-                    ok += 1
-
+            _progress("read", 0, 0)
+            records, bad_rows, cols = read_employee_csv(path)
+            res = bulk_import_employees(
+                records, cols, upsert=upsert,
+                face_resolver=_attach_faces if img_dir else None,
+                progress=_progress,
+                on_rollback=pool.discard_created,
+            )
+            res["skipped"] += bad_rows
+            state["result"] = res
         except Exception as e:
-            messagebox.showerror("Import CSV", f"Lỗi đọc file:\n{e}")
+            state["error"] = e
+
+    def _open_import_progress(self):
+        dlg = tb.Toplevel(self)
+        dlg.title("Import CSV")
+        dlg.transient(self.winfo_toplevel())
+        dlg.resizable(False, False)
+        dlg.protocol("WM_DELETE_WINDOW", lambda: None)  # đợi import xong
+
+        frm = tb.Frame(dlg, padding=14)
+        frm.pack(fill=BOTH, expand=YES)
+        dlg._lbl = tb.Label(frm, text="Đang chuẩn bị...", width=44)
+        dlg._lbl.pack(anchor=W)
+        dlg._pb = tb.Progressbar(frm, mode="determinate", length=360, bootstyle="info-striped")
+        dlg._pb.pack(fill=X, pady=(8, 0))
+        return dlg
+
+    def _poll_import(self):
+        self._import_poll_job = None
+        st = getattr(self, "_import_state", None)
+        dlg = getattr(self, "_import_dlg", None)
+        if st is None:
+            return
+
+        t = getattr(self, "_import_thread", None)
+        if t is not None and t.is_alive():
+            labels = {"scan": "Quét thư mục ảnh...", "read": "Đọc file CSV...",
+                      "prefetch": "Kiểm tra student_id...", "employees": "Ghi nhân viên",
+                      "faces": "Gắn ảnh", "commit": "Lưu..."}
+            try:
+                txt = labels.get(st["phase"], st["phase"])
+                if st["total"]:
+                    txt += f"  {st['done']}/{st['total']}"
+                    dlg._pb.configure(value=100.0 * st["done"] / max(1, st["total"]))
+                dlg._lbl.configure(text=txt)
+            except Exception:
+                pass
+            self._import_poll_job = self.after(100, self._poll_import)
+            return
+
+        try:
+            if dlg is not None:
+                dlg.destroy()
+        except Exception:
+            pass
+        self._import_dlg = None
+        self._import_state = None
+
+        if st.get("img_error"):
+            messagebox.showwarning("Ảnh", f"Lỗi khi quét thư mục ảnh:\n{st['img_error']}")
+        if st["error"] is not None:
+            # transaction đã rollback -> DB giữ nguyên như trước khi import
+            messagebox.showerror("Import CSV", f"Lỗi import (đã huỷ toàn bộ):\n{st['error']}")
+            self.refresh()
             return
 
+        res = st["result"]
         self.refresh()
 
         # Tổng kết
         msg = [
             "✅ Import hoàn tất:",
-            f"• Thành công: {ok}",
-            f"• Bỏ qua: {skipped}",
-            f"• Ảnh gắn OK: {face_ok}"
+            f"• Thành công: {res['ok']}",
+            f"• Bỏ qua: {res['skipped']}",
+            f"• Ảnh gắn OK: {res['face_ok']}"
         ]
-        if img_dir:
-            if warn_ambiguous:
-                msg.append(f"• Cảnh báo: {warn_ambiguous} student_id trùng ảnh (đã tự chọn 1).")
-            if warn_missing:
-                msg.append(f"• Thiếu ảnh: {warn_missing} dòng không có ảnh khớp.")
+        if st["img_dir"]:
+            if st["warn_missing"]:
+                msg.append(f"• Thiếu ảnh: {st['warn_missing']} dòng không có ảnh khớp.")
+        errors = res["errors"]
         if errors:
             msg.append("")
             msg.append("Chi tiết lỗi:")
@@ -2013,73 +1873,14 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
             parent=self
         ) == "Yes")
 
-        # lấy rows
-        if export_full:
-            rows = list_employees(active_only=False)  # full
-        else:
-            mode = self._status_mode()
-            if mode == "active":
-                rows = list_employees(active_only=True)
-            elif mode == "inactive":
-                rows = [r for r in list_employees(active_only=False) if "active" in r and str(r["active"]) == "0"]
-            else:
-                rows = list_employees(active_only=False)
-
-        # bổ sung hire_date/end_date/active cho chắc (phòng list_employees chưa select 2 cột này)
-        try:
-            ids = [r.get("employee_id") for r in rows if r.get("employee_id") is not None]
-            extra = {}
-            if ids:
-                placeholders = ",".join(["%s"] * len(ids))
-                extra_rows = fetch_all(
-                    f"SELECT employee_id, hire_date, end_date, active FROM employees WHERE employee_id IN ({placeholders})",
-                    tuple(ids)
-                )
-                for er in (extra_rows or []):
-                    extra[er["employee_id"]] = er
-
-            for r in rows:
-                eid = r.get("employee_id")
-                if eid in extra:
-                    r["hire_date"] = extra[eid].get("hire_date")
-                    r["end_date"]  = extra[eid].get("end_date")
-                    r["active"]    = extra[eid].get("active")
-        except Exception:
-            pass
-
-        def fmt_date(d):
-            if d is None:
-                return ""
-            try:
-                return d.isoformat()
-            except Exception:
-                return str(d)
-
-        # ghi CSV
-        try:
-            import csv
-            with open(path, "w", newline="", encoding="utf-8") as f:
-                w = csv.writer(f)
-                w.writerow(["employee_id", "student_id", "full_name", "email", "phone", "hire_date", "end_date", "active"])
-                for r in rows:
-                    w.writerow([
-                        r.get("employee_id"),
-                        r.get("student_id"),
-                        r.get("full_name"),
-                        r.get("email"),
-                        r.get("phone"),
-                        fmt_date(r.get("hire_date")),
-                        fmt_date(r.get("end_date")),
-                        r.get("active", 1),
-                    ])
-
-            messagebox.showinfo("Export", f"Đã xuất: {path}")
-        except Exception as e:
-            messagebox.showerror("Export", f"Lỗi ghi file:\n{e}")
+        # 1 query, stream thẳng ra CSV trên worker thread
+        status = "all" if export_full else self._status_mode()
+        self._run_export(path, lambda progress: export_employees(path, status, progress), title="Export")
 
 
 
-    # ----- Handler khi sensor báo NG -----
+    # ----- Handler khi sensor báo NG (speculative) / CK (UART_SPECULATIVE=0) -----
+    # kết quả có trước CK => UARTDaemon giữ ở _pending_result, CK tới là gửi
 
     def _on_sensor_trigger(self):
         def _ui():
@@ -2413,17 +2214,11 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
         except Exception:
             messagebox.showwarning("Ảnh", "Tập tin không phải ảnh hợp lệ."); return
 
-        os.makedirs(FACES_DIR, exist_ok=True)
-
         old = get_face(eid)
         old_abs = os.path.join(APP_BASE, old["image_path"]) if (old and old.get("image_path")) else None
 
-        with open(fp, "rb") as f:
-            sha1 = hashlib.sha1(f.read()).hexdigest()
-        ext = os.path.splitext(fp)[1].lower() or ".jpg"
-        dst = os.path.join(FACES_DIR, f"{eid}_{sha1}{ext}")
-        shutil.copy2(fp, dst)
-        rel = os.path.relpath(dst, APP_BASE).replace("\\", "/")
+        rel, _copied = ingest_face_file(fp, eid, FACES_DIR, APP_BASE, FACE_INGEST_MAX_SIDE or None)
+        dst = os.path.join(APP_BASE, rel)
         upsert_face(eid, rel)
 
         if old_abs and os.path.abspath(old_abs) != os.path.abspath(dst):
@@ -2444,6 +2239,13 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
 
     # ----- Cleanup -----
     def _on_destroy(self, *_):
+        # drop pending DB callbacks
+        for ch in ("employees", "status", "selected", "face"):
+            try:
+                self._db_cancel(ch)
+            except Exception:
+                pass
+
         # stop threads
         try:
             self._stop_recog()
@@ -2458,9 +2260,20 @@ class PeopleTab(tb.Frame, PlaceholderMixin):
                 self._uart.stop()
         except Exception:
             pass
+        try:
+            if getattr(self, "_renderer", None):
+                self._renderer.stop()
+        except Exception:
+            pass
+        try:
+            if getattr(self, "_stations", None):
+                self._stations.stop()
+                self._stations = None
+        except Exception:
+            pass
 
         # cancel UI jobs
-        for attr in ("_ui_draw_job", "_scan_timeout_id", "_cam_status_after_id", "_recog_status_after_id", "_draw_after_id", "_uart_poll_job"):
+        for attr in ("_ui_draw_job", "_scan_timeout_id", "_cam_status_after_id", "_recog_status_after_id", "_draw_after_id", "_uart_poll_job", "_import_poll_job"):
             try:
                 job = getattr(self, attr, None)
                 if job:
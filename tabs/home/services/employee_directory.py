@@ -0,0 +1,143 @@
+# tabs/home/services/employee_directory.py
+"""
+Employee directory (client-side) cho People tab.
+
+- Nạp toàn bộ employees + cờ face 1 lần (1–2 query), giữ trong RAM
+- Index bigram trên khoá tìm kiếm = tên đã bỏ dấu (lower) + student_id
+  => search "chứa chuỗi" giống LIKE '%q%' (MySQL unicode_ci cũng không phân biệt dấu)
+     nhưng không cần round-trip DB
+- Giữ tươi bằng change event của DAL (attendance_dal.subscribe_changes):
+  có ghi employees/faces => đánh dấu stale, lần truy vấn sau (trên DB worker) nạp lại
+- Snapshot bất biến: build xong mới swap, reader không cần lock
+"""
+from __future__ import annotations
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from db.attendance_dal import list_employees, list_face_employee_ids, subscribe_changes
+from .text_utils import ascii_no_diacritics
+
+_SEP = "\x00"   # ngăn cách tên / student_id trong khoá (q không bao giờ chứa ký tự này)
+
+
+def _fold(s: str) -> str:
+    return (ascii_no_diacritics(s or "") or "").lower()
+
+
+def _bigrams(s: str) -> Set[str]:
+    return {s[i:i + 2] for i in range(len(s) - 1)}
+
+
+class _Snapshot:
+    __slots__ = ("rows", "order", "keys", "index", "face_ids", "total", "active")
+
+    def __init__(self, rows: List[Dict[str, Any]], face_ids: Set[int]):
+        rows = sorted(rows, key=lambda r: int(r["employee_id"]))
+        self.rows: Dict[int, Dict[str, Any]] = {int(r["employee_id"]): r for r in rows}
+        self.order: List[int] = [int(r["employee_id"]) for r in rows]
+        self.keys: Dict[int, str] = {}
+        self.index: Dict[str, Set[int]] = {}
+        self.face_ids = face_ids
+
+        for eid in self.order:
+            r = self.rows[eid]
+            key = f"{_fold(r.get('full_name'))}{_SEP}{r.get('student_id') or ''}"
+            self.keys[eid] = key
+            for g in _bigrams(key):
+                if _SEP in g:
+                    continue
+                self.index.setdefault(g, set()).add(eid)
+
+        self.total = len(rows)
+        self.active = sum(1 for r in rows if str(r.get("active", 1)) != "0")
+
+
+def _status_ok(r: Dict[str, Any], mode: str) -> bool:
+    if mode == "active":
+        return str(r.get("active", 1)) != "0"
+    if mode == "inactive":
+        return "active" in r and str(r["active"]) == "0"
+    return True
+
+
+class EmployeeDirectory:
+    # lưới an toàn cho thay đổi từ ngoài app (không đi qua DAL) — bằng TTL của list_employees
+    MAX_AGE_SEC = 60.0
+
+    def __init__(self):
+        self._snap: Optional[_Snapshot] = None
+        self._stale = True
+        self._loaded_at = 0.0
+        self._load_lock = threading.Lock()
+        subscribe_changes(self._on_db_change)
+
+    # ---------- freshness ----------
+    def _on_db_change(self, tags):
+        if "employees" in tags or "faces" in tags:
+            self._stale = True
+
+    @property
+    def fresh(self) -> bool:
+        return (self._snap is not None and not self._stale
+                and time.monotonic() - self._loaded_at < self.MAX_AGE_SEC)
+
+    def ensure_loaded(self) -> _Snapshot:
+        """Nạp lại nếu stale. Gọi trên DB worker (có query)."""
+        with self._load_lock:
+            if not self.fresh:
+                # hạ cờ trước khi query: có ghi xen giữa thì lần sau nạp lại tiếp
+                self._stale = False
+                try:
+                    rows = list_employees(active_only=False)
+                    try:
+                        face_ids = list_face_employee_ids()
+                    except Exception:
+                        face_ids = set()
+                except Exception:
+                    self._stale = True
+                    raise
+                self._snap = _Snapshot(rows, face_ids)
+                self._loaded_at = time.monotonic()
+            return self._snap
+
+    # ---------- query (không đụng DB nếu snapshot còn tươi) ----------
+    def query(self, mode: str = "all", q: str = "") -> Dict[str, Any]:
+        """
+        Trả về {rows, face_ids, total, active} giống _load_employee_rows cũ,
+        rows sort theo employee_id.
+        """
+        snap = self._snap if self.fresh else self.ensure_loaded()
+        if q:
+            eids = self._search(snap, _fold(q))
+        else:
+            eids = snap.order
+        rows = [snap.rows[e] for e in eids if _status_ok(snap.rows[e], mode)]
+        return {"rows": rows, "face_ids": snap.face_ids, "total": snap.total, "active": snap.active}
+
+    @staticmethod
+    def _search(snap: _Snapshot, fq: str) -> List[int]:
+        if not fq:
+            return snap.order
+        if len(fq) < 2:
+            return [e for e in snap.order if fq in snap.keys[e]]
+
+        postings = [snap.index.get(g) for g in _bigrams(fq)]
+        if not all(postings):
+            return []
+        postings.sort(key=len)
+        cand = postings[0].intersection(*postings[1:])
+        # xác nhận substring thật (bigram chỉ là điều kiện cần) + giữ thứ tự employee_id
+        return sorted(e for e in cand if fq in snap.keys[e])
+
+
+_DIRECTORY: Optional[EmployeeDirectory] = None
+_DIRECTORY_LOCK = threading.Lock()
+
+
+def get_directory() -> EmployeeDirectory:
+    global _DIRECTORY
+    with _DIRECTORY_LOCK:
+        if _DIRECTORY is None:
+            _DIRECTORY = EmployeeDirectory()
+        return _DIRECTORY
@@ -0,0 +1,133 @@
+# tabs/home/services/face_detector.py
+"""
+Shared MTCNN detector (1 model / process).
+
+Trước đây mỗi lần chụp trong CreateEmployeeDialog / ChangeFaceDialog lại tạo
+MTCNN() mới (load lại P/R/O-Net), trong khi RecognitionDaemon cũng giữ 1 bản.
+Giờ mọi nơi gọi get_detector().detect(rgb):
+
+- model được khởi tạo lazy, đúng 1 lần, trên worker thread riêng
+- request đi qua PriorityQueue: ảnh enrolment (dialog) được ưu tiên hơn
+  frame của daemon nhận diện
+- detect() chờ kết quả (blocking), detect_async() trả qua callback (gọi trên worker thread)
+"""
+from __future__ import annotations
+import itertools
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from mtcnn import MTCNN as _MTCNN_pkg
+    _HAS_MTCNN = True
+except Exception:
+    _HAS_MTCNN = False
+    _MTCNN_pkg = None  # type: ignore
+
+PRIO_ENROL = 0      # dialog chụp ảnh: người dùng đang chờ
+PRIO_STREAM = 1     # frame từ RecognitionDaemon
+
+
+class _Req:
+    __slots__ = ("rgb", "done", "result", "callback")
+
+    def __init__(self, rgb, callback=None):
+        self.rgb = rgb
+        self.done = threading.Event()
+        self.result: List[Dict[str, Any]] = []
+        self.callback = callback
+
+
+class FaceDetector:
+    def __init__(self):
+        self._q: "queue.PriorityQueue[tuple]" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._model = None
+        self._failed = not _HAS_MTCNN
+
+    # ---------- state ----------
+    @property
+    def available(self) -> bool:
+        """False nếu thiếu package mtcnn hoặc load model lỗi."""
+        return not self._failed
+
+    def warmup(self):
+        """Khởi động worker + load model ngay (không chờ)."""
+        self._ensure_worker()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        if self._failed:
+            return False
+        self._ensure_worker()
+        self._ready.wait(timeout)
+        return self.available and self._model is not None
+
+    # ---------- public ----------
+    def detect(self, rgb, priority: int = PRIO_ENROL, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Trả về list dict giống MTCNN.detect_faces(); [] nếu không có model / timeout."""
+        if self._failed or rgb is None:
+            return []
+        req = _Req(rgb)
+        self._submit(req, priority)
+        if not req.done.wait(timeout):
+            return []
+        return req.result
+
+    def detect_async(self, rgb, callback: Callable[[List[Dict[str, Any]]], None],
+                     priority: int = PRIO_STREAM):
+        if self._failed or rgb is None:
+            callback([])
+            return
+        self._submit(_Req(rgb, callback), priority)
+
+    # ---------- internals ----------
+    def _submit(self, req: _Req, priority: int):
+        self._ensure_worker()
+        self._q.put((priority, next(self._seq), req))
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is not None or self._failed:
+                return
+            self._thread = threading.Thread(target=self._run, name="mtcnn-detector", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            self._model = _MTCNN_pkg()
+        except Exception as e:
+            print(f"[FACE_DETECTOR] MTCNN init failed: {e}")
+            self._failed = True
+        finally:
+            self._ready.set()
+
+        while True:
+            _prio, _seq, req = self._q.get()
+            res: List[Dict[str, Any]] = []
+            if self._model is not None:
+                try:
+                    res = self._model.detect_faces(req.rgb) or []
+                except Exception as e:
+                    print(f"[FACE_DETECTOR] detect error: {e}")
+            req.result = res
+            req.done.set()
+            if req.callback is not None:
+                try:
+                    req.callback(res)
+                except Exception:
+                    pass
+
+
+_DETECTOR: Optional[FaceDetector] = None
+_DETECTOR_LOCK = threading.Lock()
+
+
+def get_detector() -> FaceDetector:
+    global _DETECTOR
+    with _DETECTOR_LOCK:
+        if _DETECTOR is None:
+            _DETECTOR = FaceDetector()
+        return _DETECTOR
@@ -0,0 +1,132 @@
+# tabs/home/services/face_ingest.py
+"""
+Face image ingest: src file -> data/faces/{eid}_{sha1}{ext}
+
+- sha1 tính theo chunk (không đọc cả file vào RAM)
+- verify bằng PIL, copy / chuẩn hoá trên thread pool
+- đích là content-addressed: đã tồn tại thì bỏ qua copy
+- tuỳ chọn: thu nhỏ ảnh (cạnh dài <= max_side) + lưu JPEG để data/faces gọn hơn
+"""
+from __future__ import annotations
+import os
+import shutil
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+HASH_CHUNK = 1 << 20   # 1 MiB
+
+
+def sha1_file(path: str, chunk_size: int = HASH_CHUNK) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        while True:
+            buf = f.read(chunk_size)
+            if not buf:
+                break
+            h.update(buf)
+    return h.hexdigest()
+
+
+def ingest_face_file(
+    src: str,
+    eid: int,
+    faces_dir: str,
+    app_base: str,
+    max_side: Optional[int] = None,
+    jpeg_quality: int = 92,
+) -> Tuple[str, bool]:
+    """
+    Copy (hoặc chuẩn hoá) 1 ảnh vào faces_dir.
+    Trả về (rel_path so với app_base, copied). copied=False khi file đích đã có sẵn.
+    Raise nếu src không phải ảnh hợp lệ.
+    """
+    with Image.open(src) as im:
+        im.verify()
+
+    sha1 = sha1_file(src)
+    ext = ".jpg" if max_side else (os.path.splitext(src)[1].lower() or ".jpg")
+    dst = os.path.join(faces_dir, f"{eid}_{sha1}{ext}")
+    rel = os.path.relpath(dst, app_base).replace("\\", "/")
+
+    if os.path.isfile(dst):
+        return rel, False
+
+    os.makedirs(faces_dir, exist_ok=True)
+    tmp = dst + ".part"
+    if max_side:
+        # verify() làm hỏng object -> mở lại để decode
+        with Image.open(src) as im:
+            im = ImageOps.exif_transpose(im).convert("RGB")
+            if max(im.size) > max_side:
+                im.thumbnail((max_side, max_side), Image.LANCZOS)
+            im.save(tmp, format="JPEG", quality=jpeg_quality)
+    else:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dst)   # đổi tên nguyên tử: không để lại file dở nếu lỗi giữa chừng
+    return rel, True
+
+
+class FaceIngestPool:
+    """
+    Thread pool cho ingest nhiều ảnh (import CSV).
+    Hash/decode/copy phần lớn là I/O + C code (PIL nhả GIL) nên thread là đủ.
+    """
+
+    def __init__(self, faces_dir: str, app_base: str, workers: Optional[int] = None,
+                 max_side: Optional[int] = None):
+        self.faces_dir = faces_dir
+        self.app_base = app_base
+        self.max_side = max_side or None
+        self.workers = workers or min(8, (os.cpu_count() or 2) + 2)
+
+        self.copied = 0
+        self.reused = 0
+        self.created: List[str] = []   # file mới copy (abs path) => discard_created() khi rollback
+
+    def ingest_many(
+        self, items: Iterable[Tuple[int, str]]
+    ) -> List[Tuple[int, Optional[str], Optional[Exception]]]:
+        """
+        items: [(eid, src_path)] -> [(eid, rel_path | None, error | None)] cùng thứ tự.
+        """
+        items = list(items)
+        if not items:
+            return []
+
+        def _one(it):
+            eid, src = it
+            try:
+                rel, copied = ingest_face_file(src, eid, self.faces_dir, self.app_base, self.max_side)
+                return eid, rel, None, copied
+            except Exception as e:
+                return eid, None, e, False
+
+        out: List[Tuple[int, Optional[str], Optional[Exception]]] = []
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(items)),
+                                thread_name_prefix="face-ingest") as ex:
+            for eid, rel, err, copied in ex.map(_one, items):
+                if rel is not None:
+                    if copied:
+                        self.copied += 1
+                        self.created.append(os.path.join(self.app_base, rel))
+                    else:
+                        self.reused += 1
+                out.append((eid, rel, err))
+        return out
+
+    def discard_created(self) -> int:
+        """Xoá các file do pool này mới copy (transaction import bị rollback => không để ảnh mồ côi)."""
+        removed = 0
+        for p in self.created:
+            try:
+                os.remove(p)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"[FACE_INGEST] cannot remove {p}: {e}")
+        self.created.clear()
+        return removed
@@ -0,0 +1,133 @@
+# tabs/home/services/face_library.py
+"""
+Thư viện embedding khuôn mặt dùng chung cho mọi RecognitionDaemon / station.
+
+Trước đây mỗi daemon tự embed lại toàn bộ ảnh trong data/faces (và rebuild mỗi
+rebuild_secs) => N làn = N lần tính + N bản embedding trong RAM. Giờ:
+
+- build 1 lần (qua InferenceEngine, station "library"), các daemon chờ chung
+- rebuild khi số ảnh nguồn đổi; snapshot (lib, emb) được thay nguyên khối,
+  daemon đang match vẫn đọc bản cũ an toàn
+- match(): cosine giống logic cũ của RecognitionDaemon (top1, top2 theo eid)
+"""
+from __future__ import annotations
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .inference_engine import InferenceEngine, STATION_LIBRARY, get_inference_engine
+
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> float:
+    a = a.astype(np.float32); b = b.astype(np.float32)
+    na = np.linalg.norm(a) + 1e-9; nb = np.linalg.norm(b) + 1e-9
+    return float(np.dot(a, b) / (na * nb))
+
+
+class FaceLibrary:
+    def __init__(self, lib_supplier: Callable[[], List[Dict[str, Any]]], engine: InferenceEngine,
+                 rebuild_secs: float = 20.0):
+        self._lib_supplier = lib_supplier
+        self._engine = engine
+        self._rebuild_secs = float(rebuild_secs)
+
+        self._build_lock = threading.Lock()
+        # snapshot: (lib_cache, emb_cache) — chỉ thay cả tuple, không sửa tại chỗ
+        self._snap: Tuple[List[Dict[str, Any]], Dict[int, List[np.ndarray]]] = ([], {})
+        self._built = False
+        self._last_rebuild = 0.0
+        self._last_source_count = -1
+
+    def __len__(self) -> int:
+        return len(self._snap[0])
+
+    # ---------- build ----------
+    def _build(self):
+        lib_cache: List[Dict[str, Any]] = []
+        emb_cache: Dict[int, List[np.ndarray]] = {}
+        lib = self._lib_supplier() or []
+
+        for it in lib:
+            try:
+                eid = int(it["eid"])
+                path = it["img_abs"]
+                if not path or not os.path.isfile(path):
+                    continue
+                emb = self._engine.embed_path(STATION_LIBRARY, path)
+                if emb is None:
+                    continue
+                lib_cache.append(it)
+                emb_cache.setdefault(eid, []).append(emb)
+            except Exception:
+                continue
+
+        self._snap = (lib_cache, emb_cache)
+        self._built = True
+        self._last_rebuild = time.time()
+        self._last_source_count = len(lib)
+
+    def ensure_built(self) -> bool:
+        """Build lần đầu (daemon khác gọi cùng lúc sẽ chờ). True nếu có >=1 khuôn mặt."""
+        with self._build_lock:
+            if not self._built:
+                self._build()
+        return len(self) > 0
+
+    def maybe_rebuild(self):
+        """Định kỳ: số ảnh nguồn đổi thì build lại (1 daemon làm, daemon khác bỏ qua)."""
+        if (time.time() - self._last_rebuild) < self._rebuild_secs:
+            return
+        if not self._build_lock.acquire(blocking=False):
+            return
+        try:
+            if (time.time() - self._last_rebuild) < self._rebuild_secs:
+                return
+            cur_lib = self._lib_supplier() or []
+            if len(cur_lib) != self._last_source_count:
+                self._build()
+            else:
+                self._last_rebuild = time.time()
+        finally:
+            self._build_lock.release()
+
+    # ---------- matching ----------
+    def match(self, emb: np.ndarray) -> Optional[Tuple[int, int, str, float, float]]:
+        lib_cache, emb_cache = self._snap
+        if not lib_cache or not emb_cache:
+            return None
+        sims: List[Tuple[int, float]] = []
+        for it in lib_cache:
+            eid = int(it["eid"])
+            emb_list = emb_cache.get(eid) or []
+            if not emb_list:
+                continue
+            smax = max((_cosine(emb, e) for e in emb_list), default=0.0)
+            sims.append((eid, smax))
+        if not sims:
+            return None
+        sims.sort(key=lambda t: t[1], reverse=True)
+        top1_eid, s1 = sims[0]
+        s2 = sims[1][1] if len(sims) > 1 else 0.0
+        info = next((x for x in lib_cache if int(x["eid"]) == top1_eid), None)
+        if not info:
+            return None
+        sid = int(info.get("student_id") or 0)
+        name = str(info.get("full_name") or "")
+        return (top1_eid, sid, name, s1, s2)
+
+
+_LIBRARY: Optional[FaceLibrary] = None
+_LIBRARY_LOCK = threading.Lock()
+
+
+def get_face_library(lib_supplier: Optional[Callable[[], List[Dict[str, Any]]]] = None,
+                     model_name: str = "VGG-Face", rebuild_secs: float = 20.0) -> Optional[FaceLibrary]:
+    """Thư viện dùng chung; lần gọi đầu phải truyền lib_supplier."""
+    global _LIBRARY
+    with _LIBRARY_LOCK:
+        if _LIBRARY is None and lib_supplier is not None:
+            _LIBRARY = FaceLibrary(lib_supplier, get_inference_engine(model_name), rebuild_secs)
+        return _LIBRARY
@@ -0,0 +1,211 @@
+# tabs/home/services/inference_engine.py
+"""
+Inference engine dùng chung (1 worker / process) cho embedding DeepFace.
+
+Nhiều làn kiosk (station) cùng nhận diện: mỗi RecognitionDaemon không tự gọi
+DeepFace.represent nữa mà gửi request vào đây:
+
+- 1 worker thread => 1 bản model trong RAM, không tranh chấp TF giữa các thread
+- hàng đợi riêng từng station, phục vụ round-robin => 1 làn đông không bỏ đói làn khác
+- stats() theo station: số request, thời gian chờ / suy luận trung bình
+"""
+from __future__ import annotations
+import os
+import time
+import atexit
+import tempfile
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+try:
+    from deepface import DeepFace
+    _HAS_DEEPFACE = True
+except Exception:
+    _HAS_DEEPFACE = False
+
+STATION_LIBRARY = "library"     # request build thư viện khuôn mặt
+
+
+class _Job:
+    __slots__ = ("fn", "done", "result", "t_submit")
+
+    def __init__(self, fn: Callable[[], Any]):
+        self.fn = fn
+        self.done = threading.Event()
+        self.result: Any = None
+        self.t_submit = time.perf_counter()
+
+
+class InferenceEngine:
+    def __init__(self, model_name: str = "VGG-Face"):
+        self.model_name = str(model_name)
+        self._cv = threading.Condition()
+        self._queues: Dict[str, Deque[_Job]] = {}
+        self._order: List[str] = []     # thứ tự round-robin
+        self._rr = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stats: Dict[str, List[float]] = {}   # station -> [requests, tổng chờ ms, tổng infer ms]
+
+        # TEMP FILE REUSE (fallback khi represent in-memory lỗi) — chỉ worker dùng
+        base = os.path.join(tempfile.gettempdir(), f"smartatt_{os.getpid()}_{id(self)}")
+        self._tmp_crop_path = base + "_crop.jpg"
+        self._tmp_img_path = base + "_img.jpg"
+        atexit.register(self._cleanup_tmp)
+
+    @property
+    def available(self) -> bool:
+        return _HAS_DEEPFACE
+
+    # ---------- public ----------
+    def embed_crop(self, station: str, crop_bgr: np.ndarray, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        return self._call(station, lambda: self._represent_crop(crop_bgr), timeout)
+
+    def embed_path(self, station: str, path: str, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        return self._call(station, lambda: self._represent_path(path), timeout)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._cv:
+            out = {}
+            for st, (n, wait, infer) in self._stats.items():
+                out[st] = {
+                    "requests": int(n),
+                    "queued": len(self._queues.get(st) or ()),
+                    "avg_wait_ms": round(wait / n, 2) if n else 0.0,
+                    "avg_infer_ms": round(infer / n, 2) if n else 0.0,
+                }
+            return out
+
+    # ---------- scheduling ----------
+    def _call(self, station: str, fn: Callable[[], Any], timeout: Optional[float]):
+        if not _HAS_DEEPFACE:
+            return None
+        job = _Job(fn)
+        with self._cv:
+            q = self._queues.get(station)
+            if q is None:
+                q = self._queues[station] = deque()
+                self._order.append(station)
+            q.append(job)
+            self._ensure_worker()
+            self._cv.notify()
+        if not job.done.wait(timeout):
+            return None
+        return job.result
+
+    def _ensure_worker(self):
+        # gọi khi đang giữ self._cv
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="inference-engine", daemon=True)
+            self._thread.start()
+
+    def _next_job(self) -> tuple:
+        """Round-robin qua các station có request (gọi khi đang giữ self._cv)."""
+        n = len(self._order)
+        for k in range(n):
+            i = (self._rr + k) % n
+            q = self._queues[self._order[i]]
+            if q:
+                self._rr = (i + 1) % n
+                return self._order[i], q.popleft()
+        return None, None
+
+    def _run(self):
+        while True:
+            with self._cv:
+                station, job = self._next_job()
+                while job is None:
+                    self._cv.wait()
+                    station, job = self._next_job()
+
+            t0 = time.perf_counter()
+            try:
+                job.result = job.fn()
+            except Exception as e:
+                print(f"[INFERENCE] {station}: {e}")
+                job.result = None
+            t1 = time.perf_counter()
+            job.done.set()
+
+            with self._cv:
+                st = self._stats.setdefault(station, [0, 0.0, 0.0])
+                st[0] += 1
+                st[1] += (t0 - job.t_submit) * 1000.0
+                st[2] += (t1 - t0) * 1000.0
+
+    # ---------- DeepFace (chỉ chạy trên worker) ----------
+    def _represent(self, img, backend: str, align: bool) -> Optional[np.ndarray]:
+        reps = DeepFace.represent(
+            img_path=img,
+            model_name=self.model_name,
+            detector_backend=backend,
+            enforce_detection=False,
+            align=align
+        )
+        if isinstance(reps, list) and reps:
+            return np.array(reps[0]["embedding"], dtype=np.float32)
+        return None
+
+    def _represent_crop(self, crop_bgr: np.ndarray) -> Optional[np.ndarray]:
+        """Ưu tiên in-memory; fallback overwrite 1 temp file cố định."""
+        try:
+            emb = self._represent(crop_bgr, "skip", False)
+            if emb is not None:
+                return emb
+        except Exception:
+            pass
+        try:
+            if not cv2.imwrite(self._tmp_crop_path, crop_bgr):
+                return None
+            return self._represent(self._tmp_crop_path, "skip", False)
+        except Exception:
+            return None
+
+    def _represent_path(self, path: str) -> Optional[np.ndarray]:
+        for backend in ("opencv", "retinaface", "skip"):
+            try:
+                emb = self._represent(path, backend, True)
+                if emb is not None:
+                    return emb
+            except Exception:
+                pass
+
+        # Fallback: overwrite 1 temp cố định (không create/delete liên tục)
+        try:
+            img = cv2.imread(path)
+            if img is None:
+                return None
+            cv2.imwrite(self._tmp_img_path, img)
+            for backend in ("opencv", "retinaface", "skip"):
+                try:
+                    emb = self._represent(self._tmp_img_path, backend, True)
+                    if emb is not None:
+                        return emb
+                except Exception:
+                    pass
+            return None
+        except Exception:
+            return None
+
+    def _cleanup_tmp(self):
+        for p in (self._tmp_crop_path, self._tmp_img_path):
+            if os.path.isfile(p):
+                try:
+                    os.remove(p)
+                except Exception:
+                    pass
+
+
+_ENGINES: Dict[str, InferenceEngine] = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def get_inference_engine(model_name: str = "VGG-Face") -> InferenceEngine:
+    with _ENGINES_LOCK:
+        eng = _ENGINES.get(model_name)
+        if eng is None:
+            eng = _ENGINES[model_name] = InferenceEngine(model_name)
+        return eng
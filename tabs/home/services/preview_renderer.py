@@ -0,0 +1,213 @@
+# tabs/home/services/preview_renderer.py
+from __future__ import annotations
+import time, threading
+from typing import Optional, Callable, Tuple, Any, Dict, List
+import cv2
+import numpy as np
+from PIL import Image
+
+N_BUFFERS = 3   # 1 đang publish + 1 Tk đang paste + 1 để render => không bao giờ ghi đè ảnh đang đọc
+
+
+def draw_viz_overlay(rgb, viz: Dict[str, Any], src_w: int, src_h: int):
+    """
+    Vẽ bbox + label của recog (toạ độ theo frame gốc src_w x src_h) lên ảnh RGB/RGBA đã resize.
+    viz["color"] là BGR (theo recog daemon) -> đảo lại vì mảng đang là RGB.
+    """
+    ch, cw = rgb.shape[:2]
+    sx = cw / float(src_w)
+    sy = ch / float(src_h)
+
+    x = y = w = h = None
+    try:
+        if "bbox" in viz:
+            x, y, w, h = viz.get("bbox")
+        elif "box" in viz:
+            b = viz.get("box")
+            if b and len(b) == 4:
+                x1, y1, x2, y2 = b
+                if x2 > x1 and y2 > y1:
+                    x, y, w, h = int(x1), int(y1), int(x2 - x1), int(y2 - y1)
+                else:
+                    x, y, w, h = int(x1), int(y1), int(x2), int(y2)
+    except Exception:
+        return
+    if x is None or y is None or w is None or h is None:
+        return
+
+    x, y, w, h = int(x * sx), int(y * sy), int(w * sx), int(h * sy)
+    bgr = viz.get("color", (0, 255, 0))
+    color = (int(bgr[2]), int(bgr[1]), int(bgr[0]), 255)
+    cv2.rectangle(rgb, (x, y), (x + w, y + h), color, 2)
+    label = viz.get("label", "")
+    if label:
+        cv2.putText(rgb, str(label), (x, max(0, y - 8)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+
+class _Buffers:
+    """Bộ đệm canvas-size dùng lại mỗi frame: resize (BGR) + RGBA + PIL.Image chung bộ nhớ với RGBA."""
+
+    def __init__(self, w: int, h: int):
+        self.size = (w, h)
+        self.resized = np.empty((h, w, 3), dtype=np.uint8)
+        self.rgba = np.empty((h, w, 4), dtype=np.uint8)
+        # RGBA (không phải RGB) vì PIL chỉ map thẳng bộ nhớ với mode 4 byte/pixel
+        self.image = Image.frombuffer("RGBA", (w, h), self.rgba, "raw", "RGBA", 0, 1)
+
+
+class PreviewRenderer(threading.Thread):
+    """
+    Dựng ảnh preview camera ở background thread:
+    - giữ 1 slot frame mới nhất (submit() ghi đè, không backlog)
+    - resize về đúng kích thước canvas + BGR->RGBA + vẽ overlay recog, tất cả ghi vào
+      bộ đệm cấp phát sẵn (dst=...), PIL.Image dùng chung bộ nhớ => không cấp phát mỗi frame;
+      chỉ cấp phát lại khi canvas đổi size (<Configure>)
+    - N_BUFFERS bộ đệm xoay vòng: không ghi vào ảnh đang publish / Tk đang paste
+    - Tk thread chỉ take() rồi PhotoImage.paste()
+    - render tối đa target_fps; stats() cho biết thời gian render / số frame bỏ qua
+    """
+    VIZ_MAX_AGE = 0.8   # giây: overlay cũ hơn thì không vẽ
+
+    def __init__(
+        self,
+        viz_supplier: Callable[[], Tuple[Optional[Dict[str, Any]], float]],   # -> (viz, viz_ts)
+        target_fps: float = 15.0,
+    ):
+        super().__init__(daemon=True, name="PreviewRenderer")
+        self.viz_supplier = viz_supplier
+        self.target_fps = max(1.0, float(target_fps))
+
+        # ❗ KHÔNG dùng tên _stop (đè lên internal của Thread)
+        self._stop_event = threading.Event()
+        self._cv = threading.Condition()
+        self._frame = None          # frame BGR mới nhất chưa render
+        self._size = (0, 0)         # (w, h) canvas
+        self._out: Optional[Tuple[int, Image.Image]] = None   # (seq, ảnh đã dựng)
+        self._seq = 0
+        self._bufs: List[_Buffers] = []
+        self._front = -1            # bộ đệm của _out
+        self._held = -1             # bộ đệm Tk lấy ở take() gần nhất
+        self._reallocs = 0
+
+        # metrics
+        self._rendered = 0
+        self._dropped = 0
+        self._render_ms_total = 0.0
+        self._render_ms_max = 0.0
+
+    # ---------- producer / consumer ----------
+    def submit(self, frame_bgr):
+        """Gọi từ camera thread. Frame chưa kịp render bị thay bằng frame mới."""
+        with self._cv:
+            if self._frame is not None:
+                self._dropped += 1
+            self._frame = frame_bgr
+            self._cv.notify()
+
+    def set_target_size(self, w: int, h: int):
+        with self._cv:
+            self._size = (int(w), int(h))
+
+    def clear(self):
+        with self._cv:
+            self._frame = None
+            self._out = None
+            self._front = -1
+
+    def take(self, last_seq: int) -> Optional[Tuple[int, Image.Image]]:
+        """
+        Tk thread: (seq, PIL.Image) nếu có ảnh mới hơn last_seq.
+        Ảnh thuộc bộ đệm xoay vòng: chỉ hợp lệ tới lần take() kế tiếp (paste ngay).
+        """
+        with self._cv:
+            out = self._out
+            if out is None or out[0] == last_seq:
+                return None
+            self._held = self._front
+            return out
+
+    def stop(self):
+        self._stop_event.set()
+        with self._cv:
+            self._cv.notify()
+
+    def stats(self) -> Dict[str, float]:
+        with self._cv:
+            n = self._rendered
+            return {
+                "rendered": n,
+                "dropped": self._dropped,
+                "avg_render_ms": round(self._render_ms_total / n, 3) if n else 0.0,
+                "max_render_ms": round(self._render_ms_max, 3),
+                "reallocs": self._reallocs,
+            }
+
+    # ---------- worker ----------
+    def _next_buffers(self, size) -> Tuple[int, _Buffers]:
+        """Bộ đệm rảnh (không phải front / held); đổi size thì cấp phát lại cả bộ."""
+        with self._cv:
+            if not self._bufs or self._bufs[0].size != size:
+                self._bufs = [_Buffers(*size) for _ in range(N_BUFFERS)]
+                self._reallocs += 1
+                self._front = self._held = -1
+                self._out = None
+            busy = (self._front, self._held)
+            i = next(i for i in range(N_BUFFERS) if i not in busy)
+            return i, self._bufs[i]
+
+    def _render(self, frame, buf: _Buffers):
+        cv2.resize(frame, buf.size, dst=buf.resized, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(buf.resized, cv2.COLOR_BGR2RGBA, dst=buf.rgba)
+        try:
+            viz, viz_ts = self.viz_supplier()
+        except Exception:
+            viz, viz_ts = None, 0.0
+        if viz is not None and (time.time() - viz_ts) <= self.VIZ_MAX_AGE:
+            try:
+                src_h, src_w = frame.shape[:2]
+                draw_viz_overlay(buf.rgba, viz, src_w, src_h)
+            except Exception:
+                pass
+        return buf.image
+
+    def run(self):
+        interval = 1.0 / self.target_fps
+        next_at = time.perf_counter()
+        while not self._stop_event.is_set():
+            with self._cv:
+                while self._frame is None and not self._stop_event.is_set():
+                    self._cv.wait(0.5)
+                if self._stop_event.is_set():
+                    break
+
+            # throttle theo fps của UI (frame đến trong lúc chờ sẽ ghi đè slot)
+            now = time.perf_counter()
+            if now < next_at:
+                self._stop_event.wait(next_at - now)
+                continue
+            next_at = max(next_at + interval, now)
+
+            with self._cv:
+                frame, self._frame = self._frame, None
+                size = self._size
+            if frame is None or size[0] <= 1 or size[1] <= 1:
+                continue
+
+            t0 = time.perf_counter()
+            try:
+                idx, buf = self._next_buffers(size)
+                img = self._render(frame, buf)
+            except Exception as e:
+                print(f"[PREVIEW] render error: {e!r}")
+                continue
+            ms = (time.perf_counter() - t0) * 1000.0
+
+            with self._cv:
+                if self._bufs and self._bufs[idx] is not buf:
+                    continue   # đổi size giữa chừng (clear/realloc) => bỏ frame này
+                self._seq += 1
+                self._out = (self._seq, img)
+                self._front = idx
+                self._rendered += 1
+                self._render_ms_total += ms
+                self._render_ms_max = max(self._render_ms_max, ms)
@@ -1,26 +1,15 @@
 # tabs/home/services/recog_daemon.py
 from __future__ import annotations
-import os
 import time
 import threading
-import tempfile
-from typing import Any, Callable, Dict, Optional, List, Tuple
+from typing import Any, Callable, Dict, Optional, List
 import cv2
 import numpy as np
-import unicodedata
 
-try:
-    from deepface import DeepFace
-    _HAS_DEEPFACE = True
-except Exception:
-    _HAS_DEEPFACE = False
-
-try:
-    from mtcnn import MTCNN as _MTCNN_pkg
-    _HAS_MTCNN = True
-except Exception:
-    _HAS_MTCNN = False
-    _MTCNN_pkg = None  # type: ignore
+from .face_detector import get_detector, PRIO_STREAM
+from .inference_engine import InferenceEngine, get_inference_engine
+from .face_library import FaceLibrary, get_face_library
+from .text_utils import ascii_no_diacritics
 
 
 def _to_rgb(img_bgr: np.ndarray) -> np.ndarray:
@@ -29,22 +18,14 @@ def _to_rgb(img_bgr: np.ndarray) -> np.ndarray:
 def _var_laplacian(gray: np.ndarray) -> float:
     return float(cv2.Laplacian(gray, cv2.CV_64F).var())
 
-def _cosine(a: np.ndarray, b: np.ndarray) -> float:
-    a = a.astype(np.float32); b = b.astype(np.float32)
-    na = np.linalg.norm(a) + 1e-9; nb = np.linalg.norm(b) + 1e-9
-    return float(np.dot(a, b) / (na * nb))
-
-def _ascii_no_diacritics(s: str) -> str:
-    if not s:
-        return s
-    s_norm = unicodedata.normalize("NFKD", s)
-    s_ascii = "".join(ch for ch in s_norm if not unicodedata.combining(ch))
-    s_ascii = s_ascii.replace("đ", "d").replace("Đ", "D")
-    return " ".join(s_ascii.split())
-
-
 class RecognitionDaemon(threading.Thread):
-    """Camera frame -> detect -> crop -> embedding -> cosine matching."""
+    """
+    Camera frame -> detect -> crop -> embedding -> cosine matching.
+
+    Detector (MTCNN), inference engine (DeepFace) và thư viện embedding là bản dùng chung
+    toàn process => nhiều làn (station) chạy song song không nhân bản model / thư viện;
+    `station` là tên làn trong hàng đợi round-robin của engine.
+    """
 
     def __init__(
         self,
@@ -60,7 +41,10 @@ class RecognitionDaemon(threading.Thread):
         top2_delta: float = 0.08,
         blur_thr: float = 50.0,
         model_name: str = "VGG-Face",
-        rebuild_secs: float = 20.0
+        rebuild_secs: float = 20.0,
+        station: str = "main",
+        engine: Optional[InferenceEngine] = None,
+        library: Optional[FaceLibrary] = None,
     ):
         super().__init__(daemon=True)
         self._last_frame_supplier = last_frame_supplier
@@ -76,7 +60,7 @@ class RecognitionDaemon(threading.Thread):
         self._top2_delta = float(top2_delta)
         self._blur_thr = float(blur_thr)
         self._model_name = str(model_name)
-        self._rebuild_secs = float(rebuild_secs)
+        self._station = str(station)
 
         self._stop_event = threading.Event()
 
@@ -85,39 +69,23 @@ class RecognitionDaemon(threading.Thread):
         self._consecutive_hits = 0
         self._last_hit_id: Optional[int] = None
 
-        self._mtcnn = None
-        if _HAS_MTCNN:
-            try:
-                self._mtcnn = _MTCNN_pkg()
-            except Exception:
-                self._mtcnn = None
+        # MTCNN dùng chung toàn process (dialog enrolment cũng gọi vào đây)
+        self._mtcnn = get_detector()
+        self._mtcnn.warmup()
 
-        self._lib_cache: List[Dict[str, Any]] = []
-        self._emb_cache: Dict[int, List[np.ndarray]] = {}
-        self._last_rebuild = 0.0
-        self._last_lib_count = -1
+        self._engine = engine or get_inference_engine(self._model_name)
+        self._library = library if library is not None else get_face_library(lib_supplier, self._model_name, rebuild_secs)
 
         self._armed_ts = 0.0
         self._min_arm_delay = 0.30
 
         self._last_status_key = None
-        self._last_source_count = -1
 
         # ✅ NEW: pause recognition after success until arm_new_session()
         self._paused = True
         self._paused_notified = False
         self._armed_until = 0.0 #timestamp: hết hạn phiên nhận diện (0 = không armed)
 
-        # TEMP FILE REUSE (giảm I/O)
-        self._tmp_crop_path = os.path.join(
-            tempfile.gettempdir(),
-            f"smartatt_crop_{os.getpid()}_{id(self)}.jpg"
-        )
-        self._tmp_img_path = os.path.join(
-            tempfile.gettempdir(),
-            f"smartatt_img_{os.getpid()}_{id(self)}.jpg"
-        )
-
     # ---------- control ----------
     def stop(self):
         self._stop_event.set()
@@ -153,111 +121,17 @@ class RecognitionDaemon(threading.Thread):
             self._last_hit_id = None
 
     # ---------- embedding ----------
-    def _deepface_represent_path(self, path: str, backend: str) -> Optional[np.ndarray]:
-        reps = DeepFace.represent(
-            img_path=path,
-            model_name=self._model_name,
-            detector_backend=backend,
-            enforce_detection=False,
-            align=True
-        )
-        if isinstance(reps, list) and reps:
-            return np.array(reps[0]["embedding"], dtype=np.float32)
-        return None
-
-    def _embed_path(self, path: str) -> Optional[np.ndarray]:
-        # Try direct first
-        for backend in ("opencv", "retinaface", "skip"):
-            try:
-                emb = self._deepface_represent_path(path, backend)
-                if emb is not None:
-                    return emb
-            except Exception:
-                pass
-
-        # Fallback: overwrite 1 temp cố định (không create/delete liên tục)
-        try:
-            img = cv2.imread(path)
-            if img is None:
-                return None
-            cv2.imwrite(self._tmp_img_path, img)
-            for backend in ("opencv", "retinaface", "skip"):
-                try:
-                    emb = self._deepface_represent_path(self._tmp_img_path, backend)
-                    if emb is not None:
-                        return emb
-                except Exception:
-                    pass
-            return None
-        except Exception:
-            return None
-
     def _embed_crop(self, crop_bgr: np.ndarray) -> Optional[np.ndarray]:
-        """Ưu tiên in-memory; fallback overwrite 1 temp file cố định."""
-        # Try in-memory first
-        try:
-            reps = DeepFace.represent(
-                img_path=crop_bgr,
-                model_name=self._model_name,
-                detector_backend="skip",
-                enforce_detection=False,
-                align=False
-            )
-            if isinstance(reps, list) and reps:
-                return np.array(reps[0]["embedding"], dtype=np.float32)
-        except Exception:
-            pass
-
-        # Fallback: overwrite 1 temp file
-        try:
-            ok = cv2.imwrite(self._tmp_crop_path, crop_bgr)
-            if not ok:
-                return None
-            reps = DeepFace.represent(
-                img_path=self._tmp_crop_path,
-                model_name=self._model_name,
-                detector_backend="skip",
-                enforce_detection=False,
-                align=False
-            )
-            if isinstance(reps, list) and reps:
-                return np.array(reps[0]["embedding"], dtype=np.float32)
-            return None
-        except Exception:
-            return None
-
-    # ---------- build library ----------
-    def _build_library(self) -> bool:
-        self._lib_cache = []
-        self._emb_cache = {}
-        lib = self._lib_supplier() or []
-
-        for it in lib:
-            try:
-                eid = int(it["eid"])
-                path = it["img_abs"]
-                if not path or not os.path.isfile(path):
-                    continue
-                emb = self._embed_path(path)
-                if emb is None:
-                    continue
-                self._lib_cache.append(it)
-                self._emb_cache.setdefault(eid, []).append(emb)
-            except Exception:
-                continue
-
-        self._last_lib_count = len(self._lib_cache)
-        self._last_rebuild = time.time()
-        self._last_source_count = len(lib)
-        return self._last_lib_count > 0
+        """Qua inference engine dùng chung (round-robin giữa các station)."""
+        return self._engine.embed_crop(self._station, crop_bgr)
 
     # ---------- detection ----------
     def _detect_faces_using_mtcnn(self, rgb_img: np.ndarray) -> List[Dict[str, float]]:
-        if not self._mtcnn:
+        if not self._mtcnn.available:
             return []
         try:
             boxes = []
-            for r in self._mtcnn.detect_faces(rgb_img) or []:
+            for r in self._mtcnn.detect(rgb_img, priority=PRIO_STREAM):
                 conf = float(r.get("confidence", 0.0))
                 bx, by, bw, bh = r.get("box", [0, 0, 0, 0])
                 x1, y1, w, h = max(0, int(bx)), max(0, int(by)), max(0, int(bw)), max(0, int(bh))
@@ -278,230 +152,192 @@ class RecognitionDaemon(threading.Thread):
             return (-b["conf"], -b["area"], dist)
         return sorted(boxes, key=scorer)[0]
 
-    # ---------- matching ----------
-    def _match_embedding(self, emb: np.ndarray) -> Optional[Tuple[int, int, str, float, float]]:
-        if not self._lib_cache or not self._emb_cache:
-            return None
-        sims: List[Tuple[int, float]] = []
-        for it in self._lib_cache:
-            eid = int(it["eid"])
-            emb_list = self._emb_cache.get(eid) or []
-            if not emb_list:
-                continue
-            smax = max((_cosine(emb, e) for e in emb_list), default=0.0)
-            sims.append((eid, smax))
-        if not sims:
-            return None
-        sims.sort(key=lambda t: t[1], reverse=True)
-        top1_eid, s1 = sims[0]
-        s2 = sims[1][1] if len(sims) > 1 else 0.0
-        info = next((x for x in self._lib_cache if int(x["eid"]) == top1_eid), None)
-        if not info:
-            return None
-        sid = int(info.get("student_id") or 0)
-        name = str(info.get("full_name") or "")
-        return (top1_eid, sid, name, s1, s2)
-    
     def _reset_hits(self):
         with self._state_lock:
             self._consecutive_hits = 0
             self._last_hit_id = None
 
     def run(self):
-        if not _HAS_DEEPFACE or not self._mtcnn:
+        if not self._engine.available or not self._mtcnn.wait_ready():
             self._set_status("⚠️ DeepFace or MTCNN missing", "warn")
             return
 
         self._set_status(f"Building face library… ({self._model_name})", "idle")
-        ok = self._build_library()
+        ok = self._library.ensure_built()
         if not ok:
             self._set_status("No faces in database", "warn")
 
         self._set_status("Recognition ready — waiting for sensor…", "idle")
 
-        try:
-            while not self._stop_event.is_set():
-                t0 = time.time()
-                try:
-                    # ✅ ON-DEMAND gating: nếu chưa armed hoặc đã hết hạn -> pause
-                    now_ts = time.time()
+        while not self._stop_event.is_set():
+            t0 = time.time()
+            try:
+                # ✅ ON-DEMAND gating: nếu chưa armed hoặc đã hết hạn -> pause
+                now_ts = time.time()
+                with self._state_lock:
+                    paused = self._paused
+                    notified = self._paused_notified
+                    armed_until = self._armed_until
+
+                # hết hạn phiên nhận diện -> pause
+                if (not paused) and armed_until and (now_ts > armed_until):
                     with self._state_lock:
-                        paused = self._paused
-                        notified = self._paused_notified
-                        armed_until = self._armed_until
+                        self._paused = True
+                        self._paused_notified = False
+                    self._stop_event.wait(0.05)
+                    continue
 
-                    # hết hạn phiên nhận diện -> pause
-                    if (not paused) and armed_until and (now_ts > armed_until):
+                # đang pause -> ngủ nhẹ
+                if paused:
+                    if not notified:
+                        self._set_status("Idle — waiting for sensor trigger…", "idle")
                         with self._state_lock:
-                            self._paused = True
-                            self._paused_notified = False
-                        self._stop_event.wait(0.05)
-                        continue
-
-                    # đang pause -> ngủ nhẹ
-                    if paused:
-                        if not notified:
-                            self._set_status("Idle — waiting for sensor trigger…", "idle")
-                            with self._state_lock:
-                                self._paused_notified = True
-                        self._stop_event.wait(0.1)
-                        continue
-
-                    # Rebuild lib periodically (chỉ khi không pause)
-                    if (time.time() - self._last_rebuild) >= self._rebuild_secs:
-                        cur_lib = self._lib_supplier() or []
-                        if len(cur_lib) != self._last_source_count:
-                            self._build_library()
-                        else:
-                            self._last_rebuild = time.time()
-
-                    frame_bgr = self._last_frame_supplier()
-                    if frame_bgr is None:
-                        self._on_visual(None)
-                        self._sleep_rest(t0)
-                        continue
-
-                    # ARMING DELAY
-                    now_ts = time.time()
-                    with self._state_lock:
-                        if self._armed_ts == 0.0:
-                            self._armed_ts = now_ts
-                        armed_ts = self._armed_ts
-
-                    if (now_ts - armed_ts) < self._min_arm_delay:
-                        self._sleep_rest(t0)
-                        continue
-
-                    rgb = _to_rgb(frame_bgr)
-                    h, w = rgb.shape[:2]
-
-                    if not self._lib_cache:
-                        self._set_status("No faces in database", "warn")
-                        self._sleep_rest(t0)
-                        continue
-
-                    boxes = self._detect_faces_using_mtcnn(rgb)
-                    if not boxes:
-                        self._reset_hits()
-                        self._on_visual(None)
-                        self._set_status("No face detected", "none")
-                        self._sleep_rest(t0)
-                        continue
-
-                    best = self._choose_best_box(boxes, w, h)
-                    if best is None:
-                        self._reset_hits()
-                        self._on_visual(None)
-                        self._set_status("No face detected", "none")
-                        self._sleep_rest(t0)
-                        continue
-
-                    x1, y1, bw, bh = int(best["x1"]), int(best["y1"]), int(best["w"]), int(best["h"])
-                    pad = int(0.12 * max(bw, bh))
-                    xa, ya = max(0, x1 - pad), max(0, y1 - pad)
-                    xb, yb = min(w, x1 + bw + pad), min(h, y1 + bh + pad)
-
-                    crop_bgr = frame_bgr[ya:yb, xa:xb]
-
-                    # ✅ GUARD: crop rỗng => bỏ qua (tránh TF shape [0,...])
-                    if crop_bgr is None or crop_bgr.size == 0:
-                        self._reset_hits()
-                        self._on_visual(None)
-                        self._set_status("No face detected", "none")
-                        self._sleep_rest(t0)
-                        continue
-
-                    # sharpness
-                    gray = cv2.cvtColor(crop_bgr, cv2.COLOR_BGR2GRAY)
-                    if _var_laplacian(gray) < self._blur_thr:
-                        self._reset_hits()
-                        self._on_visual({"box": (xa, ya, xb, yb),
-                                        "label": "Unknown",
-                                        "color": (60, 180, 255),
-                                        "ts": time.time()})
-                        self._set_status("Face detected but not recognized", "warn")
-                        self._sleep_rest(t0)
-                        continue
-
-                    emb = self._embed_crop(crop_bgr)
-                    if emb is None:
-                        self._reset_hits()
-                        self._on_visual({"box": (xa, ya, xb, yb),
-                                        "label": "Unknown",
-                                        "color": (60, 180, 255),
-                                        "ts": time.time()})
-                        self._sleep_rest(t0)
-                        continue
-
-                    best_match = self._match_embedding(emb)
-                    if best_match is None:
-                        self._reset_hits()
-                        self._on_visual({"box": (xa, ya, xb, yb),
-                                        "label": "Unknown",
-                                        "color": (60, 180, 255),
-                                        "ts": time.time()})
-                        self._sleep_rest(t0)
-                        continue
-
-                    eid, sid, name, s1, s2 = best_match
-                    if s1 < self._threshold or (s1 - s2) < self._top2_delta:
-                        self._reset_hits()
-                        self._on_visual({"box": (xa, ya, xb, yb),
-                                        "label": "Unknown",
-                                        "color": (60, 180, 255),
-                                        "ts": time.time()})
-                        self._sleep_rest(t0)
-                        continue
-
-                    # streak
-                    with self._state_lock:
-                        if self._last_hit_id == eid:
-                            self._consecutive_hits += 1
-                        else:
-                            self._consecutive_hits = 1
-                            self._last_hit_id = eid
-                        streak_now = self._consecutive_hits
-
-                    clean_name = _ascii_no_diacritics(name)
-                    label_text = f"{sid} - {clean_name}"
-
-                    if streak_now >= 2:
-                        self._on_visual({"box": (xa, ya, xb, yb),
-                                        "label": label_text,
-                                        "color": (80, 220, 100),
-                                        "ts": time.time()})
-                        self._set_status(f"✅ Recognized: {sid} — {clean_name}", "ok")
-
-                        if streak_now == 2:
-                            try:
-                                self._on_hit(eid, sid, name)
-                            except Exception:
-                                pass
-                            finally:
-                                # ✅ PAUSE sau khi đã gửi kết quả để tránh spam
-                                with self._state_lock:
-                                    self._armed_ts = 0.0
-                                    self._paused = True
-                                    self._paused_notified = False
+                            self._paused_notified = True
+                    self._stop_event.wait(0.1)
+                    continue
+
+                # Rebuild lib periodically (chỉ khi không pause; thư viện dùng chung tự chống trùng)
+                self._library.maybe_rebuild()
+
+                frame_bgr = self._last_frame_supplier()
+                if frame_bgr is None:
+                    self._on_visual(None)
+                    self._sleep_rest(t0)
+                    continue
+
+                # ARMING DELAY
+                now_ts = time.time()
+                with self._state_lock:
+                    if self._armed_ts == 0.0:
+                        self._armed_ts = now_ts
+                    armed_ts = self._armed_ts
+
+                if (now_ts - armed_ts) < self._min_arm_delay:
+                    self._sleep_rest(t0)
+                    continue
+
+                rgb = _to_rgb(frame_bgr)
+                h, w = rgb.shape[:2]
+
+                if not len(self._library):
+                    self._set_status("No faces in database", "warn")
+                    self._sleep_rest(t0)
+                    continue
+
+                boxes = self._detect_faces_using_mtcnn(rgb)
+                if not boxes:
+                    self._reset_hits()
+                    self._on_visual(None)
+                    self._set_status("No face detected", "none")
+                    self._sleep_rest(t0)
+                    continue
+
+                best = self._choose_best_box(boxes, w, h)
+                if best is None:
+                    self._reset_hits()
+                    self._on_visual(None)
+                    self._set_status("No face detected", "none")
+                    self._sleep_rest(t0)
+                    continue
+
+                x1, y1, bw, bh = int(best["x1"]), int(best["y1"]), int(best["w"]), int(best["h"])
+                pad = int(0.12 * max(bw, bh))
+                xa, ya = max(0, x1 - pad), max(0, y1 - pad)
+                xb, yb = min(w, x1 + bw + pad), min(h, y1 + bh + pad)
+
+                crop_bgr = frame_bgr[ya:yb, xa:xb]
+
+                # ✅ GUARD: crop rỗng => bỏ qua (tránh TF shape [0,...])
+                if crop_bgr is None or crop_bgr.size == 0:
+                    self._reset_hits()
+                    self._on_visual(None)
+                    self._set_status("No face detected", "none")
+                    self._sleep_rest(t0)
+                    continue
+
+                # sharpness
+                gray = cv2.cvtColor(crop_bgr, cv2.COLOR_BGR2GRAY)
+                if _var_laplacian(gray) < self._blur_thr:
+                    self._reset_hits()
+                    self._on_visual({"box": (xa, ya, xb, yb),
+                                    "label": "Unknown",
+                                    "color": (60, 180, 255),
+                                    "ts": time.time()})
+                    self._set_status("Face detected but not recognized", "warn")
+                    self._sleep_rest(t0)
+                    continue
+
+                emb = self._embed_crop(crop_bgr)
+                if emb is None:
+                    self._reset_hits()
+                    self._on_visual({"box": (xa, ya, xb, yb),
+                                    "label": "Unknown",
+                                    "color": (60, 180, 255),
+                                    "ts": time.time()})
+                    self._sleep_rest(t0)
+                    continue
+
+                best_match = self._library.match(emb)
+                if best_match is None:
+                    self._reset_hits()
+                    self._on_visual({"box": (xa, ya, xb, yb),
+                                    "label": "Unknown",
+                                    "color": (60, 180, 255),
+                                    "ts": time.time()})
+                    self._sleep_rest(t0)
+                    continue
+
+                eid, sid, name, s1, s2 = best_match
+                if s1 < self._threshold or (s1 - s2) < self._top2_delta:
+                    self._reset_hits()
+                    self._on_visual({"box": (xa, ya, xb, yb),
+                                    "label": "Unknown",
+                                    "color": (60, 180, 255),
+                                    "ts": time.time()})
+                    self._sleep_rest(t0)
+                    continue
+
+                # streak
+                with self._state_lock:
+                    if self._last_hit_id == eid:
+                        self._consecutive_hits += 1
                     else:
-                        self._on_visual({"box": (xa, ya, xb, yb),
-                                        "label": "Verifying…",
-                                        "color": (0, 255, 255),
-                                        "ts": time.time()})
-                        self._set_status("Verifying match…", "warn")
-
-                except Exception as e:
-                    self._set_status(f"Recognition error: {e}", "warn")
-
-                self._sleep_rest(t0)
-
-        finally:
-            for p in (getattr(self, "_tmp_crop_path", None), getattr(self, "_tmp_img_path", None)):
-                if p and os.path.isfile(p):
-                    try:
-                        os.remove(p)
-                    except Exception:
-                        pass
+                        self._consecutive_hits = 1
+                        self._last_hit_id = eid
+                    streak_now = self._consecutive_hits
+
+                clean_name = ascii_no_diacritics(name)
+                label_text = f"{sid} - {clean_name}"
+
+                if streak_now >= 2:
+                    self._on_visual({"box": (xa, ya, xb, yb),
+                                    "label": label_text,
+                                    "color": (80, 220, 100),
+                                    "ts": time.time()})
+                    self._set_status(f"✅ Recognized: {sid} — {clean_name}", "ok")
+
+                    if streak_now == 2:
+                        try:
+                            self._on_hit(eid, sid, name)
+                        except Exception:
+                            pass
+                        finally:
+                            # ✅ PAUSE sau khi đã gửi kết quả để tránh spam
+                            with self._state_lock:
+                                self._armed_ts = 0.0
+                                self._paused = True
+                                self._paused_notified = False
+                else:
+                    self._on_visual({"box": (xa, ya, xb, yb),
+                                    "label": "Verifying…",
+                                    "color": (0, 255, 255),
+                                    "ts": time.time()})
+                    self._set_status("Verifying match…", "warn")
+
+            except Exception as e:
+                self._set_status(f"Recognition error: {e}", "warn")
+
+            self._sleep_rest(t0)
 
     # ---------- pacing ----------
     def _sleep_rest(self, t0: float):
@@ -0,0 +1,237 @@
+# tabs/home/services/stations.py
+"""
+Nhiều làn kiosk trong 1 process: mỗi làn (Station) = 1 cổng UART (ATmega) + 1 camera.
+
+- KIOSK_STATIONS="COM3@0,COM4@1,COM5@2"  (port@camera_index, trên Linux vd. /dev/ttyUSB0@0)
+  làn đầu tiên do PeopleTab chạy (có preview / UI), các làn sau chạy nền qua StationManager
+- mọi làn dùng chung: MTCNN (face_detector), InferenceEngine (DeepFace, round-robin
+  giữa các làn) và FaceLibrary (embedding) => không nhân bản model / thư viện theo số làn
+- Station chạy FSM quét giống PeopleTab: NG -> arm nhận diện (timeout 15 s => F),
+  hit -> T<student_id> + ghi log (hàng đợi WAL / not-in-shift), RD -> sẵn sàng
+- stats(): theo làn (scans, ok, fail, timeout, scans/min, thời gian nhận diện) + engine
+"""
+from __future__ import annotations
+import os
+import time
+import threading
+from datetime import datetime, time as dtime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from db.log_queue import enqueue_attendance_log
+from hardware.uart_daemon import UARTDaemon
+from .camera_daemon import CameraDaemon
+from .recog_daemon import RecognitionDaemon
+from .face_library import get_face_library
+from .inference_engine import get_inference_engine
+
+try:
+    from ...attendance.logs import push_not_in_shift
+except Exception:
+    push_not_in_shift = None
+
+SCAN_TIMEOUT_SEC = 15.0
+SHIFT_START = dtime(7, 0, 0)
+SHIFT_END = dtime(17, 0, 0)
+
+
+def parse_stations(spec: Optional[str] = None) -> List[Tuple[str, int]]:
+    """'COM3@0, COM4@1' -> [('COM3', 0), ('COM4', 1)]. Thiếu @cam thì cam = thứ tự làn."""
+    spec = os.getenv("KIOSK_STATIONS", "") if spec is None else spec
+    out: List[Tuple[str, int]] = []
+    for i, part in enumerate(p.strip() for p in spec.split(",")):
+        if not part:
+            continue
+        port, _, cam = part.rpartition("@") if "@" in part else (part, "", "")
+        try:
+            out.append((port.strip(), int(cam) if cam else i))
+        except ValueError:
+            print(f"[STATIONS] bỏ qua cấu hình không hợp lệ: {part!r}")
+    return out
+
+
+class Station:
+    """1 làn chạy nền (không UI)."""
+
+    def __init__(
+        self,
+        name: str,
+        port: str,
+        camera_index: int,
+        lib_supplier: Callable[[], List[Dict[str, Any]]],
+        model_name: str = "VGG-Face",
+        speculative: bool = True,
+        on_event: Optional[Callable[[str, str], None]] = None,   # on_event(station, text)
+    ):
+        self.name = name
+        self.port = port
+        self.camera_index = int(camera_index)
+        self._on_event = on_event or (lambda *_: None)
+
+        self._lock = threading.Lock()
+        self._last_frame = None
+        self._scan_active = False
+        self._scan_deadline = 0.0
+        self._scan_token = 0
+        self._scan_t0 = 0.0
+        self._await_ready = False
+        self._cooldown_until = 0.0
+        self._timer: Optional[threading.Timer] = None
+
+        self._t_start = 0.0
+        self._stats: Dict[str, float] = {"scans": 0, "ok": 0, "fail": 0, "timeout": 0, "recog_ms_total": 0.0}
+
+        self._camera = CameraDaemon(camera_index, on_frame=self._on_frame,
+                                    on_status=lambda s: self._on_event(self.name, s),
+                                    target_fps=15, width=640, height=480)
+        self._recog = RecognitionDaemon(
+            last_frame_supplier=self._get_frame,
+            lib_supplier=lib_supplier,
+            on_status=lambda msg, level: None,
+            on_hit=self._on_hit,
+            period_sec=1.0, threshold=0.40, conf_min=0.90, min_size_px=80,
+            model_name=model_name, station=name,
+            engine=get_inference_engine(model_name),
+            library=get_face_library(lib_supplier, model_name),
+        )
+        self._uart = UARTDaemon(on_person_detected=self._on_trigger, on_ready=self._on_ready,
+                                debug=False, port=port, speculative=speculative)
+
+    # ---------- lifecycle ----------
+    def start(self) -> bool:
+        self._t_start = time.time()
+        self._camera.start()
+        self._recog.start()
+        ok = self._uart.start()
+        if not ok:
+            self._on_event(self.name, f"UART {self.port}: cannot open")
+        return ok
+
+    def stop(self):
+        for stop in (self._uart.stop, self._recog.stop, self._camera.stop, self._cancel_timer):
+            try:
+                stop()
+            except Exception:
+                pass
+
+    # ---------- camera / recog ----------
+    def _on_frame(self, frame_bgr):
+        self._last_frame = frame_bgr
+
+    def _get_frame(self):
+        if not self._scan_active or time.time() > self._scan_deadline:
+            return None
+        return self._last_frame
+
+    # ---------- scan FSM (giống PeopleTab) ----------
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _on_trigger(self):
+        # gọi từ RX thread của UARTDaemon (đang giữ lock của daemon): không gọi send_* ở đây
+        with self._lock:
+            if time.time() < self._cooldown_until or self._await_ready or self._scan_active:
+                return
+            self._scan_token += 1
+            token = self._scan_token
+            self._scan_active = True
+            self._scan_deadline = time.time() + SCAN_TIMEOUT_SEC
+            self._scan_t0 = time.perf_counter()
+            self._stats["scans"] += 1
+            self._cancel_timer()
+            self._timer = threading.Timer(SCAN_TIMEOUT_SEC, self._on_timeout, args=(token,))
+            self._timer.daemon = True
+            self._timer.start()
+        self._recog.arm_new_session(window_sec=SCAN_TIMEOUT_SEC)
+
+    def _on_timeout(self, token: int):
+        with self._lock:
+            if token != self._scan_token or not self._scan_active:
+                return
+            self._scan_active = False
+            self._await_ready = True
+            self._stats["timeout"] += 1
+            self._stats["fail"] += 1
+        self._recog.pause()
+        self._uart.send_fail(resend=True)
+        self._on_event(self.name, "❌ User not found")
+
+    def _on_hit(self, eid: int, sid: int, name: str):
+        with self._lock:
+            if not self._scan_active:
+                return
+            self._scan_active = False
+            self._await_ready = True
+            self._cancel_timer()
+            self._stats["ok"] += 1
+            self._stats["recog_ms_total"] += (time.perf_counter() - self._scan_t0) * 1000.0
+        self._recog.pause()
+
+        now = datetime.now()
+        try:
+            if SHIFT_START <= now.time() <= SHIFT_END:
+                enqueue_attendance_log(eid, now)
+            elif callable(push_not_in_shift):
+                push_not_in_shift(eid, f"{sid} — {name}")
+        except Exception as e:
+            print(f"[DB_LOG_ERROR] station={self.name} eid={eid} sid={sid} err={e!r}")
+        self._uart.send_success(sid, resend=True)
+        self._on_event(self.name, f"✅ Recognized: {sid} — {name}")
+
+    def _on_ready(self):
+        with self._lock:
+            self._scan_token += 1
+            self._scan_active = False
+            self._await_ready = False
+            self._cancel_timer()
+            self._cooldown_until = time.time() + 0.5
+        self._recog.pause()
+
+    # ---------- metrics ----------
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            st = dict(self._stats)
+        mins = max((time.time() - self._t_start) / 60.0, 1e-9) if self._t_start else 0.0
+        ok = st.pop("recog_ms_total")
+        return {
+            "port": self.port,
+            "camera": self.camera_index,
+            "connected": bool(self._uart.ser and self._uart.ser.is_open),
+            **{k: int(v) for k, v in st.items()},
+            "scans_per_min": round(st["scans"] / mins, 2) if mins else 0.0,
+            "avg_recog_ms": round(ok / st["ok"], 1) if st["ok"] else 0.0,
+            "handshake": self._uart.handshake_stats(),
+        }
+
+
+class StationManager:
+    """Chạy các làn nền; model / thư viện dùng chung với làn chính (PeopleTab)."""
+
+    def __init__(self, specs: List[Tuple[str, int]], lib_supplier: Callable[[], List[Dict[str, Any]]],
+                 model_name: str = "VGG-Face", speculative: bool = True,
+                 on_event: Optional[Callable[[str, str], None]] = None, first_index: int = 1):
+        self.model_name = model_name
+        self.stations: List[Station] = [
+            Station(f"lane{first_index + i}", port, cam, lib_supplier, model_name=model_name,
+                    speculative=speculative, on_event=on_event)
+            for i, (port, cam) in enumerate(specs)
+        ]
+
+    def start(self):
+        for st in self.stations:
+            try:
+                st.start()
+            except Exception as e:
+                print(f"[STATIONS] {st.name} start failed: {e!r}")
+
+    def stop(self):
+        for st in self.stations:
+            st.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        """{stations: {name: ...}, engine: {station: wait/infer}}"""
+        return {
+            "stations": {st.name: st.stats() for st in self.stations},
+            "engine": get_inference_engine(self.model_name).stats(),
+        }
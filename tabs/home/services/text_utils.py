@@ -0,0 +1,14 @@
+# tabs/home/services/text_utils.py
+"""Xử lý chuỗi dùng chung (không kéo theo cv2 / DeepFace)."""
+from __future__ import annotations
+import unicodedata
+
+
+def ascii_no_diacritics(s: str) -> str:
+    """Bỏ dấu tiếng Việt (đ -> d), gộp khoảng trắng: 'Nguyễn  Văn Đức' -> 'Nguyen Van Duc'."""
+    if not s:
+        return s
+    s_norm = unicodedata.normalize("NFKD", s)
+    s_ascii = "".join(ch for ch in s_norm if not unicodedata.combining(ch))
+    s_ascii = s_ascii.replace("đ", "d").replace("Đ", "D")
+    return " ".join(s_ascii.split())
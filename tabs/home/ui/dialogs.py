@@ -9,13 +9,8 @@ from PIL import Image, ImageTk
 import cv2
 from datetime import date
 
-# --- Optional MTCNN face crop ---
-try:
-    from mtcnn import MTCNN as _MTCNN_pkg
-    _HAS_MTCNN = True
-except Exception:
-    _HAS_MTCNN = False
-    _MTCNN_pkg = None  # type: ignore
+# --- Optional MTCNN face crop (dùng chung 1 model với RecognitionDaemon) ---
+from ..services.face_detector import get_detector
 
 
 # ------------------ helpers ------------------
@@ -143,11 +138,11 @@ class CreateEmployeeDialog(Toplevel):
         self.canvas.create_image(140, 105, image=self._preview_tk)
 
     def _crop_face_or_original(self, rgb: Any) -> Image.Image:
-        if not _HAS_MTCNN:
+        detector = get_detector()
+        if not detector.available:
             return Image.fromarray(rgb)
         try:
-            mtcnn = _MTCNN_pkg()
-            res = mtcnn.detect_faces(rgb)
+            res = detector.detect(rgb)
             best = None
             best_score = (-1, -1)
             for r in (res or []):
@@ -363,11 +358,11 @@ class ChangeFaceDialog(Toplevel):
         self.canvas.create_image(140, 105, image=self._preview_tk)
 
     def _crop_face(self, rgb: Any) -> Image.Image:
-        if not _HAS_MTCNN:
+        detector = get_detector()
+        if not detector.available:
             return Image.fromarray(rgb)
         try:
-            mtcnn = _MTCNN_pkg()
-            res = mtcnn.detect_faces(rgb)
+            res = detector.detect(rgb)
             if not res:
                 return Image.fromarray(rgb)
             r = max(res, key=lambda x: float(x.get("confidence", 0.0)))